@@ -3,10 +3,24 @@ Main Flask application file.
 Initializes the app, database, and registers blueprints.
 """
 
-from flask import Flask, redirect
+import time
+_import_started = time.perf_counter()
+
+import threading
+from flask import Flask, Response, abort, redirect, g, request
 from flask_login import LoginManager
 from config import Config
-from models import db, User
+from models import db
+
+# Cold-start breakdown in milliseconds, reported by /health
+startup_timings = {}
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+startup_timings['import_framework_ms'] = _elapsed_ms(_import_started)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -15,6 +29,31 @@ app.config.from_object(Config)
 # Initialize database
 db.init_app(app)
 
+
+def _init_subsystems(app):
+    """
+    Set up the subsystems that hook into every request. Each is imported
+    here, where it is needed; everything else (job queue, pool stats,
+    archive, ...) is imported on first use, so a cold start only loads
+    what serving a request requires. The blueprints follow the same rule:
+    a module only some views need is imported inside those views.
+    """
+    import user_cache
+    import passwords
+    import page_cache
+    import templating
+    import live_updates
+    import request_metrics
+    user_cache.init_app(app)
+    passwords.init_app(app)
+    page_cache.init_app(app)
+    templating.init_app(app)
+    live_updates.init_app(app)
+    request_metrics.init_app(app)
+
+
+_init_subsystems(app)
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -25,28 +64,73 @@ login_manager.login_message_category = 'info'
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login."""
+    """Load user by ID for Flask-Login (served from the per-process user cache)."""
+    import user_cache
     try:
-        return User.query.get(int(user_id))
+        return user_cache.load_user(int(user_id))
     except Exception:
         # If database is not available, return None
         return None
 
 
 # Register blueprints
+_blueprints_started = time.perf_counter()
 from routes.auth import auth_bp
 from routes.admin import admin_bp
 from routes.user import user_bp
+from routes.api import api_bp
+from routes.live import live_bp
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(admin_bp, url_prefix='/admin')
 app.register_blueprint(user_bp, url_prefix='/user')
+app.register_blueprint(api_bp, url_prefix='/api')
+app.register_blueprint(live_bp, url_prefix='/live')
+startup_timings['import_blueprints_ms'] = _elapsed_ms(_blueprints_started)
+
+# Optional in-process late-delivery detection
+if app.config['LATE_DETECTION_INTERVAL']:
+    from late_detection import start_scheduler
+    start_scheduler(app, app.config['LATE_DETECTION_INTERVAL'])
 
 
 @app.route('/health')
 def health():
     """Health check endpoint that doesn't require database."""
-    return {'status': 'ok', 'message': 'Flask app is running'}, 200
+    import db_pool
+    import jobs
+    import page_cache
+    import read_replicas
+    import request_metrics
+    import user_cache
+    return {
+        'status': 'ok',
+        'message': 'Flask app is running',
+        'user_cache': user_cache.cache.stats(),
+        'fragment_cache': page_cache.fragments.stats(),
+        'db_pool': {'profile': app.config['DB_POOL_PROFILE'], 'pools': db_pool.pool_stats()},
+        'read_replicas': read_replicas.router.status(),
+        'job_worker': jobs.worker_status(),
+        'slowest_queries': request_metrics.registry.slowest(),
+        'startup': startup_timings
+    }, 200
+
+
+@app.route('/metrics')
+def metrics():
+    """Request, SQL, pool and cache metrics in Prometheus text format."""
+    import db_pool
+    import page_cache
+    import request_metrics
+    import user_cache
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    body = request_metrics.render_prometheus(
+        pool_stats=db_pool.pool_stats(),
+        caches={'user': user_cache.cache.stats(), 'fragment': page_cache.fragments.stats()},
+    )
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/')
@@ -62,74 +146,79 @@ def index():
 
 
 # Lazy database initialization - will happen on first request
-# This prevents crashes during serverless cold starts
-_db_initialized = False
-_users_initialized = False
+# This prevents crashes during serverless cold starts.
+# The check is skipped entirely when SKIP_DB_BOOTSTRAP is set, and costs a
+# single SELECT on schema_migrations once the database is up to date.
+_bootstrap_lock = threading.Lock()
+_db_initialized = app.config['SKIP_DB_BOOTSTRAP']
+# Serialises hook removal: two concurrent first requests must not each
+# rebuild the hook list from a copy that still holds the other's hook
+_hooks_lock = threading.Lock()
+
+
+def _unregister_hook(hooks, hook):
+    """
+    Remove a before/after request hook so later requests don't pay for it.
+    Builds a new list rather than mutating the one Flask may be iterating.
+    """
+    with _hooks_lock:
+        hooks[None] = [registered for registered in hooks.get(None, []) if registered is not hook]
+
+
+@app.before_request
+def _start_first_request_timer():
+    g.request_started = time.perf_counter()
+    _unregister_hook(app.before_request_funcs, _start_first_request_timer)
+
 
 @app.before_request
 def ensure_db_initialized():
-    """Ensure database is initialized before handling requests."""
-    global _db_initialized, _users_initialized
-    if not _db_initialized:
+    """Ensure database is initialized before handling the first request."""
+    global _db_initialized
+    with _bootstrap_lock:
+        if _db_initialized:
+            _unregister_hook(app.before_request_funcs, ensure_db_initialized)
+            return
+        started = time.perf_counter()
         try:
-            with app.app_context():
-                # Create all database tables
-                db.create_all()
-                _db_initialized = True
+            from migrations import is_up_to_date, upgrade
+            # Create tables, apply migrations and create demo users if needed
+            if not is_up_to_date():
+                upgrade()
         except Exception as e:
+            db.session.rollback()
             print(f"Database initialization failed: {e}")
-            _db_initialized = True
-    
-    # Create demo users only if database is empty (first time setup)
-    # SECURITY: Use environment variables for production credentials
-    if not _users_initialized and _db_initialized:
-        try:
-            with app.app_context():
-                # Only create demo users if no users exist in the database
-                user_count = User.query.count()
-                if user_count == 0:
-                    import os
-                    
-                    # Get admin credentials from environment variables or use defaults
-                    admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
-                    admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
-                    admin_email = os.environ.get('ADMIN_EMAIL', 'admin@logistik.com')
-                    
-                    # Get regular user credentials from environment variables or use defaults
-                    user_username = os.environ.get('USER_USERNAME', 'user')
-                    user_password = os.environ.get('USER_PASSWORD', 'user123')
-                    user_email = os.environ.get('USER_EMAIL', 'user@logistik.com')
-                    
-                    # Create admin user
-                    admin = User(
-                        username=admin_username,
-                        email=admin_email,
-                        role='admin'
-                    )
-                    admin.set_password(admin_password)
-                    db.session.add(admin)
-                    
-                    # Create regular user
-                    user = User(
-                        username=user_username,
-                        email=user_email,
-                        role='user'
-                    )
-                    user.set_password(user_password)
-                    db.session.add(user)
-                    
-                    db.session.commit()
-                    
-                    # Security warning if using default credentials
-                    if admin_password == 'admin123' or user_password == 'user123':
-                        print("⚠️  SECURITY WARNING: Using default demo credentials!")
-                        print("⚠️  Set ADMIN_PASSWORD and USER_PASSWORD environment variables in production!")
-                    else:
-                        print(f"Users created: {admin_username} and {user_username}")
-                _users_initialized = True
-        except Exception as e:
-            print(f"User initialization failed: {e}")
-            _users_initialized = True
+        startup_timings['db_bootstrap_ms'] = _elapsed_ms(started)
+        _db_initialized = True
+        _unregister_hook(app.before_request_funcs, ensure_db_initialized)
+
+
+# Registered after the bootstrap hook, so migrations always run on the primary
+import read_replicas
+read_replicas.init_app(app, db)
+
+
+# Optional in-process background job worker. Started by the first request,
+# after the bootstrap has created the jobs table, so scripts that import
+# app never pick up jobs they would abandon on exit.
+if app.config['JOB_WORKER_THREADS']:
+    @app.before_request
+    def _start_job_worker():
+        import jobs
+        jobs.start_worker(app, app.config['JOB_WORKER_THREADS'])
+        _unregister_hook(app.before_request_funcs, _start_job_worker)
+
+
+@app.after_request
+def _record_first_request_time(response):
+    if 'request_started' in g:
+        startup_timings['first_request_ms'] = _elapsed_ms(g.request_started)
+        app.logger.info("Cold start timings (ms): %s", startup_timings)
+    _unregister_hook(app.after_request_funcs, _record_first_request_time)
+    return response
+
+
+startup_timings['import_total_ms'] = _elapsed_ms(_import_started)
 
 
 if __name__ == '__main__':
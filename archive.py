@@ -0,0 +1,179 @@
+"""
+Hot/cold archival of delivered parcels.
+Delivered deliveries that haven't changed for ARCHIVE_AFTER_DAYS are moved
+from the delivery table into delivery_archive, so the table and indexes
+every dashboard query reads only hold parcels that are still moving.
+
+Rows are moved ARCHIVE_BATCH_SIZE at a time, each batch in its own short
+transaction (INSERT ... SELECT into the archive, then DELETE by id), with
+ARCHIVE_BATCH_PAUSE seconds between batches so other writers get the table
+in between. On PostgreSQL the batch is picked with FOR UPDATE SKIP LOCKED:
+rows someone is writing right now are left for the next run instead of
+being waited on.
+
+Archived parcels keep their id, so detail pages and the event log work
+unchanged; load_delivery() and the tracking-number lookups fall back to the
+archive. Archived rows are read-only, still count as delivered in the
+status counters and are included in exports and the analytics report.
+
+Usage:
+    python archive.py run [--days N] [--batch-size N] [--max-batches N]
+    python archive.py status
+"""
+
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+from sqlalchemy.orm import joinedload
+from models import db, Delivery, ArchivedDelivery
+from page_cache import deliveries_changed
+
+# Columns copied into the archive (every delivery column; the archive adds archived_at)
+ARCHIVED_COLUMNS = [column.name for column in Delivery.__table__.columns]
+
+
+def _archivable(table, cutoff):
+    # Ids are never reused (AUTOINCREMENT on SQLite, a sequence elsewhere),
+    # so any row can go, the newest included
+    return (table.c.status == 'delivered') & (table.c.updated_at < cutoff)
+
+
+def _archive_batch(cutoff, batch_size):
+    """Move one batch of archivable deliveries and commit. Returns the moved ids."""
+    table = Delivery.__table__
+    # Oldest first through the (status, created_at, id) index
+    ids = [row[0] for row in db.session.execute(
+        select(table.c.id)
+        .where(_archivable(table, cutoff))
+        .order_by(table.c.created_at, table.c.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )]
+    if not ids:
+        return []
+
+    # The conditions are repeated so a row changed since the SELECT (SQLite
+    # takes no row locks) stays where it is; once the INSERT has run, this
+    # transaction holds the write lock and the DELETE sees the same rows
+    moving = table.c.id.in_(ids) & _archivable(table, cutoff)
+    columns = [table.c[name] for name in ARCHIVED_COLUMNS]
+    db.session.execute(
+        insert(ArchivedDelivery.__table__).from_select(
+            ARCHIVED_COLUMNS + ['archived_at'],
+            select(*columns, literal(datetime.utcnow(), DateTime)).where(moving))
+    )
+    moved = [row[0] for row in db.session.execute(
+        select(ArchivedDelivery.id).where(ArchivedDelivery.id.in_(ids)))]
+    db.session.execute(delete(table).where(table.c.id.in_(moved)))
+    deliveries_changed(moved)
+    db.session.commit()
+    return moved
+
+
+def archive_delivered(older_than_days=None, batch_size=None, pause=None, max_batches=None):
+    """
+    Move delivered parcels untouched for older_than_days into the archive.
+    Returns {'archived', 'batches', 'elapsed_ms'}.
+    """
+    config = current_app.config
+    days = config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    pause = config['ARCHIVE_BATCH_PAUSE'] if pause is None else pause
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    started = time.perf_counter()
+
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = _archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        archived += len(moved)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+
+    return {
+        'archived': archived,
+        'batches': batches,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def load_delivery(delivery_id, with_users=False):
+    """The delivery with this id from the delivery table or else the archive (None if neither)."""
+    for model in (Delivery, ArchivedDelivery):
+        query = model.query
+        if with_users:
+            query = query.options(joinedload(model.created_by), joinedload(model.updated_by))
+        delivery = query.filter(model.id == delivery_id).first()
+        if delivery is not None:
+            return delivery
+    return None
+
+
+def last_updated(delivery_id):
+    """updated_at of a live or archived delivery, or None if it doesn't exist."""
+    for model in (Delivery, ArchivedDelivery):
+        updated_at = db.session.query(model.updated_at).filter(model.id == delivery_id).scalar()
+        if updated_at is not None:
+            return updated_at
+    return None
+
+
+def find_by_tracking_number(tracking_number):
+    """Live or archived delivery with this tracking number, or None."""
+    return (Delivery.query.filter_by(tracking_number=tracking_number).first()
+            or ArchivedDelivery.query.filter_by(tracking_number=tracking_number).first())
+
+
+def archived_tracking_numbers(tracking_numbers):
+    """The subset of tracking_numbers that belong to archived deliveries."""
+    if not tracking_numbers:
+        return set()
+    rows = (db.session.query(ArchivedDelivery.tracking_number)
+            .filter(ArchivedDelivery.tracking_number.in_(list(tracking_numbers))))
+    return {row.tracking_number for row in rows}
+
+
+def stats():
+    """Row counts of the hot table, its archivable part and the archive."""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    table = Delivery.__table__
+    return {
+        'live': db.session.query(func.count(Delivery.id)).scalar(),
+        'archivable': db.session.execute(
+            select(func.count()).select_from(table).where(_archivable(table, cutoff))).scalar(),
+        'archived': db.session.query(func.count(ArchivedDelivery.id)).scalar(),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+    from live_updates import publish_changes
+
+    parser = argparse.ArgumentParser(description='Move old delivered parcels into the archive table.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='archive delivered parcels older than the cutoff')
+    run_parser.add_argument('--days', type=int, help='untouched for this many days (default: ARCHIVE_AFTER_DAYS)')
+    run_parser.add_argument('--batch-size', type=int, help='rows moved per transaction')
+    run_parser.add_argument('--pause', type=float, help='seconds to sleep between batches')
+    run_parser.add_argument('--max-batches', type=int, help='stop after this many batches')
+    commands.add_parser('status', help='show how many deliveries are live, archivable and archived')
+    args = parser.parse_args()
+
+    with app.app_context():
+        # The archive table on databases created before it
+        db.create_all(bind_key=None)
+        if args.command == 'run':
+            result = archive_delivered(args.days, args.batch_size, args.pause, args.max_batches)
+            if result['archived']:
+                publish_changes()
+            print(f"✓ Archived {result['archived']} deliveries in {result['batches']} batch(es) "
+                  f"({result['elapsed_ms']} ms).")
+        else:
+            counts = stats()
+            print(f"Live deliveries:     {counts['live']}")
+            print(f"  archivable now:    {counts['archivable']}")
+            print(f"Archived deliveries: {counts['archived']}")
@@ -0,0 +1,137 @@
+"""
+Status update contention benchmark.
+Several threads keep changing the status of the same few deliveries, once
+with optimistic concurrency (status_updates.change_status: no row lock,
+retry when another writer wins) and once with pessimistic locking
+(SELECT ... FOR UPDATE, then the same change). Reports committed updates/sec,
+retries, failures and latency for each.
+
+SQLite serialises writers on a database lock and ignores FOR UPDATE, so the
+comparison is only meaningful against PostgreSQL (set DATABASE_URL).
+
+Usage:
+    python benchmarks/contention.py [--seconds 10] [--threads 8] [--hot 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Run against a throwaway SQLite database unless DATABASE_URL is given
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from app import app
+from models import db, Delivery, User, DELIVERY_STATUSES
+from status_updates import VersionConflict, apply_status, change_status
+import seed_data
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def optimistic_update(delivery_id, status, user_id):
+    """Returns the number of retries it took."""
+    return change_status(delivery_id, status, user_id).attempts - 1
+
+
+def locking_update(delivery_id, status, user_id):
+    delivery = (db.session.query(Delivery)
+                .filter(Delivery.id == delivery_id)
+                .with_for_update()
+                .one())
+    apply_status(delivery, status, user_id)
+    db.session.commit()
+    return 0
+
+
+def run_mode(update, hot_ids, user_id, seconds, threads):
+    """Hammer the hot deliveries from several threads and return the measurements."""
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {'committed': 0, 'retries': 0, 'conflicts': 0, 'errors': 0}
+    latencies = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = {'committed': 0, 'retries': 0, 'conflicts': 0, 'errors': 0}
+        local_ms = []
+        with app.app_context():
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    local['retries'] += update(rng.choice(hot_ids), rng.choice(DELIVERY_STATUSES), user_id)
+                    local['committed'] += 1
+                    local_ms.append((time.perf_counter() - started) * 1000)
+                except (VersionConflict, StaleDataError):
+                    # Out of retries, or (without a real row lock) lost the race
+                    db.session.rollback()
+                    local['conflicts'] += 1
+                except OperationalError:
+                    # e.g. SQLite "database is locked" or a deadlock
+                    db.session.rollback()
+                    local['errors'] += 1
+            db.session.remove()
+        with lock:
+            for key, value in local.items():
+                totals[key] += value
+            latencies.extend(local_ms)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+
+    return dict(totals,
+                updates_per_sec=totals['committed'] / seconds,
+                p50_ms=percentile(latencies, 0.50),
+                p99_ms=percentile(latencies, 0.99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimistic vs FOR UPDATE status updates under contention.')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--hot', type=int, default=5, help='deliveries all threads fight over')
+    args = parser.parse_args()
+
+    # First request runs the bootstrap and creates the demo users
+    app.test_client().get('/auth/login')
+    with app.app_context():
+        if Delivery.query.count() < args.hot:
+            seed_data.seed(args.hot, progress=False)
+        hot_ids = [row[0] for row in db.session.query(Delivery.id).order_by(Delivery.id).limit(args.hot)]
+        user_id = db.session.query(User.id).filter(User.username == 'user').scalar()
+        dialect = db.engine.dialect.name
+
+    print(f"{args.threads} threads on {len(hot_ids)} deliveries ({dialect}), {args.seconds:g} s per mode\n")
+    print(f"{'mode':<12} {'updates/s':>10} {'retries':>8} {'conflicts':>10} {'errors':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for label, update in (('optimistic', optimistic_update), ('for update', locking_update)):
+        result = run_mode(update, hot_ids, user_id, args.seconds, args.threads)
+        print(f"{label:<12} {result['updates_per_sec']:>10.1f} {result['retries']:>8} "
+              f"{result['conflicts']:>10} {result['errors']:>7} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+    with app.app_context():
+        import status_counts
+        mismatched = status_counts.check()
+    print("\n✓ Status counters consistent." if not mismatched else f"\n✗ Status counters drifted: {mismatched}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Dispatch planner benchmark.
+Packs synthetic parcels (log-normal weights, due dates spread over a month)
+into fleets of different sizes and reports the time to order, pack and
+summarise them, then times a read-only plan of the database's ongoing
+deliveries (fetch included) when there are any.
+
+Usage:
+    python benchmarks/dispatch.py [--parcels 100000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Run against a throwaway SQLite database unless DATABASE_URL is given
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('JOB_WORKER_THREADS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app import app
+from dispatch import pack, plan_dispatch, summarise
+
+# (trucks, capacity in kg)
+FLEETS = ((10, 1000), (50, 2000), (500, 500), (5000, 50))
+
+
+def synthetic_parcels(count, seed=1):
+    """(count, 4) array of id, weight, due day and version, shaped like the seeded data."""
+    rng = np.random.default_rng(seed)
+    data = np.ones((count, 4))
+    data[:, 0] = np.arange(1, count + 1)
+    data[:, 1] = np.round(rng.lognormal(0.5, 0.8, count), 2)
+    data[:, 2] = 20000 + rng.integers(0, 30, count)
+    return data
+
+
+def best_ms(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        best = elapsed_ms if best is None else min(best, elapsed_ms)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time of the dispatch planner on synthetic and stored parcels.')
+    parser.add_argument('--parcels', type=int, default=100000, help='synthetic parcels per plan')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_parcels(args.parcels)
+    print(f"{'trucks':>7} {'kg/truck':>9} {'loaded':>8} {'used':>7} {'ms':>8}")
+    for trucks, capacity in FLEETS:
+        elapsed_ms, report = best_ms(lambda: summarise(pack(data, trucks, capacity)), args.repeat)
+        print(f"{trucks:>7} {capacity:>9} {report['loaded']:>8} {report['utilisation']:>7.1%} {elapsed_ms:>8.1f}")
+
+    # First request runs the bootstrap
+    app.test_client().get('/auth/login')
+    with app.app_context():
+        elapsed_ms, report = best_ms(plan_dispatch, args.repeat)
+    if report['candidates']:
+        timings = report['timings_ms']
+        print(f"\n✓ Planned {report['candidates']} stored ongoing deliveries in {elapsed_ms:.0f} ms "
+              f"(fetch {timings['fetch']:.0f} ms, plan {timings['plan']:.0f} ms).")
+    else:
+        print("\n⚠️  No ongoing deliveries in the database; skipped the end-to-end plan.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+List-view projection benchmark.
+Loads the same newest-first slice of deliveries the way the dashboards used
+to (full Delivery entities in the session) and the way they do now
+(row_query() DeliveryRow tuples), and reports time and peak Python memory
+per 10k rows for each.
+
+Usage:
+    python benchmarks/list_projection.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Run against a throwaway SQLite database unless DATABASE_URL is given
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from app import app
+from models import db, Delivery
+from pagination import row_query, to_rows
+import seed_data
+
+
+def load_entities(rows):
+    """The previous dashboard path: full ORM objects, tracked by the session."""
+    return (Delivery.query
+            .order_by(Delivery.created_at.desc(), Delivery.id.desc())
+            .limit(rows)
+            .all())
+
+
+def load_rows(rows):
+    """The list-view path: displayed columns only, as plain tuples."""
+    return to_rows(row_query()
+                   .order_by(Delivery.created_at.desc(), Delivery.id.desc())
+                   .limit(rows))
+
+
+def measure(loader, rows, repeat):
+    """Best wall time and peak traced memory over `repeat` fresh sessions."""
+    best_ms = None
+    peak_bytes = 0
+    for _ in range(repeat):
+        db.session.remove()
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = loader(rows)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        loaded = len(result)
+        del result
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+        peak_bytes = max(peak_bytes, peak)
+    db.session.remove()
+    return loaded, best_ms, peak_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and memory of ORM entities vs row projections.')
+    parser.add_argument('--rows', type=int, default=10000, help='rows loaded per run')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # First request runs the bootstrap
+    app.test_client().get('/auth/login')
+
+    with app.app_context():
+        existing = db.session.query(func.count(Delivery.id)).scalar()
+        if existing < args.rows:
+            print(f"Seeding {args.rows - existing} deliveries...")
+            seed_data.seed(args.rows - existing, progress=False)
+
+        print(f"{'path':<10} {'rows':>7} {'ms/10k':>9} {'MiB/10k':>9}")
+        results = {}
+        for label, loader in (('entities', load_entities), ('rows', load_rows)):
+            loaded, best_ms, peak_bytes = measure(loader, args.rows, args.repeat)
+            scale = 10000 / loaded if loaded else 0
+            results[label] = (best_ms * scale, peak_bytes * scale / 2 ** 20)
+            print(f"{label:<10} {loaded:>7} {results[label][0]:>9.1f} {results[label][1]:>9.2f}")
+
+    entities, rows = results['entities'], results['rows']
+    if rows[0] and rows[1]:
+        print(f"\n✓ Row projection: {entities[0] / rows[0]:.1f}x faster, "
+              f"{entities[1] / rows[1]:.1f}x less memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Login burst benchmark.
+Drives the real login and dashboard routes through the Flask test client
+from concurrent threads and reports logins/sec next to dashboard latency,
+once with hashing inline on the request thread and once on the bounded
+password pool.
+
+Usage:
+    python benchmarks/login_burst.py [--seconds 10] [--login-threads 16] [--dashboard-threads 4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Run against a throwaway SQLite database unless DATABASE_URL is given
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+import passwords
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(workers, seconds, login_threads, dashboard_threads):
+    """Run one mixed-load round and return its measurements."""
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    passwords.init_app(app)
+
+    stop = threading.Event()
+    logins = []
+    busy = []
+    dashboard_ms = []
+
+    def login_loop():
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+            if response.status_code == 302:
+                logins.append(1)
+            elif response.status_code == 503:
+                busy.append(1)
+            client.get('/auth/logout')
+
+    def dashboard_loop():
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'user', 'password': 'user123'})
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get('/user/dashboard')
+            dashboard_ms.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+    threads += [threading.Thread(target=dashboard_loop) for _ in range(dashboard_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'logins_per_sec': len(logins) / seconds,
+        'refused': len(busy),
+        'dashboard_requests': len(dashboard_ms),
+        'dashboard_p50_ms': percentile(dashboard_ms, 0.50),
+        'dashboard_p99_ms': percentile(dashboard_ms, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Logins/sec vs dashboard latency under a login burst.')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--dashboard-threads', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=app.config['PASSWORD_HASH_WORKERS'] or 2,
+                        help='pool size for the pooled round')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    # First request runs the bootstrap and creates the demo users
+    app.test_client().get('/auth/login')
+
+    print(f"{'mode':<12} {'logins/s':>9} {'refused':>8} {'dash reqs':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, workers in (('inline', 0), (f'pool({args.workers})', args.workers)):
+        result = run_mode(workers, args.seconds, args.login_threads, args.dashboard_threads)
+        print(f"{label:<12} {result['logins_per_sec']:>9.1f} {result['refused']:>8} "
+              f"{result['dashboard_requests']:>10} {result['dashboard_p50_ms']:>8.1f} "
+              f"{result['dashboard_p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
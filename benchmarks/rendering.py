@@ -0,0 +1,116 @@
+"""
+Dashboard rendering benchmark.
+Requests the admin dashboard with a full page of rows, rendered in memory
+(STREAM_TEMPLATES off) and streamed (on), and reports time to first byte,
+total time and peak Python memory while the body is produced. Then compiles
+every template from scratch with and without a warm bytecode cache, which
+is what a cold instance pays on its first requests.
+
+Usage:
+    python benchmarks/rendering.py [--rows 200] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Run against a throwaway SQLite database unless DATABASE_URL is given
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('JOB_WORKER_THREADS', '0')
+# Measure the templates, not the row fragment cache
+os.environ['FRAGMENT_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment
+from sqlalchemy import func
+from app import app
+from models import db, Delivery
+from templating import BytecodeCache
+import seed_data
+
+
+def measure_page(client, url, stream, repeat):
+    """Best time to first byte and total time, and peak traced memory, over `repeat` requests."""
+    app.config['STREAM_TEMPLATES'] = stream
+    best_first = best_total = None
+    peak_bytes = size = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get(url, buffered=False)
+        first_ms = None
+        size = 0
+        for chunk in response.response:
+            if first_ms is None:
+                first_ms = (time.perf_counter() - started) * 1000
+            size += len(chunk)
+        response.close()
+        total_ms = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        best_first = first_ms if best_first is None else min(best_first, first_ms)
+        best_total = total_ms if best_total is None else min(best_total, total_ms)
+        peak_bytes = max(peak_bytes, peak)
+    return best_first, best_total, peak_bytes, size
+
+
+def cold_compile_ms(cache_dir=None):
+    """Load every template into a fresh environment, as a new process would."""
+    env = Environment(loader=app.jinja_env.loader, autoescape=True)
+    env.globals.update(app.jinja_env.globals)
+    env.filters.update(app.jinja_env.filters)
+    if cache_dir:
+        env.bytecode_cache = BytecodeCache(cache_dir)
+    started = time.perf_counter()
+    for name in env.list_templates(filter_func=lambda name: name.endswith('.html')):
+        env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Buffered vs streamed dashboards and template compile time.')
+    parser.add_argument('--rows', type=int, default=200, help='rows on the dashboard page')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    # First request runs the bootstrap
+    client.get('/auth/login')
+
+    with app.app_context():
+        existing = db.session.query(func.count(Delivery.id)).scalar()
+        if existing < args.rows:
+            print(f"Seeding {args.rows - existing} deliveries...")
+            seed_data.seed(args.rows - existing, progress=False)
+
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    client.get('/admin/dashboard')  # consume the login flash
+    url = f'/admin/dashboard?per_page={args.rows}'
+
+    print(f"{'render':<10} {'first ms':>9} {'total ms':>9} {'peak KiB':>9} {'KiB sent':>9}")
+    results = {}
+    for label, stream in (('buffered', False), ('streamed', True)):
+        results[label] = measure_page(client, url, stream, args.repeat)
+        first_ms, total_ms, peak_bytes, size = results[label]
+        print(f"{label:<10} {first_ms:>9.2f} {total_ms:>9.2f} {peak_bytes / 1024:>9.1f} {size / 1024:>9.1f}")
+    app.config['STREAM_TEMPLATES'] = True
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        uncached = cold_compile_ms()
+        cold_compile_ms(cache_dir)  # fill the cache
+        cached = cold_compile_ms(cache_dir)
+    print(f"\ncold compile: {uncached:.1f} ms without bytecode cache, {cached:.1f} ms with it")
+
+    buffered, streamed = results['buffered'], results['streamed']
+    if streamed[0] and streamed[2]:
+        print(f"\n✓ Streaming: first byte {buffered[0] / streamed[0]:.1f}x sooner, "
+              f"{buffered[2] / streamed[2]:.1f}x less peak memory")
+
+
+if __name__ == '__main__':
+    main()
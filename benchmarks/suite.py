@@ -0,0 +1,250 @@
+"""
+Request benchmark suite.
+Drives the real blueprints through the Flask test client against a seeded
+database (see seed_data.py) and reports p50/p95/p99 latency, throughput and
+SQL queries per request for the main pages and writes. Results can be saved
+as a baseline and later runs compared against it, so a change that slows a
+page down or adds queries (an N+1 creeping in) fails the run.
+
+Usage:
+    python benchmarks/suite.py [--deliveries 10000] [--requests 200] [--only dashboard_admin ...]
+    python benchmarks/suite.py --save benchmarks/baselines/sqlite-10k.json
+    python benchmarks/suite.py --compare benchmarks/baselines/sqlite-10k.json [--tolerance 0.25]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Run against a throwaway SQLite database unless DATABASE_URL is given
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+# No job worker polling the database in the background while queries are counted
+os.environ.setdefault('JOB_WORKER_THREADS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func
+from app import app
+from models import db, Delivery
+import seed_data
+
+STATUSES = ('ongoing', 'in_route', 'late', 'delivered')
+
+# Extra queries per request tolerated before a scenario counts as regressed
+QUERY_SLACK = 0.5
+
+
+class QueryCounter:
+    """Counts statements sent to the database while enabled."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def login(client, username, password):
+    client.post('/auth/login', data={'username': username, 'password': password})
+    return client
+
+
+def build_scenarios(sample_ids, rng):
+    """
+    Scenario name -> (client factory, request function). Request functions
+    take the client and return the response of the one measured request.
+    """
+    tracking_counter = itertools.count()
+    run_tag = f'BENCH{int(time.time()) % 100000:05d}'
+
+    def do_login(client):
+        # Measured as a login + logout round trip so every iteration logs in afresh
+        response = client.post('/auth/login', data={'username': 'user', 'password': 'user123'})
+        client.get('/auth/logout')
+        return response
+
+    def admin_dashboard(client):
+        return client.get('/admin/dashboard')
+
+    def user_dashboard(client):
+        return client.get('/user/dashboard')
+
+    def view_delivery(client):
+        return client.get(f'/user/delivery/{rng.choice(sample_ids)}/view')
+
+    def update_status(client):
+        return client.post(f'/user/delivery/{rng.choice(sample_ids)}/update-status',
+                           data={'status': rng.choice(STATUSES)})
+
+    def create_delivery(client):
+        return client.post('/admin/delivery/create', data={
+            'tracking_number': f'{run_tag}{next(tracking_counter):08d}',
+            'recipient_name': 'Benchmark Recipient',
+            'recipient_address': 'Rua do Benchmark, 100 - São Paulo - SP',
+            'recipient_phone': '+55 11 90000-0000',
+            'description': 'Benchmark parcel',
+            'weight': '1.5',
+            'estimated_delivery_date': (date.today() + timedelta(days=3)).isoformat(),
+            'status': 'ongoing',
+        })
+
+    def anonymous():
+        return app.test_client()
+
+    def as_admin():
+        return login(app.test_client(), 'admin', 'admin123')
+
+    def as_user():
+        return login(app.test_client(), 'user', 'user123')
+
+    return {
+        'login': (anonymous, do_login),
+        'dashboard_admin': (as_admin, admin_dashboard),
+        'dashboard_user': (as_user, user_dashboard),
+        'view_delivery': (as_user, view_delivery),
+        'update_status': (as_user, update_status),
+        'create_delivery': (as_admin, create_delivery),
+    }
+
+
+def run_scenario(make_client, request, requests, warmup, counter):
+    """Run one scenario sequentially and return its measurements."""
+    client = make_client()
+    for _ in range(warmup):
+        request(client)
+
+    latencies = []
+    queries = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        counter.count = 0
+        request_started = time.perf_counter()
+        response = request(client)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        queries.append(counter.count)
+        # Successful form posts redirect; pages answer 200
+        if response.status_code not in (200, 302):
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'req_per_s': round(requests / elapsed, 1) if elapsed else 0.0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against a saved baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms vs baseline {previous['p95_ms']:.1f} ms")
+        if result['queries_per_request'] > previous['queries_per_request'] + QUERY_SLACK:
+            regressions.append(f"{name}: {result['queries_per_request']} queries/request vs baseline "
+                               f"{previous['queries_per_request']}")
+        if result['errors'] > previous.get('errors', 0):
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {previous.get('errors', 0)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency, throughput and queries/request per route.')
+    parser.add_argument('--deliveries', type=int, default=10000,
+                        help='seed the database up to this many deliveries first')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per scenario')
+    parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='run only these scenarios')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and request mix')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a baseline JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='fail if results regress against this baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown against the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    # First request runs the bootstrap and creates the demo users
+    app.test_client().get('/auth/login')
+
+    rng = random.Random(args.seed)
+    counter = QueryCounter()
+    with app.app_context():
+        existing = db.session.query(func.count(Delivery.id)).scalar()
+        if existing < args.deliveries:
+            print(f"Seeding {args.deliveries - existing} deliveries...")
+            seed_data.seed(args.deliveries - existing, seed_value=args.seed, progress=False)
+        total = db.session.query(func.count(Delivery.id)).scalar()
+        sample_ids = [row[0] for row in db.session.query(Delivery.id).order_by(func.random()).limit(1000)]
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        dialect = db.engine.dialect.name
+
+    scenarios = build_scenarios(sample_ids, rng)
+    names = args.only or list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+    print(f"{total} deliveries on {dialect}, {args.requests} requests per scenario\n")
+    print(f"{'scenario':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8} {'errors':>7}")
+    results = {}
+    for name in names:
+        make_client, request = scenarios[name]
+        result = run_scenario(make_client, request, args.requests, args.warmup, counter)
+        results[name] = result
+        print(f"{name:<16} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['req_per_s']:>8.1f} {result['queries_per_request']:>8.2f} {result['errors']:>7}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'deliveries': total,
+                'dialect': dialect,
+                'python': platform.python_version(),
+                'requests': args.requests,
+                'scenarios': results,
+            }, f, indent=2)
+        print(f"\n✓ Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('deliveries') != total or baseline.get('dialect') != dialect:
+            print(f"⚠️  Baseline was recorded with {baseline.get('deliveries')} deliveries on "
+                  f"{baseline.get('dialect')}; latencies may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) against {args.compare}:")
+            for message in regressions:
+                print(f"  - {message}")
+            return 1
+        print(f"\n✓ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
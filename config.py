@@ -4,6 +4,9 @@ Contains database settings and secret key configuration.
 """
 
 import os
+import tempfile
+from db_pool import engine_options, resolve_profile
+from read_replicas import replica_binds
 
 class Config:
     """Base configuration class."""
@@ -25,4 +28,146 @@ class Config:
         SQLALCHEMY_DATABASE_URI = 'sqlite:///logistik.db'
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-
+    
+    # Connection pool profile (see db_pool.py): 'serverless', 'server' or
+    # 'auto' (serverless when running on Vercel/AWS Lambda). Sizes and
+    # timeouts can be tuned with DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    # DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_CONNECT_TIMEOUT and
+    # DB_SERVERLESS_POOL_SIZE (0 = no pooling).
+    DB_POOL_PROFILE = resolve_profile(os.environ.get('DB_POOL_PROFILE', 'auto'))
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, DB_POOL_PROFILE)
+    
+    # Read replicas (see read_replicas.py): comma-separated database URLs,
+    # each added as a replica_<n> bind with the same pool profile. GET
+    # requests to READ_REPLICA_ENDPOINTS read from a replica unless it is
+    # more than READ_REPLICA_MAX_LAG seconds behind (checked every
+    # READ_REPLICA_CHECK_INTERVAL seconds) or unreachable. After writing, a
+    # user reads from the primary for READ_REPLICA_STICKY_SECONDS.
+    READ_REPLICA_URLS = [url.strip().replace('postgres://', 'postgresql://', 1)
+                         for url in os.environ.get('READ_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = replica_binds(READ_REPLICA_URLS, DB_POOL_PROFILE)
+    READ_REPLICA_ENDPOINTS = os.environ.get(
+        'READ_REPLICA_ENDPOINTS',
+        'admin.dashboard,user.dashboard,admin.view_delivery,user.view_delivery,admin.search,user.search,'
+        'api.search,admin.export_deliveries,admin.analytics,api.sla_analytics,live.deliveries').split(',')
+    READ_REPLICA_MAX_LAG = float(os.environ.get('READ_REPLICA_MAX_LAG', 5))
+    READ_REPLICA_CHECK_INTERVAL = float(os.environ.get('READ_REPLICA_CHECK_INTERVAL', 5))
+    READ_REPLICA_STICKY_SECONDS = float(os.environ.get('READ_REPLICA_STICKY_SECONDS', 10))
+    
+    # Dashboard pagination (keyset/cursor based, see pagination.py)
+    DELIVERIES_PER_PAGE = int(os.environ.get('DELIVERIES_PER_PAGE', 50))
+    DELIVERIES_MAX_PER_PAGE = int(os.environ.get('DELIVERIES_MAX_PER_PAGE', 200))
+    
+    # Bulk delivery import (see delivery_import.py). Uploaded manifests wait
+    # for their import job in IMPORT_UPLOAD_DIR; a worker running in another
+    # process or host must see the same directory (shared volume).
+    IMPORT_UPLOAD_DIR = os.environ.get('IMPORT_UPLOAD_DIR',
+                                       os.path.join(tempfile.gettempdir(), 'logistik-imports'))
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get('IMPORT_MAX_REPORTED_ERRORS', 1000))
+    
+    # Streaming delivery export (see delivery_export.py)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 2000))
+    
+    # JSON API (see routes/api.py)
+    API_MAX_BATCH_SIZE = int(os.environ.get('API_MAX_BATCH_SIZE', 5000))
+    
+    # In-process late-delivery detection interval in seconds (0 = disabled).
+    # Leave disabled on serverless and run mark_late.py from a scheduler instead.
+    LATE_DETECTION_INTERVAL = float(os.environ.get('LATE_DETECTION_INTERVAL', 0))
+    
+    # Background jobs (see jobs.py). JOB_WORKER_THREADS worker threads run
+    # inside the web process from its first request on (0 = none; on
+    # serverless, run "python jobs.py work" elsewhere or "python jobs.py
+    # work --once" from a scheduler).
+    # Failed jobs are retried up to JOB_MAX_ATTEMPTS times, waiting
+    # JOB_RETRY_BASE_SECONDS doubled per attempt (at most
+    # JOB_RETRY_MAX_SECONDS). A job still running after JOB_TIMEOUT seconds
+    # is taken to be orphaned and run again.
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 0 if DB_POOL_PROFILE == 'serverless' else 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+    JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', 600))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 10))
+    JOB_RETRY_MAX_SECONDS = float(os.environ.get('JOB_RETRY_MAX_SECONDS', 600))
+    JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 30))
+    
+    # Delivery search results per page (see search.py)
+    SEARCH_RESULTS_PER_PAGE = int(os.environ.get('SEARCH_RESULTS_PER_PAGE', 20))
+    
+    # Per-process cache of logged-in user records (see user_cache.py).
+    # Set USER_CACHE_TTL=0 to disable it.
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 300))
+    
+    # Dashboard rendering (see templating.py): stream pages to the client in
+    # STREAM_BUFFER_SIZE-character chunks, and keep compiled templates in
+    # TEMPLATE_CACHE_DIR (empty = no bytecode cache). Point it at a directory
+    # filled by "python templating.py compile" at build time to spare cold
+    # serverless instances the compilation.
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', '1').lower() in ('1', 'true', 'yes')
+    STREAM_BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 8192))
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR',
+                                        os.path.join(tempfile.gettempdir(), 'logistik-jinja-cache'))
+    
+    # Rendered dashboard rows cached per process (see page_cache.py); 0 disables it
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 5000))
+    
+    # Delivery event log retention (see delivery_events.py): events older than
+    # this many days are folded into per-delivery summaries by
+    # "python delivery_events.py compact", scanning this many events per batch
+    EVENT_RETENTION_DAYS = int(os.environ.get('EVENT_RETENTION_DAYS', 365))
+    EVENT_COMPACT_BATCH_SIZE = int(os.environ.get('EVENT_COMPACT_BATCH_SIZE', 5000))
+    
+    # Hot/cold archival (see archive.py): delivered parcels untouched for
+    # ARCHIVE_AFTER_DAYS are moved to delivery_archive by "python archive.py
+    # run", ARCHIVE_BATCH_SIZE rows per transaction with ARCHIVE_BATCH_PAUSE
+    # seconds in between. Exports and analytics read archived rows as well.
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+    ARCHIVE_BATCH_PAUSE = float(os.environ.get('ARCHIVE_BATCH_PAUSE', 0.05))
+    
+    # Dispatch load planning (see dispatch.py): default fleet size and the
+    # weight one truck carries, in kg. Both can be overridden per plan.
+    DISPATCH_TRUCKS = int(os.environ.get('DISPATCH_TRUCKS', 10))
+    DISPATCH_TRUCK_CAPACITY_KG = float(os.environ.get('DISPATCH_TRUCK_CAPACITY_KG', 1000))
+    
+    # SLA analytics (see analytics.py): default report window in days and how
+    # long a computed report is reused, in seconds (0 = always recompute)
+    ANALYTICS_DEFAULT_DAYS = int(os.environ.get('ANALYTICS_DEFAULT_DAYS', 90))
+    ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', 300))
+    
+    # Live dashboard updates (see live_updates.py). 'memory' fans out within
+    # one process; set "module:Class" for a shared broker across workers.
+    # Streams are closed after LIVE_UPDATES_MAX_SECONDS (browsers reconnect
+    # and resume), with a keep-alive every LIVE_UPDATES_HEARTBEAT seconds.
+    LIVE_UPDATES_BROKER = os.environ.get('LIVE_UPDATES_BROKER', 'memory')
+    LIVE_UPDATES_QUEUE_SIZE = int(os.environ.get('LIVE_UPDATES_QUEUE_SIZE', 100))
+    LIVE_UPDATES_MAX_CHANGES = int(os.environ.get('LIVE_UPDATES_MAX_CHANGES', 200))
+    LIVE_UPDATES_HEARTBEAT = float(os.environ.get('LIVE_UPDATES_HEARTBEAT', 15))
+    LIVE_UPDATES_MAX_SECONDS = float(os.environ.get('LIVE_UPDATES_MAX_SECONDS', 300))
+    LIVE_UPDATES_RETRY_MS = int(os.environ.get('LIVE_UPDATES_RETRY_MS', 3000))
+    
+    # Per-request SQL instrumentation and /metrics (see request_metrics.py).
+    # Statements slower than SQL_SLOW_QUERY_MS are logged (0 = never); with
+    # SQL_N_PLUS_ONE_THRESHOLD set, a statement repeated that many times in
+    # one request is logged as a possible N+1 (0 = off). METRICS_TOKEN, if
+    # set, must be sent as "Authorization: Bearer <token>" to read /metrics.
+    SQL_METRICS_ENABLED = os.environ.get('SQL_METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 250))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 0))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Skip the first-request schema/demo-user bootstrap entirely. Set this
+    # once migrations.py has been run against the database (e.g. on Vercel).
+    SKIP_DB_BOOTSTRAP = os.environ.get('SKIP_DB_BOOTSTRAP', '').lower() in ('1', 'true', 'yes')
+    
+    # Password hashing (see passwords.py). Werkzeug method string, e.g.
+    # 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'. Changing it rehashes each
+    # user's password on their next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Threads allowed to hash at once (0 = hash inline on the request thread),
+    # how many logins may wait for one, and how long they wait in seconds
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
@@ -0,0 +1,168 @@
+"""
+Database connection pool profiles and pool metrics.
+Two named profiles, chosen by DB_POOL_PROFILE:
+
+- serverless: no pooling (NullPool) or a tiny pool, short connect timeout.
+  Safe behind pgbouncer in transaction mode (psycopg2 never prepares
+  statements server-side) and doesn't leak connections when an instance is
+  frozen with sockets open.
+- server: a sized QueuePool with pre-ping and recycling for long-running
+  gunicorn workers.
+
+'auto' (the default) picks serverless on Vercel/AWS Lambda and server
+elsewhere. Every pool records checkout latency and saturation; see
+pool_stats().
+"""
+
+import os
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+SERVERLESS_ENV_VARS = ('VERCEL', 'AWS_LAMBDA_FUNCTION_NAME')
+
+
+class PoolMetrics:
+    """Checkout latency and saturation counters for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.saturated_checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def record_checkout(self, wait_ms, saturated):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.saturated_checkouts += saturated
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+                'saturated_checkouts': self.saturated_checkouts,
+                'timeouts': self.timeouts,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+            }
+
+
+# Metrics per named pool ('default', or a bind name)
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def metrics_for(name):
+    with _metrics_lock:
+        if name not in _metrics:
+            _metrics[name] = PoolMetrics()
+        return _metrics[name]
+
+
+class _TimedPoolMixin:
+    """Times every checkout; for NullPool that is the connect time itself."""
+
+    metrics_name = 'default'
+
+    def _saturated(self):
+        # Only a QueuePool can run out of connections
+        if isinstance(self, QueuePool):
+            return self.checkedout() >= self.size() + max(self._max_overflow, 0)
+        return False
+
+    def _do_get(self):
+        metrics = metrics_for(self.metrics_name)
+        saturated = self._saturated()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            metrics.record_timeout()
+            raise
+        metrics.record_checkout((time.perf_counter() - started) * 1000, saturated)
+        return connection
+
+    def _do_return_conn(self, record):
+        metrics_for(self.metrics_name).record_checkin()
+        super()._do_return_conn(record)
+
+
+def timed_pool_class(base, name='default'):
+    """Return a subclass of a SQLAlchemy pool class that reports to metrics_for(name)."""
+    return type(f'Timed{base.__name__}', (_TimedPoolMixin, base), {'metrics_name': name})
+
+
+def resolve_profile(profile):
+    """Turn 'auto' into 'serverless' or 'server' from the environment."""
+    if profile == 'auto':
+        return 'serverless' if any(os.environ.get(var) for var in SERVERLESS_ENV_VARS) else 'server'
+    return profile
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(uri, profile='auto', name='default'):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for a database URI and pool profile."""
+    profile = resolve_profile(profile)
+    is_postgres = uri.startswith('postgresql')
+    options = {}
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        # Flask-SQLAlchemy gives in-memory SQLite a single shared connection
+        return options
+
+    if profile == 'serverless':
+        pool_size = _env_int('DB_SERVERLESS_POOL_SIZE', 0)
+        if pool_size:
+            options.update(
+                poolclass=timed_pool_class(QueuePool, name),
+                pool_size=pool_size,
+                max_overflow=0,
+                pool_timeout=_env_int('DB_POOL_TIMEOUT', 5),
+                pool_recycle=_env_int('DB_POOL_RECYCLE', 60),
+                pool_pre_ping=True,
+            )
+        else:
+            options['poolclass'] = timed_pool_class(NullPool, name)
+        connect_timeout = _env_int('DB_CONNECT_TIMEOUT', 3)
+    else:
+        options.update(
+            poolclass=timed_pool_class(QueuePool, name),
+            pool_size=_env_int('DB_POOL_SIZE', 5),
+            max_overflow=_env_int('DB_MAX_OVERFLOW', 10),
+            pool_timeout=_env_int('DB_POOL_TIMEOUT', 10),
+            pool_recycle=_env_int('DB_POOL_RECYCLE', 1800),
+            pool_pre_ping=True,
+        )
+        connect_timeout = _env_int('DB_CONNECT_TIMEOUT', 10)
+
+    if is_postgres:
+        options['connect_args'] = {'connect_timeout': connect_timeout}
+    return options
+
+
+def pool_stats():
+    """Return {pool name: metrics snapshot} for every pool used so far."""
+    with _metrics_lock:
+        names = list(_metrics)
+    return {name: metrics_for(name).snapshot() for name in names}
@@ -0,0 +1,227 @@
+"""
+Append-only delivery status event log.
+Every status change (create, edit, status update, batch API, import, late
+detection, delete) appends a row to delivery_event in the same transaction
+as the write. Statuses and sources are stored as small-int codes; never
+renumber existing codes, only add new ones.
+
+Old events are folded into one delivery_event_summary row per delivery by
+compact(), which keeps the table from growing without bound.
+
+Run this file directly for maintenance:
+    python delivery_events.py compact [--days N]
+    python delivery_events.py timeline TRACKING_NUMBER
+"""
+
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import DateTime, Integer, SmallInteger, case, delete, func, insert, literal, select
+from models import db, Delivery, DeliveryEvent, DeliveryEventSummary, User
+
+# 'deleted' marks the delivery row being removed
+STATUS_CODES = {'deleted': 0, 'ongoing': 1, 'in_route': 2, 'late': 3, 'delivered': 4}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+SOURCE_CODES = {'web': 1, 'api': 2, 'import': 3, 'late_detection': 4, 'backfill': 5,
+                'dispatch': 6}
+SOURCE_NAMES = {code: source for source, code in SOURCE_CODES.items()}
+
+EVENT_COLUMNS = ['delivery_id', 'occurred_at', 'status', 'source', 'actor_id']
+
+TimelineEvent = namedtuple('TimelineEvent', 'occurred_at status source actor')
+TimelineSummary = namedtuple('TimelineSummary', 'event_count first_at last_at first_status last_status')
+
+
+def record_event(delivery_id, status, actor_id=None, source='web'):
+    """Append one event. Does not commit; the caller's commit covers it."""
+    record_events([delivery_id], status, actor_id, source)
+
+
+def record_events(delivery_ids, status, actor_id=None, source='web'):
+    """Append one event per delivery, all moving to status, with a single executemany."""
+    now = datetime.utcnow()
+    rows = [{
+        'delivery_id': delivery_id,
+        'occurred_at': now,
+        'status': STATUS_CODES[status],
+        'source': SOURCE_CODES[source],
+        'actor_id': actor_id,
+    } for delivery_id in delivery_ids]
+    if rows:
+        db.session.execute(insert(DeliveryEvent.__table__), rows)
+
+
+def status_code_expr(column):
+    """SQL expression mapping a status string column to its code."""
+    return case({status: code for status, code in STATUS_CODES.items() if code}, value=column, else_=0)
+
+
+def record_events_where(condition, status=None, actor_id=None, source='web', occurred_at=None):
+    """
+    Append one event per delivery matching condition with one INSERT ... SELECT,
+    without loading the rows. With status=None each row's current status is
+    recorded (use it after an INSERT); otherwise status is recorded (use it
+    just before the UPDATE that moves the rows). Returns the number of events.
+    """
+    table = Delivery.__table__
+    code = literal(STATUS_CODES[status], SmallInteger) if status else status_code_expr(table.c.status)
+    when = occurred_at if occurred_at is not None else literal(datetime.utcnow(), DateTime)
+    rows = select(
+        table.c.id,
+        when,
+        code,
+        literal(SOURCE_CODES[source], SmallInteger),
+        literal(actor_id, Integer),
+    ).where(condition)
+    result = db.session.execute(insert(DeliveryEvent.__table__).from_select(EVENT_COLUMNS, rows))
+    return result.rowcount
+
+
+def backfill():
+    """Give every delivery without history one event for its current status."""
+    table = Delivery.__table__
+    has_events = select(DeliveryEvent.id).where(DeliveryEvent.delivery_id == table.c.id).exists()
+    return record_events_where(~has_events, source='backfill',
+                               occurred_at=func.coalesce(table.c.updated_at, table.c.created_at))
+
+
+def timeline(delivery_id):
+    """
+    Return (summary, events) for one delivery: the compacted summary (or
+    None) and the remaining events, oldest first, from one index range scan.
+    """
+    summary = db.session.get(DeliveryEventSummary, delivery_id)
+    if summary is not None:
+        summary = TimelineSummary(summary.event_count, summary.first_at, summary.last_at,
+                                  STATUS_NAMES.get(summary.first_status, 'unknown'),
+                                  STATUS_NAMES.get(summary.last_status, 'unknown'))
+
+    rows = (db.session.query(DeliveryEvent.occurred_at, DeliveryEvent.status,
+                             DeliveryEvent.source, User.username)
+            .outerjoin(User, User.id == DeliveryEvent.actor_id)
+            .filter(DeliveryEvent.delivery_id == delivery_id)
+            .order_by(DeliveryEvent.occurred_at, DeliveryEvent.id)
+            .all())
+    events = [TimelineEvent(occurred_at, STATUS_NAMES.get(status, 'unknown'),
+                            SOURCE_NAMES.get(source, 'unknown'), username)
+              for occurred_at, status, source, username in rows]
+    return summary, events
+
+
+def timeline_version(delivery_id):
+    """
+    (event_count, last_at) of a delivery's compacted summary, or None.
+    compact() changes it whenever it folds more of the delivery's events,
+    without touching the delivery itself.
+    """
+    row = (db.session.query(DeliveryEventSummary.event_count, DeliveryEventSummary.last_at)
+           .filter(DeliveryEventSummary.delivery_id == delivery_id)
+           .first())
+    return tuple(row) if row is not None else None
+
+
+def _fold(delivery_ids, cutoff):
+    """Merge the old events of these deliveries into their summaries, then delete them."""
+    table = DeliveryEvent.__table__
+    old = (table.c.delivery_id.in_(delivery_ids), table.c.occurred_at < cutoff)
+    rows = db.session.execute(
+        select(table.c.delivery_id, table.c.occurred_at, table.c.status)
+        .where(*old)
+        .order_by(table.c.delivery_id, table.c.occurred_at, table.c.id)
+    )
+
+    folded = {}  # delivery_id -> [count, first_at, last_at, first_status, last_status]
+    for delivery_id, occurred_at, status in rows:
+        entry = folded.get(delivery_id)
+        if entry is None:
+            folded[delivery_id] = [1, occurred_at, occurred_at, status, status]
+        else:
+            entry[0] += 1
+            entry[2] = occurred_at
+            entry[4] = status
+
+    existing = {summary.delivery_id: summary for summary in
+                DeliveryEventSummary.query.filter(DeliveryEventSummary.delivery_id.in_(list(folded)))}
+    for delivery_id, (count, first_at, last_at, first_status, last_status) in folded.items():
+        summary = existing.get(delivery_id)
+        if summary is None:
+            db.session.add(DeliveryEventSummary(delivery_id=delivery_id, event_count=count,
+                                                first_at=first_at, last_at=last_at,
+                                                first_status=first_status, last_status=last_status))
+        else:
+            # Summaries only ever hold events older than the ones left in the log
+            summary.event_count += count
+            summary.last_at = last_at
+            summary.last_status = last_status
+
+    result = db.session.execute(delete(table).where(*old))
+    db.session.commit()
+    return len(folded), result.rowcount
+
+
+def compact(older_than_days=None, batch_size=None):
+    """
+    Fold events older than the retention window into per-delivery summaries.
+    Old events are found through the occurred_at index a batch at a time,
+    each batch committed on its own, so this can run against a live table.
+    Returns {'deliveries', 'events', 'elapsed_ms'}.
+    """
+    config = current_app.config
+    days = config['EVENT_RETENTION_DAYS'] if older_than_days is None else older_than_days
+    batch_size = batch_size or config['EVENT_COMPACT_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    started = time.perf_counter()
+
+    deliveries = events = 0
+    while True:
+        delivery_ids = {row[0] for row in
+                        db.session.query(DeliveryEvent.delivery_id)
+                        .filter(DeliveryEvent.occurred_at < cutoff)
+                        .order_by(DeliveryEvent.occurred_at)
+                        .limit(batch_size)}
+        if not delivery_ids:
+            break
+        folded, deleted = _fold(list(delivery_ids), cutoff)
+        deliveries += folded
+        events += deleted
+
+    return {
+        'deliveries': deliveries,
+        'events': events,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from app import app
+    from archive import find_by_tracking_number
+
+    parser = argparse.ArgumentParser(description='Delivery event log maintenance.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    compact_parser = commands.add_parser('compact', help='fold old events into per-delivery summaries')
+    compact_parser.add_argument('--days', type=int, help='keep events newer than this (default: EVENT_RETENTION_DAYS)')
+    compact_parser.add_argument('--batch-size', type=int, help='old events scanned per batch')
+    timeline_parser = commands.add_parser('timeline', help='print the status history of one delivery')
+    timeline_parser.add_argument('tracking_number')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'compact':
+            result = compact(args.days, args.batch_size)
+            print(f"✓ Folded {result['events']} events of {result['deliveries']} deliveries "
+                  f"in {result['elapsed_ms']} ms.")
+        else:
+            delivery = find_by_tracking_number(args.tracking_number)
+            if delivery is None:
+                print(f"✗ Delivery {args.tracking_number} not found.")
+                sys.exit(1)
+            summary, events = timeline(delivery.id)
+            if summary:
+                print(f"{summary.first_at:%Y-%m-%d %H:%M}  ... {summary.event_count} compacted events "
+                      f"({summary.first_status} → {summary.last_status}) until {summary.last_at:%Y-%m-%d %H:%M}")
+            for event in events:
+                print(f"{event.occurred_at:%Y-%m-%d %H:%M:%S}  {event.status:<10} {event.source:<15} {event.actor or '-'}")
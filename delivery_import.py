@@ -0,0 +1,334 @@
+"""
+Streaming bulk import of deliveries from CSV or NDJSON manifests.
+Rows are validated with the same rules as DeliveryForm, checked for
+duplicate tracking numbers one batch at a time and inserted with a single
+executemany per batch, so memory stays bounded by the batch size.
+
+Uploads from the admin page are queued: queue_import() spools the manifest
+to IMPORT_UPLOAD_DIR in chunks, records it in delivery_imports and enqueues
+an import_deliveries job (deduplicated by the file's checksum); the worker
+runs run_queued_import(), which streams the file from there.
+
+Command line usage:
+    python import_deliveries.py manifest.csv --user admin
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from models import db, Delivery, DeliveryImport
+from forms import DeliveryForm
+from status_counts import adjust
+from page_cache import deliveries_changed
+from delivery_events import record_events_where
+from archive import archived_tracking_numbers
+
+# Bytes copied per read when spooling an upload to disk
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+# Columns read from each manifest row
+IMPORT_FIELDS = ('tracking_number', 'recipient_name', 'recipient_address', 'recipient_phone',
+                 'description', 'weight', 'estimated_delivery_date', 'status')
+
+
+class ImportResult:
+    """Summary of an import: counts plus the first few row errors."""
+
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, line, tracking_number, messages):
+        """Record a rejected row, keeping at most max_errors details."""
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({
+                'line': line,
+                'tracking_number': tracking_number,
+                'errors': messages,
+            })
+
+    @property
+    def truncated(self):
+        return self.error_count > len(self.errors)
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.truncated,
+        }
+
+
+def detect_format(filename, default='csv'):
+    """Guess the manifest format from its file extension."""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_rows(stream, fmt):
+    """
+    Yield (line_number, row_dict) pairs from a binary stream.
+    Reads incrementally; the whole file is never held in memory.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'ndjson':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'__error__': f'Invalid JSON: {e}'}
+                continue
+            if not isinstance(row, dict):
+                row = {'__error__': 'Each line must be a JSON object.'}
+            yield line_number, row
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Header is line 1, so data rows start at line 2
+            yield reader.line_num, row
+
+
+def new_validator():
+    """
+    Build the DeliveryForm used to validate manifest rows.
+    One instance is reused for the whole import; binding a fresh form per row
+    costs more than the insert itself.
+    """
+    return DeliveryForm(formdata=None, meta={'csrf': False})
+
+
+def validate_row(row, form):
+    """
+    Validate one manifest row with DeliveryForm (see new_validator).
+    Returns (values, errors): a dict ready to insert, or a list of messages.
+    """
+    if '__error__' in row:
+        return None, [row['__error__']]
+
+    formdata = MultiDict()
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if value is None:
+            continue
+        formdata[field] = str(value).strip()
+    # Manifests usually omit the status of new parcels
+    formdata.setdefault('status', 'ongoing')
+    if not formdata['status']:
+        formdata['status'] = 'ongoing'
+
+    form.process(formdata)
+    if not form.validate():
+        errors = [f'{name}: {message}'
+                  for name, messages in form.errors.items()
+                  for message in messages]
+        return None, errors
+
+    values = {field: form[field].data for field in IMPORT_FIELDS}
+    if not values['description']:
+        values['description'] = None
+    return values, None
+
+
+def _existing_tracking_numbers(tracking_numbers):
+    """Return which of the given tracking numbers already exist, live or archived."""
+    if not tracking_numbers:
+        return set()
+    rows = (db.session.query(Delivery.tracking_number)
+            .filter(Delivery.tracking_number.in_(tracking_numbers))
+            .all())
+    return {row.tracking_number for row in rows} | archived_tracking_numbers(tracking_numbers)
+
+
+def _status_deltas(rows):
+    deltas = {}
+    for row in rows:
+        deltas[row['status']] = deltas.get(row['status'], 0) + 1
+    return deltas
+
+
+def _record_import_events(rows):
+    """Log the initial status of just-inserted rows, found by tracking number."""
+    record_events_where(Delivery.tracking_number.in_([values['tracking_number'] for values in rows]),
+                        actor_id=rows[0]['created_by_id'], source='import')
+
+
+def _insert_batch(rows, result):
+    """
+    Insert a batch with one executemany and commit it.
+    If a concurrent writer grabbed a tracking number in the meantime, fall
+    back to row-by-row inserts so only the conflicting rows are rejected.
+    """
+    try:
+        db.session.execute(insert(Delivery.__table__), [values for _, values in rows])
+        _record_import_events([values for _, values in rows])
+        adjust(_status_deltas(values for _, values in rows))
+        deliveries_changed()
+        db.session.commit()
+        result.inserted += len(rows)
+        return
+    except IntegrityError:
+        db.session.rollback()
+
+    for line, values in rows:
+        try:
+            db.session.execute(insert(Delivery.__table__), [values])
+            _record_import_events([values])
+            adjust({values['status']: 1})
+            deliveries_changed()
+            db.session.commit()
+            result.inserted += 1
+        except IntegrityError:
+            db.session.rollback()
+            result.add_error(line, values['tracking_number'], ['Tracking number already exists.'])
+
+
+def _process_batch(batch, form, created_by_id, result):
+    valid = []
+    seen = set()
+    today = date.today()
+    for line, row in batch:
+        result.rows += 1
+        values, errors = validate_row(row, form)
+        if errors:
+            result.add_error(line, row.get('tracking_number'), errors)
+            continue
+        if values['tracking_number'] in seen:
+            result.add_error(line, values['tracking_number'], ['Duplicate tracking number in file.'])
+            continue
+        seen.add(values['tracking_number'])
+
+        values['created_by_id'] = created_by_id
+        # Set actual delivery date if status is delivered
+        values['actual_delivery_date'] = today if values['status'] == 'delivered' else None
+        valid.append((line, values))
+
+    # Earlier batches are already committed, so this also catches
+    # duplicates between batches of the same file
+    existing = _existing_tracking_numbers(seen)
+    rows = []
+    for line, values in valid:
+        if values['tracking_number'] in existing:
+            result.add_error(line, values['tracking_number'], ['Tracking number already exists.'])
+        else:
+            rows.append((line, values))
+    if rows:
+        _insert_batch(rows, result)
+
+
+def import_deliveries(stream, fmt, created_by_id, batch_size=None, max_errors=None):
+    """
+    Import a CSV/NDJSON manifest from a binary stream.
+    Each batch is committed on its own; a bad row never aborts the import.
+    """
+    config = current_app.config
+    batch_size = batch_size or config['IMPORT_BATCH_SIZE']
+    result = ImportResult(max_errors or config['IMPORT_MAX_REPORTED_ERRORS'])
+
+    form = new_validator()
+    rows = iter_rows(stream, fmt)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _process_batch(batch, form, created_by_id, result)
+    return result
+
+
+def spool_upload(stream, fmt):
+    """
+    Copy an uploaded manifest to a new file in IMPORT_UPLOAD_DIR, hashing it
+    on the way. Returns (file name, SHA-256 hex digest).
+    """
+    directory = current_app.config['IMPORT_UPLOAD_DIR']
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix='import-', suffix=f'.{fmt}', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            for chunk in iter(lambda: stream.read(SPOOL_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                spool.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return os.path.basename(path), digest.hexdigest()
+
+
+def upload_path(upload):
+    """Full path of a queued import's spooled manifest."""
+    return os.path.join(current_app.config['IMPORT_UPLOAD_DIR'], upload.path)
+
+
+def queue_import(stream, filename, fmt, created_by_id):
+    """
+    Spool an uploaded manifest to disk and queue the job that imports it.
+    Returns (DeliveryImport, Job); while the same file is still queued or
+    running, that earlier import and its job. Does not commit.
+    """
+    import jobs
+
+    name, checksum = spool_upload(stream, fmt)
+    upload = DeliveryImport(filename=filename, format=fmt, checksum=checksum,
+                            path=name, created_by_id=created_by_id)
+    try:
+        db.session.add(upload)
+        db.session.flush()
+        job = jobs.enqueue('import_deliveries', {'import_id': upload.id},
+                           dedup_key=f'import_deliveries:{checksum}')
+    except Exception:
+        os.remove(upload_path(upload))
+        raise
+    if job.payload and json.loads(job.payload)['import_id'] != upload.id:
+        os.remove(upload_path(upload))
+        db.session.delete(upload)
+        return db.session.get(DeliveryImport, json.loads(job.payload)['import_id']), job
+    upload.job_id = job.id
+    return upload, job
+
+
+def run_queued_import(import_id):
+    """
+    Import a manifest spooled by queue_import(), keep its report and delete
+    the file. A second run (after the job's lease ran out) returns the first
+    run's report. Returns the report without the per-row errors.
+    """
+    upload = db.session.get(DeliveryImport, import_id)
+    if upload is None:
+        raise LookupError(f'Delivery import {import_id} not found.')
+    if upload.path is None and upload.report is None:
+        raise LookupError(f'Delivery import {import_id} has no manifest file left to import.')
+    if upload.path is not None:
+        path, fmt, created_by_id = upload_path(upload), upload.format, upload.created_by_id
+        with open(path, 'rb') as manifest:
+            result = import_deliveries(manifest, fmt, created_by_id)
+        # Each batch's commit expired the instance
+        upload = db.session.get(DeliveryImport, import_id)
+        upload.report = json.dumps(result.to_dict())
+        upload.path = None
+        db.session.commit()
+        # Only once the report is saved: a run cut short starts over from the file
+        os.remove(path)
+    report = json.loads(upload.report)
+    return {key: report[key] for key in ('rows', 'inserted', 'error_count')}
@@ -0,0 +1,126 @@
+"""
+Print the query plan of every dashboard query.
+Builds each query with the same helpers the routes use and runs EXPLAIN on
+it (EXPLAIN QUERY PLAN on SQLite), flagging full scans of the delivery table
+and sorts that don't come from an index.
+
+Usage:
+    python explain_queries.py
+Exits with status 1 if any query still needs a full table scan.
+"""
+
+import sys
+from datetime import date, datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from app import app
+from models import db, Delivery, DeliveryStatusCount
+from pagination import apply_filters, encode_cursor, keyset_query, row_query
+
+SAMPLE_CURSOR = encode_cursor(datetime.utcnow(), 1)
+TODAY = date.today()
+
+
+def dashboard_queries():
+    """Return (label, query) pairs for every query a dashboard request runs."""
+    page_size = app.config['DELIVERIES_PER_PAGE'] + 1
+    week = {'date_from': TODAY - timedelta(days=7), 'date_to': TODAY}
+    return [
+        ('dashboard: first page',
+         keyset_query(row_query(), None, page_size)),
+        ('dashboard: next page (cursor)',
+         keyset_query(row_query(), SAMPLE_CURSOR, page_size)),
+        ('dashboard: status filter',
+         keyset_query(apply_filters(row_query(), {'status': 'late'}), None, page_size)),
+        ('dashboard: date range filter',
+         keyset_query(apply_filters(row_query(), week), None, page_size)),
+        ('dashboard: status + date range, next page',
+         keyset_query(apply_filters(row_query(), dict(week, status='ongoing')), SAMPLE_CURSOR, page_size)),
+        ('dashboard: status cards',
+         DeliveryStatusCount.query),
+        ('view_delivery: by id',
+         Delivery.query.filter(Delivery.id == 1)),
+        ('create/edit: tracking number lookup',
+         Delivery.query.filter(Delivery.tracking_number == 'TRK0001')),
+        ('late detection: overdue, not delivered',
+         Delivery.query.filter(Delivery.status.in_(('ongoing', 'in_route')),
+                               Delivery.estimated_delivery_date < TODAY)),
+        ('search: tracking number prefix',
+         row_query().filter(Delivery.tracking_number >= 'TRK',
+                            Delivery.tracking_number < 'TRK\U0010ffff')
+                    .order_by(Delivery.tracking_number)),
+        ('deliveries by creator',
+         Delivery.query.filter(Delivery.created_by_id == 1)),
+        ('deliveries by last updater',
+         Delivery.query.filter(Delivery.updated_by_id == 1)),
+    ]
+
+
+def explain(query):
+    """Run the dialect's EXPLAIN for a query and return the plan lines."""
+    connection = db.session.connection()
+    dialect = connection.dialect
+    # Expand IN lists so the statement can be sent to the driver as-is
+    compiled = query.statement.compile(dialect=dialect,
+                                       compile_kwargs={'render_postcompile': True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+        # Columns are (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql(f'EXPLAIN {compiled}', params).fetchall()
+    return [row[0] for row in rows]
+
+
+def problems(plan):
+    """Return the plan lines that indicate a full scan or an unindexed sort."""
+    flagged = []
+    for line in plan:
+        text = line.strip()
+        # SQLite: "SCAN delivery" without an index, or a temp b-tree sort
+        if text == 'SCAN delivery' or text.startswith('SCAN delivery ') and 'INDEX' not in text:
+            flagged.append(text)
+        elif 'USE TEMP B-TREE FOR ORDER BY' in text:
+            flagged.append(text)
+        # PostgreSQL: sequential scan of the delivery table
+        elif 'Seq Scan on delivery ' in text or text.endswith('Seq Scan on delivery'):
+            flagged.append(text)
+    return flagged
+
+
+def main():
+    full_scans = 0
+    with app.app_context():
+        print(f"Database: {db.engine.dialect.name}\n")
+        for label, query in dashboard_queries():
+            try:
+                plan = explain(query)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                reason = getattr(e, 'orig', None) or e
+                print(f"✗ {label}\n    could not explain: {reason}\n")
+                full_scans += 1
+                continue
+            flagged = problems(plan)
+            mark = '✗' if flagged else '✓'
+            print(f"{mark} {label}")
+            for line in plan:
+                print(f"    {line}")
+            for line in flagged:
+                print(f"    ⚠️  {line}")
+            print()
+            full_scans += bool(flagged)
+
+    if full_scans:
+        print(f"✗ {full_scans} query(s) still scan or sort the delivery table, or failed.")
+        print("  Run 'python migrations.py' to create the missing indexes.")
+        return 1
+    print("✓ No full table scans.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,10 @@ Handles login, registration, and delivery forms.
 """
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, DateField, FloatField, SelectField, PasswordField
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import (StringField, TextAreaField, DateField, FloatField, SelectField, PasswordField,
+                     IntegerField)
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange
 
 
@@ -40,6 +43,8 @@ class DeliveryForm(FlaskForm):
                             ('delivered', 'Delivered')
                         ],
                         validators=[DataRequired()])
+    # Delivery.version the form was loaded at (optimistic concurrency check)
+    version = IntegerField(widget=HiddenInput(), validators=[Optional()])
 
 
 class StatusUpdateForm(FlaskForm):
@@ -52,4 +57,37 @@ class StatusUpdateForm(FlaskForm):
                             ('delivered', 'Delivered')
                         ],
                         validators=[DataRequired()])
+    version = IntegerField(widget=HiddenInput(), validators=[Optional()])
 
+
+def set_version(form, version):
+    """Point a form's hidden version field at a newer Delivery.version."""
+    form.version.data = version
+    # Fields render the submitted raw value when there is one
+    form.version.raw_data = None
+
+
+class JobForm(FlaskForm):
+    """Form for queueing a maintenance job (admin only); choices are set by the route."""
+    task = SelectField('Task', choices=[], validators=[DataRequired()])
+
+
+class DispatchForm(FlaskForm):
+    """Form for planning truck loads (admin only); defaults are set by the route."""
+    trucks = IntegerField('Trucks', validators=[DataRequired(), NumberRange(min=1, max=10000)])
+    capacity_kg = FloatField('Capacity per truck (kg)', validators=[DataRequired(), NumberRange(min=0.1)])
+
+
+class DeliveryImportForm(FlaskForm):
+    """Form for uploading a CSV/NDJSON delivery manifest (admin only)."""
+    manifest = FileField('Manifest File', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'ndjson', 'jsonl', 'json'], 'CSV or NDJSON files only.')
+    ])
+    format = SelectField('Format',
+                         choices=[
+                             ('auto', 'Detect from file extension'),
+                             ('csv', 'CSV'),
+                             ('ndjson', 'NDJSON (one JSON object per line)')
+                         ],
+                         default='auto')
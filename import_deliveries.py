@@ -0,0 +1,58 @@
+"""
+Bulk delivery import script.
+Streams a CSV or NDJSON manifest into the database in batches.
+
+Usage:
+    python import_deliveries.py manifest.csv [--format csv|ndjson] [--user admin] [--batch-size 1000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from app import app
+from models import User
+from delivery_import import detect_format, import_deliveries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import deliveries from a CSV/NDJSON manifest.')
+    parser.add_argument('path', help='manifest file, or - for stdin')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='defaults to the file extension')
+    parser.add_argument('--user', default='admin', help='username recorded as the creator')
+    parser.add_argument('--batch-size', type=int, help='rows per insert transaction')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    with app.app_context():
+        user = User.query.filter_by(username=args.user).first()
+        if not user:
+            print(f"✗ User '{args.user}' not found.", file=sys.stderr)
+            return 2
+
+        started = time.perf_counter()
+        if args.path == '-':
+            result = import_deliveries(sys.stdin.buffer, fmt, user.id, batch_size=args.batch_size)
+        else:
+            with open(args.path, 'rb') as stream:
+                result = import_deliveries(stream, fmt, user.id, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(result.to_dict(), indent=2))
+    else:
+        print(f"✓ Read {result.rows} rows, inserted {result.inserted} in {elapsed:.2f}s "
+              f"({result.rows / elapsed if elapsed else 0:.0f} rows/s).")
+        if result.error_count:
+            print(f"✗ {result.error_count} row(s) rejected:")
+            for error in result.errors:
+                print(f"  line {error['line']} [{error['tracking_number'] or '-'}]: "
+                      f"{'; '.join(error['errors'])}")
+            if result.truncated:
+                print(f"  ... {result.error_count - len(result.errors)} more not shown")
+    return 1 if result.error_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
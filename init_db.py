@@ -6,15 +6,21 @@ Run this script once to set up the database.
 
 from app import app, db
 from models import User
+from migrations import upgrade
 
 def init_database():
     """Initialize the database with tables and default users."""
     with app.app_context():
         # Create all database tables
         print("Creating database tables...")
-        db.create_all()
+        db.create_all(bind_key=None)
         print("✓ Database tables created successfully!")
         
+        # Bring existing databases up to date (indexes, summary tables)
+        print("\nApplying schema migrations...")
+        upgrade()
+        print("✓ Schema is up to date!")
+        
         # Check if admin user already exists
         admin = User.query.filter_by(username='admin').first()
         if not admin:
@@ -0,0 +1,440 @@
+"""
+Background jobs on a durable queue in the application database.
+Routes enqueue() work inside their own transaction and return right away;
+a Worker (threads in the web process when JOB_WORKER_THREADS is set, or
+"python jobs.py work" as its own process) claims due jobs from the jobs
+table and runs the registered task function in a fresh app context.
+
+- Retries: a task that raises is retried after an exponential backoff
+  (JOB_RETRY_BASE_SECONDS doubled per attempt, capped at
+  JOB_RETRY_MAX_SECONDS, with jitter) until max_attempts is used up.
+- Deduplication: jobs enqueued with the same dedup_key while one is still
+  queued or running share that job.
+- Crash recovery: a claimed job carries a lease of JOB_TIMEOUT seconds. If
+  its worker dies, another worker claims it again once the lease runs out,
+  so tasks must be safe to run twice (the maintenance tasks below are). A
+  job whose lease runs out on its last attempt is marked failed instead.
+
+Claiming uses FOR UPDATE SKIP LOCKED on PostgreSQL, so workers in several
+processes never wait on each other; on SQLite the conditional UPDATE that
+marks the job running decides which worker got it.
+
+Usage:
+    python jobs.py work [--threads N] [--once]
+    python jobs.py enqueue NAME [--payload JSON] [--dedup-key KEY]
+    python jobs.py list [--status failed]
+    python jobs.py purge [--days N]
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Job
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+# Stored result/error text is cut to this many characters
+MAX_TEXT = 4000
+
+# name -> task function, filled by @task
+TASKS = {}
+
+# Tasks admins may queue from the jobs page: name -> label
+MAINTENANCE_TASKS = {}
+
+
+def task(name, label=None):
+    """Register a function as a job task; with a label it is offered on the admin jobs page."""
+    def register(func):
+        TASKS[name] = func
+        if label:
+            MAINTENANCE_TASKS[name] = label
+        return func
+    return register
+
+
+def enqueue(name, payload=None, dedup_key=None, delay=0, max_attempts=None):
+    """
+    Queue a task run and return its Job. payload holds the task's keyword
+    arguments and must be JSON serialisable. With a dedup_key that is
+    already queued or running, that job is returned instead. Does not
+    commit; the caller's commit covers it (call wake() afterwards).
+    """
+    if name not in TASKS:
+        raise ValueError(f'Unknown job task {name!r}.')
+    if dedup_key:
+        existing = Job.query.filter_by(dedup_key=dedup_key).first()
+        if existing is not None:
+            return existing
+
+    job = Job(
+        name=name,
+        payload=json.dumps(payload, sort_keys=True) if payload else None,
+        dedup_key=dedup_key,
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    if not dedup_key:
+        db.session.add(job)
+        db.session.flush()
+        return job
+    try:
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        # Someone else queued the same work a moment ago
+        return Job.query.filter_by(dedup_key=dedup_key).one()
+    return job
+
+
+def retry_delay(attempt, config):
+    """Seconds to wait before retrying after the given (1-based) failed attempt."""
+    delay = min(config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempt - 1), config['JOB_RETRY_MAX_SECONDS'])
+    # Equal jitter, so jobs that failed together don't all retry together
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _to_text(value):
+    return value if value is None or len(value) <= MAX_TEXT else value[:MAX_TEXT - 3] + '...'
+
+
+def _abandoned(table, now):
+    return (table.c.status == 'running') & (table.c.locked_until < now)
+
+
+def _due(table, now):
+    queued = (table.c.status == 'queued') & (table.c.run_at <= now)
+    return queued | (_abandoned(table, now) & (table.c.attempts < table.c.max_attempts))
+
+
+def _fail_abandoned(now):
+    """Mark jobs whose lease ran out on their last attempt as failed, freeing their dedup_key."""
+    table = Job.__table__
+    failed = db.session.execute(
+        update(table)
+        .where(_abandoned(table, now), table.c.attempts >= table.c.max_attempts)
+        .values(status='failed', finished_at=now, locked_by=None, locked_until=None, dedup_key=None,
+                last_error='Lease expired on the last attempt: the worker died or ran past JOB_TIMEOUT.')
+    ).rowcount
+    if failed:
+        db.session.commit()
+        current_app.logger.error("%d job(s) failed: lease expired on the last attempt", failed)
+
+
+def _claim(worker_id, lease_seconds):
+    """Mark the next due job as running for this worker and commit. Returns it or None."""
+    table = Job.__table__
+    now = datetime.utcnow()
+    _fail_abandoned(now)
+    job_id = db.session.execute(
+        select(table.c.id)
+        .where(_due(table, now))
+        .order_by(table.c.run_at, table.c.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar()
+    if job_id is None:
+        db.session.rollback()
+        return None
+
+    # Only one worker's UPDATE still finds the job due
+    claimed = db.session.execute(
+        update(table)
+        .where(table.c.id == job_id, _due(table, now))
+        .values(status='running', attempts=table.c.attempts + 1, started_at=now,
+                locked_by=worker_id, locked_until=now + timedelta(seconds=lease_seconds))
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+    return db.session.get(Job, job_id, populate_existing=True)
+
+
+def _settle(job_id, attempt, worker_id, **values):
+    """Record a job's outcome, unless its lease ran out and another worker took it over."""
+    table = Job.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == job_id, table.c.locked_by == worker_id, table.c.attempts == attempt)
+        .values(locked_by=None, locked_until=None, **values)
+    )
+    db.session.commit()
+
+
+def run_job(job, worker_id):
+    """Run a claimed job's task and record success, a retry or the final failure."""
+    config = current_app.config
+    # Read up front: the task's own commits expire the instance
+    job_id, name, attempt, max_attempts = job.id, job.name, job.attempts, job.max_attempts
+    payload = json.loads(job.payload) if job.payload else {}
+    started = time.perf_counter()
+    try:
+        func = TASKS.get(name)
+        if func is None:
+            raise LookupError(f'No task registered as {name!r}.')
+        result = func(**payload)
+    except Exception as e:
+        db.session.rollback()
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        error = _to_text(''.join(traceback.format_exception(type(e), e, e.__traceback__)))
+        if attempt < max_attempts:
+            delay = retry_delay(attempt, config)
+            current_app.logger.warning("Job %d (%s) failed on attempt %d/%d, retrying in %.1f s: %s",
+                                       job_id, name, attempt, max_attempts, delay, e)
+            _settle(job_id, attempt, worker_id, status='queued', duration_ms=duration_ms, last_error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay))
+            return 'retrying'
+        current_app.logger.error("Job %d (%s) failed after %d attempts: %s", job_id, name, attempt, e)
+        _settle(job_id, attempt, worker_id, status='failed', duration_ms=duration_ms, last_error=error,
+                finished_at=datetime.utcnow(), dedup_key=None)
+        return 'failed'
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    _settle(job_id, attempt, worker_id, status='succeeded', duration_ms=duration_ms,
+            finished_at=datetime.utcnow(), dedup_key=None,
+            result=_to_text(json.dumps(result, default=str)) if result is not None else None)
+    return 'succeeded'
+
+
+class Worker:
+    """
+    A small pool of threads that claim and run due jobs, polling every
+    poll_interval seconds when the queue is empty (or sooner after wake()).
+    """
+
+    def __init__(self, app, threads=2, poll_interval=1.0):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._counts = {'succeeded': 0, 'retrying': 0, 'failed': 0}
+
+    def start(self):
+        self._stop.clear()
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._loop, args=(f'{self.name}:{index}',),
+                                      name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Look for work now instead of at the next poll."""
+        self._wakeup.set()
+
+    def run_once(self, worker_id=None):
+        """Claim and run one due job. Returns its outcome, or None if nothing was due."""
+        worker_id = worker_id or f'{self.name}:main'
+        with self.app.app_context():
+            job = _claim(worker_id, self.app.config['JOB_TIMEOUT'])
+            if job is None:
+                return None
+            outcome = run_job(job, worker_id)
+        with self._lock:
+            self._counts[outcome] += 1
+        return outcome
+
+    def _loop(self, worker_id):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                outcome = self.run_once(worker_id)
+                failures = 0
+            except Exception as e:
+                # Database unreachable or the jobs table not created yet
+                # (before the first request's migrations): back off, and
+                # only log the first failure in a row
+                failures += 1
+                if failures == 1:
+                    self.app.logger.warning("Job worker %s can't read the queue, retrying: %s",
+                                            worker_id, str(e).splitlines()[0])
+                self._stop.wait(min(self.poll_interval * 2 ** failures, 60))
+                continue
+            if outcome is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def status(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return dict(counts, name=self.name, threads=self.threads,
+                    alive=sum(1 for thread in self._threads if thread.is_alive()))
+
+
+# The worker running inside this process, if any
+worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker(app, threads):
+    """Run a Worker inside the web process (JOB_WORKER_THREADS); only the first call starts one."""
+    global worker
+    with _worker_lock:
+        if worker is None:
+            worker = Worker(app, threads, app.config['JOB_POLL_INTERVAL'])
+            worker.start()
+    return worker
+
+
+def wake():
+    """Tell this process's worker about newly committed jobs."""
+    if worker is not None:
+        worker.wake()
+
+
+def worker_status():
+    return worker.status() if worker is not None else None
+
+
+def queue_counts():
+    """Number of jobs per status, for the admin page."""
+    counts = {status: 0 for status in JOB_STATUSES}
+    counts.update(db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    return counts
+
+
+def recent_jobs(status=None, limit=50):
+    query = Job.query
+    if status:
+        query = query.filter(Job.status == status)
+    return query.order_by(Job.id.desc()).limit(limit).all()
+
+
+def purge(older_than_days=None):
+    """Delete succeeded and failed jobs that finished more than older_than_days ago; commits."""
+    days = current_app.config['JOB_RETENTION_DAYS'] if older_than_days is None else older_than_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.session.execute(
+        delete(Job.__table__)
+        .where(Job.status.in_(('succeeded', 'failed')), Job.finished_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+# Built-in tasks. Each one commits its own work and returns a JSON-friendly
+# summary; imports are deferred so workers only load what they run.
+
+@task('mark_late', 'Detect late deliveries')
+def _mark_late():
+    from late_detection import mark_late_deliveries
+    from live_updates import publish_changes
+    result = mark_late_deliveries()
+    if result['marked']:
+        publish_changes()
+    return result
+
+
+@task('rebuild_status_counts', 'Rebuild status counters')
+def _rebuild_status_counts():
+    from status_counts import rebuild
+    return rebuild()
+
+
+@task('archive_delivered', 'Archive old delivered parcels')
+def _archive_delivered(older_than_days=None):
+    from archive import archive_delivered
+    from live_updates import publish_changes
+    result = archive_delivered(older_than_days)
+    if result['archived']:
+        publish_changes()
+    return result
+
+
+@task('compact_events', 'Compact the delivery event log')
+def _compact_events(older_than_days=None):
+    from delivery_events import compact
+    return compact(older_than_days)
+
+
+@task('import_deliveries')
+def _import_deliveries(import_id):
+    from delivery_import import run_queued_import
+    from live_updates import publish_changes
+    result = run_queued_import(import_id)
+    if result['inserted']:
+        publish_changes()
+    return result
+
+
+@task('purge_jobs', 'Purge finished jobs')
+def _purge_jobs(older_than_days=None):
+    return {'deleted': purge(older_than_days)}
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from app import app
+    # The module whose TASKS and worker app.py uses, not this __main__ copy
+    import jobs
+
+    parser = argparse.ArgumentParser(description='Durable background job queue.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    work_parser = commands.add_parser('work', help='run queued jobs until interrupted')
+    work_parser.add_argument('--threads', type=int, default=2)
+    work_parser.add_argument('--once', action='store_true', help='run every due job, then exit')
+    enqueue_parser = commands.add_parser('enqueue', help='queue one job')
+    enqueue_parser.add_argument('name', choices=sorted(jobs.TASKS))
+    enqueue_parser.add_argument('--payload', help='JSON object of keyword arguments')
+    enqueue_parser.add_argument('--dedup-key')
+    list_parser = commands.add_parser('list', help='show recent jobs')
+    list_parser.add_argument('--status', choices=JOB_STATUSES)
+    list_parser.add_argument('--limit', type=int, default=20)
+    purge_parser = commands.add_parser('purge', help='delete old finished jobs')
+    purge_parser.add_argument('--days', type=int, help='default: JOB_RETENTION_DAYS')
+    args = parser.parse_args()
+
+    with app.app_context():
+        # The jobs table on databases created before it
+        db.create_all(bind_key=None)
+
+    if args.command == 'work':
+        runner = jobs.Worker(app, args.threads, app.config['JOB_POLL_INTERVAL'])
+        if args.once:
+            ran = 0
+            while runner.run_once():
+                ran += 1
+            print(f"✓ Ran {ran} job(s): {runner.status()}")
+            sys.exit(0)
+        print(f"Worker {runner.name} running {args.threads} thread(s); Ctrl+C to stop.")
+        runner.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            runner.stop(timeout=app.config['JOB_TIMEOUT'])
+            print(f"\n✓ Stopped: {runner.status()}")
+        sys.exit(0)
+
+    with app.app_context():
+        if args.command == 'enqueue':
+            job = jobs.enqueue(args.name, json.loads(args.payload) if args.payload else None, args.dedup_key)
+            db.session.commit()
+            print(f"✓ Job #{job.id} {job.name} is {job.status}.")
+        elif args.command == 'list':
+            for job in jobs.recent_jobs(args.status, args.limit):
+                timing = f"{job.duration_ms:.0f} ms" if job.duration_ms is not None else '-'
+                error = job.last_error.strip().splitlines()[-1] if job.last_error else ''
+                print(f"#{job.id:<6} {job.name:<22} {job.status:<10} {job.attempts}/{job.max_attempts}  "
+                      f"{job.created_at:%Y-%m-%d %H:%M:%S}  {timing:>10}  {error}")
+        else:
+            print(f"✓ Deleted {jobs.purge(args.days)} finished job(s).")
@@ -0,0 +1,88 @@
+"""
+Automatic late-delivery detection.
+Marks every delivery that is not delivered and whose estimated delivery
+date has passed as 'late', using set-based UPDATEs served by the
+(status, estimated_delivery_date) index instead of loading rows.
+
+Can run from the command line (python mark_late.py) or in-process on a
+timer by setting LATE_DETECTION_INTERVAL (seconds) in the environment.
+"""
+
+import threading
+import time
+from datetime import date, datetime
+from sqlalchemy import update
+from models import db, Delivery
+from status_counts import adjust
+from page_cache import deliveries_changed
+from delivery_events import record_events_where
+from live_updates import publish_changes
+
+# Statuses that become 'late' once the estimated delivery date has passed
+LATE_CANDIDATE_STATUSES = ('ongoing', 'in_route')
+
+
+def mark_late_deliveries(today=None):
+    """
+    Mark overdue deliveries as late and commit.
+    Runs one UPDATE per candidate status so the exact number of rows leaving
+    each status is known from the rowcount, which keeps the status counters
+    consistent without a separate COUNT.
+    Returns {'marked', 'by_status', 'elapsed_ms'}.
+    """
+    today = today or date.today()
+    started = time.perf_counter()
+    table = Delivery.__table__
+    now = datetime.utcnow()
+
+    by_status = {}
+    for status in LATE_CANDIDATE_STATUSES:
+        overdue = (table.c.status == status) & (table.c.estimated_delivery_date < today)
+        # Log the transitions first, while the rows still match
+        record_events_where(overdue, status='late', source='late_detection')
+        result = db.session.execute(
+            update(table)
+            .where(overdue)
+            .values(status='late', updated_at=now, version=table.c.version + 1)
+        )
+        by_status[status] = result.rowcount
+
+    marked = sum(by_status.values())
+    deltas = {status: -count for status, count in by_status.items()}
+    deltas['late'] = marked
+    adjust(deltas)
+    if marked:
+        # Row ids aren't known here; cached rows miss on their new updated_at
+        deliveries_changed()
+    db.session.commit()
+
+    return {
+        'marked': marked,
+        'by_status': by_status,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def start_scheduler(app, interval):
+    """
+    Run mark_late_deliveries every interval seconds in a daemon thread.
+    Meant for long-running servers; serverless instances should call the
+    script from an external scheduler instead.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    result = mark_late_deliveries()
+                    if result['marked']:
+                        publish_changes()
+                        app.logger.info("Late detection: marked %d deliveries in %.1f ms",
+                                        result['marked'], result['elapsed_ms'])
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Late detection failed")
+
+    thread = threading.Thread(target=run, name='late-detection', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,209 @@
+"""
+Live dashboard updates over server-sent events.
+After a delivery write commits, the route publishes one message with the
+changed delivery rows and the new status counts. Every open dashboard
+stream in the process receives it from the broker and forwards it, so a
+floor display no longer reloads the whole page (and re-runs its queries).
+
+Messages carry a cursor: the highest delivery_event id at publish time.
+A client that reconnects sends it back (EventSource does this with
+Last-Event-ID) and is sent the deliveries changed since then, read from the
+event log, instead of reloading everything.
+
+The broker is pluggable (LIVE_UPDATES_BROKER). The default 'memory' broker
+only fans out within one process; with several workers or instances,
+configure a shared backend ("module:Class") exposing the same publish /
+subscribe / has_subscribers methods. Messages are plain JSON-compatible
+dicts so they can cross process boundaries.
+"""
+
+import importlib
+import queue
+import threading
+from datetime import datetime
+from sqlalchemy import func
+from models import db, Delivery, DeliveryEvent
+from status_counts import get_counts
+from delivery_events import STATUS_CODES
+from pagination import DeliveryRow, row_query, to_rows
+
+
+class Subscription:
+    """One listener's bounded queue of messages."""
+
+    def __init__(self, broker, maxsize):
+        self._broker = broker
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # A client this far behind gets a reload instead of a backlog
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Next message, or None if none arrived within timeout seconds."""
+        if self.overflowed:
+            self.overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return {'reload': True}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """In-process pub/sub: every subscriber gets its own bounded queue."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def subscribe(self):
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+
+# Replaced by init_app() according to LIVE_UPDATES_BROKER
+broker = MemoryBroker()
+
+
+def init_app(app):
+    """Create the broker named by LIVE_UPDATES_BROKER ('memory' or 'module:Class')."""
+    global broker
+    name = app.config['LIVE_UPDATES_BROKER']
+    if name == 'memory':
+        broker = MemoryBroker(app.config['LIVE_UPDATES_QUEUE_SIZE'])
+    else:
+        module_name, class_name = name.split(':', 1)
+        broker = getattr(importlib.import_module(module_name), class_name)(app)
+
+
+def subscribe():
+    """Subscribe to the configured broker; close() the subscription when done."""
+    return broker.subscribe()
+
+
+def current_cursor():
+    """Highest delivery_event id so far (primary-key lookup)."""
+    return db.session.query(func.max(DeliveryEvent.id)).scalar() or 0
+
+
+def _row_payloads(delivery_ids):
+    rows = to_rows(row_query().filter(Delivery.id.in_(list(delivery_ids))))
+    return [{
+        'id': row.id,
+        'tracking_number': row.tracking_number,
+        'recipient_name': row.recipient_name,
+        'recipient_address': row.recipient_address,
+        'status': row.status,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+    } for row in rows]
+
+
+def build_message(delivery_ids=None, deleted_ids=(), cursor=None):
+    """
+    Message for a set of changed deliveries plus the current counts.
+    delivery_ids=None means "too many to list": clients reload.
+    """
+    message = {
+        'cursor': cursor if cursor is not None else current_cursor(),
+        'counts': get_counts(),
+        'deliveries': [],
+        'deleted': list(deleted_ids),
+        'reload': delivery_ids is None,
+    }
+    if delivery_ids:
+        message['deliveries'] = _row_payloads(delivery_ids)
+    return message
+
+
+def publish_changes(delivery_ids=None, deleted_ids=(), tracking_numbers=None):
+    """
+    Publish committed delivery changes to live dashboards. Call after commit.
+    Changed deliveries may be given by id or by tracking number; with
+    neither, clients reload. Does nothing when nobody is listening.
+    """
+    if not broker.has_subscribers():
+        return
+    try:
+        if tracking_numbers is not None:
+            delivery_ids = [row[0] for row in db.session.query(Delivery.id)
+                            .filter(Delivery.tracking_number.in_(tracking_numbers))]
+        broker.publish(build_message(delivery_ids, deleted_ids))
+    except Exception:
+        # Live updates are best effort; the write itself already succeeded
+        db.session.rollback()
+
+
+def catch_up(cursor, max_changes):
+    """
+    Message with everything changed after cursor, read from the event log.
+    Returns None if nothing changed, or a reload message if the cursor is
+    too old (compacted away) or too much changed.
+    """
+    first = db.session.query(func.min(DeliveryEvent.id)).scalar()
+    if first is not None and cursor < first - 1:
+        return build_message(None)
+
+    rows = (db.session.query(DeliveryEvent.id, DeliveryEvent.delivery_id, DeliveryEvent.status)
+            .filter(DeliveryEvent.id > cursor)
+            .order_by(DeliveryEvent.id)
+            .limit(max_changes + 1)
+            .all())
+    if not rows:
+        return None
+    if len(rows) > max_changes:
+        return build_message(None)
+
+    latest = {}  # delivery_id -> last status code
+    for _, delivery_id, status in rows:
+        latest[delivery_id] = status
+    deleted = [delivery_id for delivery_id, status in latest.items() if status == STATUS_CODES['deleted']]
+    changed = [delivery_id for delivery_id, status in latest.items() if status != STATUS_CODES['deleted']]
+    return build_message(changed, deleted, cursor=rows[-1][0])
+
+
+def parse_cursor(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def to_row(payload):
+    """Turn a message's delivery dict back into something the row templates can render."""
+    return DeliveryRow(
+        payload['id'],
+        payload['tracking_number'],
+        payload['recipient_name'],
+        payload['recipient_address'] or '',
+        payload['status'],
+        datetime.fromisoformat(payload['created_at']) if payload['created_at'] else None,
+        datetime.fromisoformat(payload['updated_at']) if payload['updated_at'] else None,
+    )
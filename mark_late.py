@@ -0,0 +1,46 @@
+"""
+Late-delivery detection script.
+Marks overdue, undelivered deliveries as late. Schedule it with cron or
+the platform scheduler, or pass --every to keep it running.
+
+Usage:
+    python mark_late.py [--date YYYY-MM-DD] [--every SECONDS]
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from app import app
+from late_detection import mark_late_deliveries
+
+
+def run_once(today=None):
+    with app.app_context():
+        result = mark_late_deliveries(today)
+    details = ', '.join(f"{count} {status}" for status, count in result['by_status'].items())
+    print(f"✓ Marked {result['marked']} deliveries late ({details}) in {result['elapsed_ms']} ms.")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mark overdue deliveries as late.')
+    parser.add_argument('--date', help='treat this day as today (YYYY-MM-DD)')
+    parser.add_argument('--every', type=float, help='repeat every N seconds until interrupted')
+    args = parser.parse_args()
+
+    today = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+    if not args.every:
+        run_once(today)
+        return 0
+
+    try:
+        while True:
+            run_once(today)
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Schema migrations for existing databases.
+db.create_all() only creates missing tables; it never adds indexes or
+columns to tables that already exist. This module keeps an ordered list of
+idempotent migration steps and records the applied ones in a
+schema_migrations table.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # list applied/pending migrations
+    python migrations.py stamp      # mark everything applied (fresh schema)
+"""
+
+import os
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.exc import SQLAlchemyError
+from models import (db, User, Delivery, ArchivedDelivery, DeliveryStatusCount, DeliveryEvent,
+                    DeliveryEventSummary, DataVersion, Job, DeliveryImport, SchemaMigration)
+
+
+def _create_missing_indexes(table):
+    """Create any index declared on a model's table that the database lacks."""
+    bind = db.session.connection()
+    existing = {index['name'] for index in inspect(bind).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            print(f"  creating index {index.name}")
+            index.create(bind)
+
+
+def _0001_delivery_status_counts():
+    """Create and populate the delivery_status_counts summary table."""
+    from status_counts import rebuild
+    DeliveryStatusCount.__table__.create(db.session.connection(), checkfirst=True)
+    rebuild()
+
+
+def _0002_delivery_indexes():
+    """Add the dashboard, late-detection and foreign-key indexes to delivery."""
+    _create_missing_indexes(Delivery.__table__)
+
+
+def _0003_delivery_search():
+    """Create the full-text search index (FTS5 on SQLite, GIN on PostgreSQL)."""
+    from search import install
+    install()
+
+
+def _0004_demo_users():
+    """Create the demo admin and user accounts if the database has no users."""
+    # SECURITY: Use environment variables for production credentials
+    if User.query.first() is not None:
+        return
+    
+    # Get admin credentials from environment variables or use defaults
+    admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
+    admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
+    admin_email = os.environ.get('ADMIN_EMAIL', 'admin@logistik.com')
+    
+    # Get regular user credentials from environment variables or use defaults
+    user_username = os.environ.get('USER_USERNAME', 'user')
+    user_password = os.environ.get('USER_PASSWORD', 'user123')
+    user_email = os.environ.get('USER_EMAIL', 'user@logistik.com')
+    
+    admin = User(username=admin_username, email=admin_email, role='admin')
+    admin.set_password(admin_password)
+    db.session.add(admin)
+    
+    user = User(username=user_username, email=user_email, role='user')
+    user.set_password(user_password)
+    db.session.add(user)
+    
+    # Security warning if using default credentials
+    if admin_password == 'admin123' or user_password == 'user123':
+        print("⚠️  SECURITY WARNING: Using default demo credentials!")
+        print("⚠️  Set ADMIN_PASSWORD and USER_PASSWORD environment variables in production!")
+    else:
+        print(f"Users created: {admin_username} and {user_username}")
+
+
+def _0005_data_versions():
+    """Create the data_versions write marker used for ETag/Last-Modified."""
+    DataVersion.__table__.create(db.session.connection(), checkfirst=True)
+    if db.session.get(DataVersion, 'deliveries') is None:
+        db.session.add(DataVersion(name='deliveries', version=1))
+
+
+def _0006_delivery_events():
+    """Create the delivery event log and record each delivery's current status."""
+    from delivery_events import backfill
+    bind = db.session.connection()
+    DeliveryEvent.__table__.create(bind, checkfirst=True)
+    DeliveryEventSummary.__table__.create(bind, checkfirst=True)
+    backfill()
+
+
+def _0007_delivery_version():
+    """Add the delivery.version column used for optimistic concurrency control."""
+    bind = db.session.connection()
+    columns = {column['name'] for column in inspect(bind).get_columns(Delivery.__tablename__)}
+    if 'version' not in columns:
+        bind.execute(text("ALTER TABLE delivery ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def _0008_delivery_archive():
+    """Create the delivery_archive table for archived delivered parcels."""
+    ArchivedDelivery.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _0009_jobs():
+    """Create the jobs table behind the background job queue."""
+    Job.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _0010_delivery_dispatch_index():
+    """Extend the (status, estimated_delivery_date) index with weight for the dispatch planner."""
+    _create_missing_indexes(Delivery.__table__)
+    # Superseded: the new index serves the same lookups
+    db.session.execute(text("DROP INDEX IF EXISTS ix_delivery_status_estimated_date"))
+
+
+def _0011_delivery_autoincrement():
+    """Rebuild delivery with AUTOINCREMENT on SQLite so ids of archived or deleted deliveries are never reused."""
+    bind = db.session.connection()
+    if bind.dialect.name != 'sqlite':
+        return  # sequences never hand out an id twice
+    schema = bind.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'delivery'")).scalar()
+    if 'AUTOINCREMENT' in schema.upper():
+        return
+
+    # SQLite can't change a primary key in place: copy into a new table,
+    # drop the old one (with its indexes and triggers) and rename. Other
+    # tables' foreign keys name 'delivery' and follow the rename.
+    triggers = bind.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'delivery'")).scalars().all()
+    metadata = MetaData()
+    User.__table__.to_metadata(metadata)  # for the foreign keys
+    rebuilt = Delivery.__table__.to_metadata(metadata, name='delivery_rebuilt')
+    columns = ', '.join(column.name for column in rebuilt.columns)
+    bind.execute(CreateTable(rebuilt))
+    bind.execute(text(f"INSERT INTO delivery_rebuilt ({columns}) SELECT {columns} FROM delivery"))
+    bind.execute(text("DROP TABLE delivery"))
+    bind.execute(text("ALTER TABLE delivery_rebuilt RENAME TO delivery"))
+    _create_missing_indexes(Delivery.__table__)
+    for trigger in triggers:
+        bind.execute(text(trigger))
+    # Start above every id handed out so far, archived ones included
+    bind.execute(text(
+        "UPDATE sqlite_sequence SET seq = max(seq, (SELECT coalesce(max(id), 0) FROM delivery_archive)) "
+        "WHERE name = 'delivery'"))
+
+
+def _0012_delivery_imports():
+    """Create the delivery_imports table holding manifests queued for import."""
+    DeliveryImport.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _0013_delivery_import_files():
+    """Keep queued manifests in IMPORT_UPLOAD_DIR instead of a delivery_imports BLOB column."""
+    bind = db.session.connection()
+    columns = {column['name'] for column in inspect(bind).get_columns(DeliveryImport.__tablename__)}
+    if 'path' not in columns:
+        bind.execute(text("ALTER TABLE delivery_imports ADD COLUMN path VARCHAR(255)"))
+    if 'content' in columns:
+        # Manifests still queued in the old column go with it: upload them again
+        bind.execute(text("ALTER TABLE delivery_imports DROP COLUMN content"))
+
+
+# Ordered list of (version, function); never reorder or rename applied entries
+MIGRATIONS = [
+    ('0001_delivery_status_counts', _0001_delivery_status_counts),
+    ('0002_delivery_indexes', _0002_delivery_indexes),
+    ('0003_delivery_search', _0003_delivery_search),
+    ('0004_demo_users', _0004_demo_users),
+    ('0005_data_versions', _0005_data_versions),
+    ('0006_delivery_events', _0006_delivery_events),
+    ('0007_delivery_version', _0007_delivery_version),
+    ('0008_delivery_archive', _0008_delivery_archive),
+    ('0009_jobs', _0009_jobs),
+    ('0010_delivery_dispatch_index', _0010_delivery_dispatch_index),
+    ('0011_delivery_autoincrement', _0011_delivery_autoincrement),
+    ('0012_delivery_imports', _0012_delivery_imports),
+    ('0013_delivery_import_files', _0013_delivery_import_files),
+]
+
+
+def _ensure_version_table():
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+
+
+def applied_versions():
+    """Return the set of migration versions already applied."""
+    _ensure_version_table()
+    return {row.version for row in SchemaMigration.query.all()}
+
+
+def is_up_to_date():
+    """
+    Cheap startup check: one SELECT on schema_migrations.
+    Returns False if the table is missing or any migration is pending.
+    """
+    try:
+        rows = db.session.query(SchemaMigration.version).all()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return False
+    applied = {row.version for row in rows}
+    return all(version in applied for version, _ in MIGRATIONS)
+
+
+def pending_migrations():
+    """Return the (version, function) pairs that still need to run."""
+    applied = applied_versions()
+    return [(version, step) for version, step in MIGRATIONS if version not in applied]
+
+
+def upgrade():
+    """Apply every pending migration, committing after each one."""
+    # Tables that don't exist yet are created with all their indexes, on the
+    # primary only (read replicas get them through replication)
+    db.create_all(bind_key=None)
+    applied = []
+    for version, step in pending_migrations():
+        print(f"Applying {version}: {step.__doc__}")
+        step()
+        db.session.add(SchemaMigration(version=version))
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+
+def stamp():
+    """Mark every migration as applied without running it."""
+    for version, _ in pending_migrations():
+        db.session.add(SchemaMigration(version=version))
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+    with app.app_context():
+        if command == 'upgrade':
+            applied = upgrade()
+            if applied:
+                print(f"✓ Applied {len(applied)} migration(s).")
+            else:
+                print("✓ Database is up to date.")
+        elif command == 'status':
+            done = applied_versions()
+            for version, step in MIGRATIONS:
+                mark = '✓' if version in done else ' '
+                print(f"[{mark}] {version} - {step.__doc__}")
+        elif command == 'stamp':
+            stamp()
+            print("✓ All migrations marked as applied.")
+        else:
+            print("Usage: python migrations.py [upgrade|status|stamp]")
+            sys.exit(2)
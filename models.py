@@ -5,11 +5,16 @@ Defines User and Delivery models with their relationships.
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password, needs_rehash
+from read_replicas import RoutingSession
 from datetime import datetime
 
-# Initialize database object (will be initialized in app.py)
-db = SQLAlchemy()
+# Initialize database object (will be initialized in app.py). Sessions send
+# reads of read-only routes to a replica when one is configured.
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Delivery status values, in dashboard display order
+DELIVERY_STATUSES = ('ongoing', 'in_route', 'late', 'delivered')
 
 
 class User(UserMixin, db.Model):
@@ -26,11 +31,15 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check if the provided password matches the user's password."""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the configured hash method or cost."""
+        return needs_rehash(self.password_hash)
     
     def is_admin(self):
         """Check if the user has admin role."""
@@ -67,10 +76,227 @@ class Delivery(db.Model):
     created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     updated_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     
+    # Optimistic concurrency control: the ORM adds "AND version = <loaded>"
+    # to every UPDATE/DELETE of a delivery and raises StaleDataError if
+    # another writer got there first. Set-based UPDATEs bump it themselves.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
     # Relationships
     created_by = db.relationship('User', foreign_keys=[created_by_id], backref='deliveries_created')
     updated_by = db.relationship('User', foreign_keys=[updated_by_id], backref='deliveries_updated')
     
+    # Indexes for the dashboard and job queries. Existing databases get
+    # these through migrations.py, since db.create_all() won't add them.
+    __table_args__ = (
+        # Keyset pagination order (newest first)
+        db.Index('ix_delivery_created_at_id', 'created_at', 'id'),
+        # Status-filtered dashboard pages
+        db.Index('ix_delivery_status_created_at_id', 'status', 'created_at', 'id'),
+        # Late-delivery detection; weight makes it covering for the
+        # dispatch planner's scan of ongoing deliveries
+        db.Index('ix_delivery_status_estimated_date_weight', 'status', 'estimated_delivery_date', 'weight'),
+        # Foreign keys
+        db.Index('ix_delivery_created_by_id', 'created_by_id'),
+        db.Index('ix_delivery_updated_by_id', 'updated_by_id'),
+        # SQLite would otherwise hand out max(id) + 1 again, reusing the id
+        # of the newest delivery once it is archived or deleted
+        {'sqlite_autoincrement': True},
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+    # Archived deliveries (ArchivedDelivery) are read-only
+    is_archived = False
+
     def __repr__(self):
         return f'<Delivery {self.tracking_number}>'
 
+
+class ArchivedDelivery(db.Model):
+    """
+    Cold storage for delivered parcels moved out of the delivery table by
+    archive.py. Same columns and ids as Delivery plus archived_at, so views,
+    the event log and tracking-number lookups keep working; rows are never
+    updated once archived.
+    """
+    __tablename__ = 'delivery_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tracking_number = db.Column(db.String(50), unique=True, nullable=False)
+    recipient_name = db.Column(db.String(100), nullable=False)
+    recipient_address = db.Column(db.Text, nullable=False)
+    recipient_phone = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    description = db.Column(db.Text)
+    weight = db.Column(db.Float)
+    estimated_delivery_date = db.Column(db.Date)
+    actual_delivery_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    version = db.Column(db.Integer, nullable=False, default=1)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    created_by = db.relationship('User', foreign_keys=[created_by_id])
+    updated_by = db.relationship('User', foreign_keys=[updated_by_id])
+
+    __table_args__ = (
+        # Retention of the archive itself
+        db.Index('ix_delivery_archive_archived_at', 'archived_at'),
+    )
+
+    is_archived = True
+
+    def __repr__(self):
+        return f'<ArchivedDelivery {self.tracking_number}>'
+
+
+class DeliveryStatusCount(db.Model):
+    """
+    Summary table holding the number of deliveries per status.
+    Maintained incrementally by the routes that write deliveries (see
+    status_counts.py) so dashboards never have to COUNT the delivery table.
+    """
+    __tablename__ = 'delivery_status_counts'
+    
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DeliveryStatusCount {self.status}={self.count}>'
+
+
+class DeliveryEvent(db.Model):
+    """
+    Append-only log of delivery status changes (see delivery_events.py).
+    Kept narrow for tens of millions of rows: status and source are small-int
+    codes, and delivery_id/actor_id are plain integers without foreign keys
+    so a delivery's history outlives the delivery and inserts stay cheap.
+    """
+    __tablename__ = 'delivery_event'
+    
+    # BIGINT on PostgreSQL; SQLite only auto-increments INTEGER primary keys
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    delivery_id = db.Column(db.Integer, nullable=False)
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    status = db.Column(db.SmallInteger, nullable=False)
+    source = db.Column(db.SmallInteger, nullable=False)
+    actor_id = db.Column(db.Integer)
+    
+    __table_args__ = (
+        # One parcel's timeline is a single range scan
+        db.Index('ix_delivery_event_delivery_id_occurred_at', 'delivery_id', 'occurred_at'),
+        # Retention/compaction scans by age
+        db.Index('ix_delivery_event_occurred_at', 'occurred_at'),
+    )
+    
+    def __repr__(self):
+        return f'<DeliveryEvent {self.delivery_id}:{self.status}>'
+
+
+class DeliveryEventSummary(db.Model):
+    """Compacted history of a delivery: old events folded into one row each."""
+    __tablename__ = 'delivery_event_summary'
+    
+    delivery_id = db.Column(db.Integer, primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+    first_status = db.Column(db.SmallInteger, nullable=False)
+    last_status = db.Column(db.SmallInteger, nullable=False)
+    
+    def __repr__(self):
+        return f'<DeliveryEventSummary {self.delivery_id} x{self.event_count}>'
+
+
+class DataVersion(db.Model):
+    """
+    Write-version marker for a set of data (e.g. 'deliveries').
+    Bumped in the same transaction as every write, so pages can use it as a
+    cheap ETag/Last-Modified source (see page_cache.py).
+    """
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+
+
+class Job(db.Model):
+    """
+    One unit of background work in the durable job queue (see jobs.py).
+    dedup_key is only set while the job is queued or running, so its unique
+    index turns a second enqueue of the same work into a no-op until the
+    first one has finished.
+    """
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text)  # JSON keyword arguments
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    # Status options: 'queued', 'running', 'succeeded', 'failed'
+    dedup_key = db.Column(db.String(128), unique=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+
+    # Scheduling: not run before run_at; a running job whose worker hasn't
+    # finished by locked_until is assumed dead and claimed again
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64))
+    locked_until = db.Column(db.DateTime)
+
+    # Timing and outcome
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Float)
+    result = db.Column(db.Text)  # JSON return value
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        # Claiming the next due job
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+        # Purging finished jobs
+        db.Index('ix_jobs_finished_at', 'finished_at'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
+
+
+class DeliveryImport(db.Model):
+    """
+    An uploaded delivery manifest and the import_deliveries job that
+    processes it (see delivery_import.py). The file itself is spooled to
+    IMPORT_UPLOAD_DIR; once imported it is deleted and the report kept.
+    """
+    __tablename__ = 'delivery_imports'
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255))
+    format = db.Column(db.String(10), nullable=False)
+    checksum = db.Column(db.String(64), nullable=False)  # SHA-256 of the file
+    path = db.Column(db.String(255))  # file name under IMPORT_UPLOAD_DIR, None once imported
+    report = db.Column(db.Text)  # JSON ImportResult.to_dict()
+    # Not a foreign key: finished jobs are purged, import reports are kept
+    job_id = db.Column(db.Integer)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DeliveryImport {self.id} {self.filename}>'
+
+
+class SchemaMigration(db.Model):
+    """One row per schema migration applied to this database (see migrations.py)."""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.String(64), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
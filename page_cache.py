@@ -0,0 +1,171 @@
+"""
+Conditional GET and rendered-fragment caching for delivery pages.
+
+Every delivery write bumps the 'deliveries' row of data_versions in its own
+transaction (deliveries_changed()). Dashboards derive their ETag and
+Last-Modified from that one row, so an unchanged page is answered with 304
+before any delivery query or template rendering happens. Delivery detail
+pages use the delivery's own updated_at instead.
+
+Table rows are rendered once per (template, delivery id, updated_at) and
+kept in a per-process LRU cache; writes drop the rows of the deliveries they
+touched. Writes made outside the application (raw SQL) must call
+deliveries_changed() too, or clients may keep seeing cached pages.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from models import db, DataVersion
+
+DELIVERIES = 'deliveries'
+
+
+def bump(name=DELIVERIES):
+    """Advance a write-version marker. Does not commit; the caller's commit covers it."""
+    now = datetime.utcnow()
+    updated = (db.session.query(DataVersion)
+               .filter(DataVersion.name == name)
+               .update({DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: now},
+                       synchronize_session=False))
+    if not updated:
+        db.session.add(DataVersion(name=name, version=1, updated_at=now))
+
+
+def current_version(name=DELIVERIES):
+    """Return (version, updated_at) for a marker with a single primary-key lookup."""
+    row = (db.session.query(DataVersion.version, DataVersion.updated_at)
+           .filter(DataVersion.name == name)
+           .first())
+    return tuple(row) if row else (0, None)
+
+
+def deliveries_changed(delivery_ids=()):
+    """
+    Record a delivery write: bump the version marker and drop the cached rows
+    of the given deliveries. Call it before the write's commit.
+    """
+    bump(DELIVERIES)
+    for delivery_id in delivery_ids:
+        fragments.invalidate(delivery_id)
+
+
+def _http_date(value):
+    """Naive UTC datetime -> aware, second precision (what HTTP dates carry)."""
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(validators, last_modified, render):
+    """
+    Answer a GET with 304 Not Modified if the client's copy is current,
+    otherwise with render()'s output plus ETag/Last-Modified headers.
+    validators: values that together identify this version of the page; the
+    user and the full URL (including filters and cursor) are added here.
+    """
+    # A pending flash message has to be rendered into the page
+    if '_flashes' in session:
+        return make_response(render())
+
+    parts = (current_user.get_id(), request.full_path) + tuple(validators)
+    etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+    last_modified = _http_date(last_modified)
+
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Browsers may keep the page but must revalidate it on every visit
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments keyed by (template, delivery id)."""
+
+    def __init__(self, maxsize=5000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (template, delivery_id) -> (updated_at, Markup)
+        self._templates = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, template, delivery_id, updated_at):
+        key = (template, delivery_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == updated_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, template, delivery_id, updated_at, html):
+        if self.maxsize <= 0:
+            return
+        key = (template, delivery_id)
+        with self._lock:
+            self._templates.add(template)
+            self._entries[key] = (updated_at, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, delivery_id=None):
+        """Drop every fragment of one delivery, or everything when delivery_id is None."""
+        with self._lock:
+            if delivery_id is None:
+                self._entries.clear()
+            else:
+                for template in self._templates:
+                    self._entries.pop((template, delivery_id), None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+
+# One fragment cache per process, configured by init_app()
+fragments = FragmentCache()
+
+
+def cached_row(template, delivery):
+    """Render a delivery row template, reusing the cached HTML while updated_at is unchanged."""
+    html = fragments.get(template, delivery.id, delivery.updated_at)
+    if html is None:
+        html = Markup(current_app.jinja_env.get_template(template).render(delivery=delivery))
+        fragments.put(template, delivery.id, delivery.updated_at, html)
+    return html
+
+
+def init_app(app):
+    """Apply FRAGMENT_CACHE_SIZE and expose cached_row() to templates."""
+    fragments.maxsize = app.config['FRAGMENT_CACHE_SIZE']
+    app.add_template_global(cached_row)
@@ -0,0 +1,184 @@
+"""
+Keyset (cursor) pagination for delivery lists.
+Builds filtered delivery queries ordered by (created_at, id) and slices them
+with a cursor instead of OFFSET, so every page costs the same no matter how
+deep into the table it is.
+
+List views read DeliveryRow tuples rather than Delivery entities: only the
+displayed columns are selected, the address is cut short in SQL, and nothing
+is added to the session's identity map.
+"""
+
+import base64
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, tuple_
+from models import db, Delivery, DELIVERY_STATUSES
+
+# Rows show the first 50 characters of the address; the 51st tells the
+# template whether to add an ellipsis
+ADDRESS_PREVIEW = 51
+
+# Just the fields the list templates (dashboard rows, search results) use
+DeliveryRow = namedtuple('DeliveryRow', 'id tracking_number recipient_name recipient_address '
+                                        'status created_at updated_at')
+
+
+class Page:
+    """A single page of results plus the cursor for the next one."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def row_query(model=Delivery):
+    """
+    Query for DeliveryRow columns, with the address truncated by the database.
+    model may be ArchivedDelivery, which has the same columns.
+    """
+    return db.session.query(
+        model.id,
+        model.tracking_number,
+        model.recipient_name,
+        func.substr(model.recipient_address, 1, ADDRESS_PREVIEW).label('recipient_address'),
+        model.status,
+        model.created_at,
+        model.updated_at,
+    )
+
+
+def to_rows(rows):
+    """Turn row_query() results into plain DeliveryRow tuples."""
+    return [DeliveryRow(*row) for row in rows]
+
+
+def encode_cursor(created_at, delivery_id):
+    """Encode the (created_at, id) position of a row as an opaque token."""
+    raw = f'{created_at.isoformat()}|{delivery_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor produced by encode_cursor.
+    Returns a (created_at, id) tuple, or None if the token is invalid.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, delivery_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(delivery_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD query string value, ignoring bad input."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def parse_filters(args):
+    """
+    Extract dashboard filters from request arguments.
+    Unknown statuses and malformed dates are dropped rather than rejected.
+    """
+    status = args.get('status') or None
+    if status not in DELIVERY_STATUSES:
+        status = None
+    return {
+        'status': status,
+        'date_from': _parse_date(args.get('date_from')),
+        'date_to': _parse_date(args.get('date_to')),
+    }
+
+
+def parse_page_size(args):
+    """Read the requested page size, clamped to the configured maximum."""
+    default = current_app.config['DELIVERIES_PER_PAGE']
+    maximum = current_app.config['DELIVERIES_MAX_PER_PAGE']
+    try:
+        per_page = int(args.get('per_page', default))
+    except (TypeError, ValueError):
+        per_page = default
+    return max(1, min(per_page, maximum))
+
+
+def apply_filters(query, filters, model=Delivery):
+    """
+    Push status and creation date-range filters into the SQL query.
+    model is the mapped class filtered on (ArchivedDelivery for the archive).
+    """
+    if filters.get('status'):
+        query = query.filter(model.status == filters['status'])
+    if filters.get('date_from'):
+        start = datetime.combine(filters['date_from'], datetime.min.time())
+        query = query.filter(model.created_at >= start)
+    if filters.get('date_to'):
+        # date_to is inclusive, so compare against the start of the next day
+        end = datetime.combine(filters['date_to'] + timedelta(days=1), datetime.min.time())
+        query = query.filter(model.created_at < end)
+    return query
+
+
+def keyset_query(query, cursor=None, limit=50):
+    """
+    Order a delivery query newest first and seek past the cursor position.
+    The row-value comparison lets the database walk the (created_at, id)
+    indexes directly instead of sorting.
+    """
+    position = decode_cursor(cursor)
+    if position:
+        query = query.filter(tuple_(Delivery.created_at, Delivery.id) < tuple_(*position))
+    return (query.order_by(Delivery.created_at.desc(), Delivery.id.desc())
+                 .limit(limit))
+
+
+def paginate(query, cursor=None, per_page=50):
+    """
+    Return one page of a delivery query, newest first.
+    Fetches per_page + 1 rows to know whether a next page exists without
+    running a separate COUNT.
+    """
+    rows = keyset_query(query, cursor, per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return Page(rows, next_cursor)
+
+
+def delivery_page(args, query=None):
+    """
+    Build the filtered, paginated delivery list for a dashboard request.
+    Without a query, the page holds DeliveryRow tuples from row_query().
+    Returns (page, filters) so templates can echo the active filters.
+    """
+    filters = parse_filters(args)
+    projected = query is None
+    query = apply_filters(row_query() if projected else query, filters)
+    page = paginate(query, args.get('cursor'), parse_page_size(args))
+    if projected:
+        page.items = to_rows(page.items)
+    return page, filters
@@ -0,0 +1,85 @@
+"""
+Password hashing on a bounded worker pool.
+scrypt/pbkdf2 release the GIL, so a burst of logins would otherwise keep
+every core busy hashing and stall dashboard requests. Hashes are computed
+by at most PASSWORD_HASH_WORKERS threads, and at most
+PASSWORD_HASH_QUEUE_LIMIT logins may wait for one; beyond that the login
+is refused quickly instead of piling up.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when too many password checks are queued or one takes too long."""
+
+
+# Until init_app() runs (e.g. in a bare script), hash inline with Werkzeug's defaults
+_method = 'scrypt'
+_executor = None
+_slots = None
+_lock = threading.Lock()
+_timeout = None
+
+
+def init_app(app):
+    """Configure the hash method and create the worker pool (0 workers hashes inline)."""
+    global _method, _executor, _slots, _timeout
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    _method = app.config['PASSWORD_HASH_METHOD']
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash') if workers else None
+        _slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+        _timeout = app.config['PASSWORD_HASH_TIMEOUT']
+
+
+def _run(func, *args):
+    """Run func on the pool, refusing work when the queue is full."""
+    if _executor is None:
+        return func(*args)
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot is held until the hash itself finishes, not just until this
+    # caller stops waiting, so timed-out hashes still count against the queue
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_timeout)
+    except TimeoutError:
+        raise HashingBusy() from None
+
+
+def hash_password(password):
+    """Hash a password with the configured method (PASSWORD_HASH_METHOD)."""
+    return _run(generate_password_hash, password, _method)
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash."""
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True if a stored hash was made with a different method or cost than configured."""
+    stored = password_hash.split('$', 1)[0] if password_hash else ''
+    return stored != normalize_method(_method)
+
+
+def normalize_method(method):
+    """Spell out Werkzeug's default parameters so stored hashes compare equal."""
+    if method == 'scrypt':
+        return 'scrypt:32768:8:1'
+    if method == 'pbkdf2':
+        return f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+    if method.startswith('pbkdf2:') and method.count(':') == 1:
+        return f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
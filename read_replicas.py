@@ -0,0 +1,316 @@
+"""
+Read-replica routing.
+Replicas are configured as SQLALCHEMY_BINDS named replica_0, replica_1, ...
+(READ_REPLICA_URLS). GET requests to the read-only endpoints listed in
+READ_REPLICA_ENDPOINTS run their SELECTs on a replica; flushes and
+INSERT/UPDATE/DELETE statements always go to the primary.
+
+Read-your-writes: a request that writes marks the user's session, and the
+same user is served from the primary for READ_REPLICA_STICKY_SECONDS after.
+
+Lag and outages: every READ_REPLICA_CHECK_INTERVAL seconds each replica's
+data_versions marker (see page_cache.py) is compared with the primary's. A
+replica that is behind for longer than READ_REPLICA_MAX_LAG seconds, or
+can't be reached, is skipped until a later check finds it healthy again; with
+no healthy replica, reads stay on the primary. A read that loses its replica
+connection mid-request is run once more on the primary, as is the rest of
+that request, so the outage doesn't surface as an error page. The check only needs that
+marker, so it works the same for PostgreSQL streaming replicas and for two
+local SQLite files kept in step with "python read_replicas.py sync".
+
+Usage:
+    python read_replicas.py status
+    python read_replicas.py sync      # SQLite only: copy the primary onto every replica
+"""
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+from datetime import datetime
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+from db_pool import engine_options
+
+# Bind names used for replicas in SQLALCHEMY_BINDS
+BIND_PREFIX = 'replica_'
+# Session key holding the time until which this user reads from the primary
+STICKY_KEY = 'db_primary_until'
+
+
+def replica_binds(urls, profile):
+    """SQLALCHEMY_BINDS entries for a list of replica URLs, pooled like the primary."""
+    binds = {}
+    for index, url in enumerate(urls):
+        name = f'{BIND_PREFIX}{index}'
+        binds[name] = dict(engine_options(url, profile, name), url=url)
+    return binds
+
+
+class ReplicaState:
+    """What the last check found out about one replica."""
+
+    def __init__(self, name):
+        self.name = name
+        self.healthy = False
+        self.lag_seconds = None
+        self.error = None
+        self.checked_at = 0.0
+        self.behind_since = None
+        self.reads = 0
+        self.checking = threading.Lock()
+
+    def snapshot(self):
+        return {
+            'healthy': self.healthy,
+            'lag_seconds': round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+            'error': self.error,
+            'reads': self.reads,
+        }
+
+
+def _marker(engine):
+    """(version, updated_at) of the deliveries write marker on one database."""
+    from models import DataVersion
+    from page_cache import DELIVERIES
+
+    with engine.connect() as connection:
+        row = connection.execute(select(DataVersion.version, DataVersion.updated_at)
+                                 .where(DataVersion.name == DELIVERIES)).first()
+    return tuple(row) if row else (0, None)
+
+
+class ReplicaRouter:
+    """Picks a healthy replica for a request and keeps replica health current."""
+
+    def __init__(self):
+        self._states = {}
+        self._turn = itertools.count()
+        self.max_lag = 5.0
+        self.check_interval = 5.0
+
+    def configure(self, names, max_lag, check_interval):
+        self._states = {name: ReplicaState(name) for name in names}
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+
+    @property
+    def enabled(self):
+        return bool(self._states)
+
+    def check(self, state, engines):
+        """Measure one replica's lag against the primary and record whether it is usable."""
+        now = datetime.utcnow()
+        try:
+            primary_version, primary_updated_at = _marker(engines[None])
+            replica_version, _ = _marker(engines[state.name])
+        except Exception as e:
+            state.healthy, state.lag_seconds, state.error = False, None, str(e).splitlines()[0][:200]
+            return
+
+        if replica_version >= primary_version:
+            state.behind_since = None
+            lag = 0.0
+        else:
+            # The missing writes are at least as old as the primary's last
+            # write and as the moment we first saw this replica behind
+            state.behind_since = state.behind_since or now
+            oldest = min(state.behind_since, primary_updated_at or now)
+            lag = (now - oldest).total_seconds()
+        state.lag_seconds = lag
+        state.error = None
+        state.healthy = lag <= self.max_lag
+
+    def _refresh(self, engines):
+        now = time.monotonic()
+        for state in self._states.values():
+            if now - state.checked_at < self.check_interval:
+                continue
+            # One thread checks; the others use the last result meanwhile
+            if state.checking.acquire(blocking=False):
+                try:
+                    self.check(state, engines)
+                    state.checked_at = time.monotonic()
+                finally:
+                    state.checking.release()
+
+    def pick(self, engines):
+        """Name of a healthy replica (round robin), or None to use the primary."""
+        self._refresh(engines)
+        healthy = [state for state in self._states.values() if state.healthy]
+        if not healthy:
+            return None
+        state = healthy[next(self._turn) % len(healthy)]
+        state.reads += 1
+        return state.name
+
+    def check_all(self, engines):
+        for state in self._states.values():
+            self.check(state, engines)
+            state.checked_at = time.monotonic()
+
+    def mark_down(self, name, error):
+        """Take a replica out of rotation until its next successful check."""
+        state = self._states.get(name)
+        if state:
+            state.healthy = False
+            state.error = str(error).splitlines()[0][:200]
+            state.checked_at = time.monotonic()
+
+    def is_healthy(self, name):
+        state = self._states.get(name)
+        return bool(state and state.healthy)
+
+    def status(self):
+        return {name: state.snapshot() for name, state in sorted(self._states.items())}
+
+
+router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that reads from the replica chosen for the
+    current request and sends every write to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                # Remembered so the user's next reads stay on the primary
+                g.db_wrote = True
+            else:
+                replica = g.get('db_replica')
+                if replica:
+                    return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _read_with_fallback(self, run, statement, *args, **kwargs):
+        """
+        Run a statement; if it was a read sent to a replica that has just
+        been marked down (see _watch_engine), retry it once on the primary.
+        """
+        replica = g.get('db_replica') if has_request_context() else None
+        try:
+            return run(statement, *args, **kwargs)
+        except OperationalError:
+            if (not replica or router.is_healthy(replica) or self._flushing
+                    or isinstance(statement, UpdateBase)):
+                raise
+            # Unflushed or already written changes would be lost by the
+            # rollback below, so those requests still fail
+            if g.get('db_wrote') or self.new or self.dirty or self.deleted:
+                raise
+        # The broken replica connection is part of the session's transaction;
+        # roll it back (objects read so far reload from the primary on access)
+        g.db_replica = None
+        self.rollback()
+        return run(statement, *args, **kwargs)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._read_with_fallback(super().execute, statement, *args, **kwargs)
+
+    def scalar(self, statement, *args, **kwargs):
+        return self._read_with_fallback(super().scalar, statement, *args, **kwargs)
+
+    def scalars(self, statement, *args, **kwargs):
+        return self._read_with_fallback(super().scalars, statement, *args, **kwargs)
+
+
+def _watch_engine(name, engine):
+    @event.listens_for(engine, 'handle_error')
+    def _replica_error(context):
+        if context.is_disconnect or context.connection is None:
+            router.mark_down(name, context.original_exception)
+
+
+def init_app(app, db):
+    """
+    Configure replicas from the app's binds. Register this after the
+    first-request bootstrap hook so migrations never see a replica.
+    """
+    names = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith(BIND_PREFIX))
+    router.configure(names, app.config['READ_REPLICA_MAX_LAG'], app.config['READ_REPLICA_CHECK_INTERVAL'])
+    if not names:
+        return
+
+    endpoints = frozenset(app.config['READ_REPLICA_ENDPOINTS'])
+    sticky_seconds = app.config['READ_REPLICA_STICKY_SECONDS']
+
+    @app.before_request
+    def _route_request():
+        if request.method not in ('GET', 'HEAD') or request.endpoint not in endpoints:
+            return
+        if session.get(STICKY_KEY, 0) > time.time():
+            return
+        g.db_replica = router.pick(db.engines)
+
+    @app.after_request
+    def _remember_write(response):
+        if g.get('db_wrote'):
+            session[STICKY_KEY] = time.time() + sticky_seconds
+        return response
+
+    with app.app_context():
+        for name in names:
+            _watch_engine(name, db.engines[name])
+
+
+def _sqlite_path(engine):
+    return engine.url.database if engine.dialect.name == 'sqlite' else None
+
+
+def sync():
+    """Copy the primary SQLite database onto every replica (local testing)."""
+    from models import db
+
+    primary = db.engines[None]
+    if not _sqlite_path(primary):
+        print("✗ sync only copies SQLite files; set up streaming replication for PostgreSQL.")
+        return 1
+    for name in router.status():
+        replica = db.engines[name]
+        if not _sqlite_path(replica):
+            print(f"✗ {name} is not a SQLite database, skipped.")
+            continue
+        source = primary.raw_connection()
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        print(f"✓ Copied the primary onto {name} ({_sqlite_path(replica)}).")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read-replica status and local SQLite sync.')
+    parser.add_argument('command', choices=('status', 'sync'))
+    args = parser.parse_args()
+
+    from app import app
+    from models import db
+    # The module app.py configured, not this __main__ copy
+    import read_replicas
+
+    with app.app_context():
+        if not read_replicas.router.enabled:
+            print("⚠️  No replicas configured (set READ_REPLICA_URLS).")
+            return 1
+        if args.command == 'sync':
+            return read_replicas.sync()
+        read_replicas.router.check_all(db.engines)
+        for name, status in read_replicas.router.status().items():
+            mark = '✓' if status['healthy'] else '✗'
+            detail = status['error'] or f"lag {status['lag_seconds']} s"
+            print(f"{mark} {name}: {detail}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Per-request SQL instrumentation and Prometheus metrics.
+SQLAlchemy cursor events count every statement a request runs and time it;
+the totals are aggregated per blueprint endpoint together with a request
+latency histogram and exposed in Prometheus text format by /metrics. The
+slowest statements seen per endpoint are listed in /health.
+
+Optional N+1 detection (SQL_N_PLUS_ONE_THRESHOLD) logs a warning when the
+same statement shape runs that many times within one request, which is what
+a lazy-loaded relationship inside a template loop looks like.
+
+Counters are per process. Latency is measured up to the response headers,
+so streamed bodies (exports, live updates) don't skew the histogram; their
+queries are still counted, up to the end of the stream.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request latency histogram buckets, in seconds (the Prometheus defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Queries-per-request histogram buckets
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+# Slowest statements kept per endpoint
+SLOWEST_KEPT = 5
+
+_WHITESPACE = re.compile(r'\s+')
+# Expanded IN lists and VALUES groups: "(?, ?, ?)" -> "(?)"
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+
+
+def statement_shape(statement):
+    """Normalise a statement so repeats that differ only in list length compare equal."""
+    return _PLACEHOLDER_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, as Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class EndpointMetrics:
+    """Aggregates for one endpoint; guarded by the registry lock."""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses = Counter()
+        self.n_plus_one = 0
+        self.slowest = []  # [(duration_ms, shape)], longest first
+
+
+class Registry:
+    """All per-endpoint metrics of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _get(self, endpoint):
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = EndpointMetrics()
+        return self._endpoints[endpoint]
+
+    def record_response(self, endpoint, status, seconds):
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.latency.observe(seconds)
+            metrics.statuses[status] += 1
+
+    def record_queries(self, endpoint, stats, n_plus_one):
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.queries.observe(stats.count)
+            metrics.db_seconds += stats.total_ms / 1000
+            metrics.n_plus_one += n_plus_one
+            if stats.slowest:
+                merged = sorted(metrics.slowest + stats.slowest, key=lambda item: item[0], reverse=True)
+                # One entry per shape, the slowest run of it
+                seen = set()
+                metrics.slowest = [item for item in merged
+                                   if item[1] not in seen and not seen.add(item[1])][:SLOWEST_KEPT]
+
+    def items(self):
+        with self._lock:
+            return sorted(self._endpoints.items())
+
+    def slowest(self):
+        """{endpoint: [{'ms', 'statement'}]} for /health."""
+        with self._lock:
+            return {endpoint: [{'ms': round(ms, 2), 'statement': shape} for ms, shape in metrics.slowest]
+                    for endpoint, metrics in sorted(self._endpoints.items()) if metrics.slowest}
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """Statements run by the current request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+
+    def record(self, statement, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if len(self.slowest) < SLOWEST_KEPT or duration_ms > self.slowest[-1][0]:
+            self.slowest.append((duration_ms, shape))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+
+def _current_stats():
+    if not has_request_context():
+        # Scheduler threads and CLI scripts aren't attributed to a route
+        return None
+    return g.get('sql_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current_stats() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    stats = _current_stats()
+    if stats is not None:
+        stats.record(statement, (time.perf_counter() - started) * 1000)
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    g.sql_stats = RequestStats()
+    g.metrics_started = time.perf_counter()
+
+
+def _record_response(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        registry.record_response(_endpoint(), response.status_code, time.perf_counter() - started)
+        g.metrics_recorded = True
+    return response
+
+
+def _make_teardown(app):
+    threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+    slow_ms = app.config['SQL_SLOW_QUERY_MS']
+
+    def _finish_request(error):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return
+        endpoint = _endpoint()
+        if not g.get('metrics_recorded'):
+            # An unhandled exception skipped after_request
+            registry.record_response(endpoint, 500, time.perf_counter() - g.metrics_started)
+
+        repeated = []
+        if threshold:
+            repeated = [(shape, times) for shape, times in stats.shapes.items() if times >= threshold]
+            for shape, times in repeated:
+                app.logger.warning("Possible N+1 in %s: statement ran %d times: %s", endpoint, times, shape)
+        if slow_ms and stats.slowest and stats.slowest[0][0] >= slow_ms:
+            app.logger.warning("Slow query in %s (%.1f ms): %s", endpoint, *stats.slowest[0])
+        registry.record_queries(endpoint, stats, 1 if repeated else 0)
+
+    return _finish_request
+
+
+_listening = False
+
+
+def init_app(app):
+    """Install the request hooks and (once per process) the engine listeners."""
+    global _listening
+    if not app.config['SQL_METRICS_ENABLED']:
+        return
+    if not _listening:
+        # On the Engine class, so every engine (and bind) is covered
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_make_teardown(app))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _histogram_lines(name, histogram, **labels):
+    lines = []
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.total:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+    return lines
+
+
+def render_prometheus(pool_stats=None, caches=None):
+    """
+    All metrics in Prometheus text exposition format (version 0.0.4).
+    pool_stats is db_pool.pool_stats(); caches maps a cache name to its stats().
+    """
+    endpoints = registry.items()
+    lines = [
+        '# HELP logistik_http_request_duration_seconds Request latency up to the response headers.',
+        '# TYPE logistik_http_request_duration_seconds histogram',
+    ]
+    for endpoint, metrics in endpoints:
+        lines += _histogram_lines('logistik_http_request_duration_seconds', metrics.latency, endpoint=endpoint)
+
+    lines += ['# HELP logistik_http_requests_total Responses by endpoint and status code.',
+              '# TYPE logistik_http_requests_total counter']
+    for endpoint, metrics in endpoints:
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f'logistik_http_requests_total{_labels(endpoint=endpoint, status=status)} {count}')
+
+    lines += ['# HELP logistik_db_queries_per_request SQL statements run per request.',
+              '# TYPE logistik_db_queries_per_request histogram']
+    for endpoint, metrics in endpoints:
+        lines += _histogram_lines('logistik_db_queries_per_request', metrics.queries, endpoint=endpoint)
+
+    lines += ['# HELP logistik_db_time_seconds_total Time spent executing SQL statements.',
+              '# TYPE logistik_db_time_seconds_total counter']
+    for endpoint, metrics in endpoints:
+        lines.append(f'logistik_db_time_seconds_total{_labels(endpoint=endpoint)} {metrics.db_seconds:.6f}')
+
+    lines += ['# HELP logistik_db_n_plus_one_total Requests flagged by N+1 detection.',
+              '# TYPE logistik_db_n_plus_one_total counter']
+    for endpoint, metrics in endpoints:
+        lines.append(f'logistik_db_n_plus_one_total{_labels(endpoint=endpoint)} {metrics.n_plus_one}')
+
+    pool_metrics = (
+        ('checkouts', 'counter', 'Connection checkouts.'),
+        ('saturated_checkouts', 'counter', 'Checkouts that found the pool exhausted.'),
+        ('timeouts', 'counter', 'Checkouts that timed out.'),
+        ('in_use', 'gauge', 'Connections checked out now.'),
+        ('peak_in_use', 'gauge', 'Most connections checked out at once.'),
+        ('avg_wait_ms', 'gauge', 'Average checkout wait in milliseconds.'),
+        ('max_wait_ms', 'gauge', 'Longest checkout wait in milliseconds.'),
+    )
+    for key, kind, help_text in pool_metrics:
+        suffix = '_total' if kind == 'counter' else ''
+        name = f'logistik_db_pool_{key}{suffix}'
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for pool, stats in sorted((pool_stats or {}).items()):
+            lines.append(f'{name}{_labels(pool=pool)} {stats[key]}')
+
+    cache_metrics = (('hits', 'counter'), ('misses', 'counter'), ('size', 'gauge'))
+    for key, kind in cache_metrics:
+        suffix = '_total' if kind == 'counter' else ''
+        name = f'logistik_cache_{key}{suffix}'
+        lines += [f'# HELP {name} Per-process cache {key}.', f'# TYPE {name} {kind}']
+        for cache, stats in sorted((caches or {}).items()):
+            lines.append(f'{name}{_labels(cache=cache)} {stats[key]}')
+
+    return '\n'.join(lines) + '\n'
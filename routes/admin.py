@@ -3,14 +3,27 @@ Admin routes.
 Handles CRUD operations for deliveries (admin only).
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify,
+                   Response, stream_with_context, current_app, abort)
 from flask_login import login_required, current_user
-from models import db, Delivery
-from forms import DeliveryForm
+from models import db, Delivery, DeliveryImport, Job, User
+from status_counts import get_counts, record_change
+from forms import DeliveryForm, DeliveryImportForm, DispatchForm, JobForm, set_version
+from pagination import delivery_page, parse_filters
+from page_cache import conditional, current_version, deliveries_changed
+from delivery_events import record_event, timeline, timeline_version
+from live_updates import current_cursor, publish_changes
+from templating import stream_page
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime, date
+import json
 
 admin_bp = Blueprint('admin', __name__)
 
+# Fields of the edit form, checked for concurrent changes
+EDITABLE_FIELDS = ('tracking_number', 'recipient_name', 'recipient_address', 'recipient_phone',
+                   'description', 'weight', 'estimated_delivery_date', 'status')
+
 
 def admin_required(f):
     """Decorator to ensure only admins can access the route."""
@@ -30,19 +43,20 @@ def admin_required(f):
 @admin_required
 def dashboard():
     """Admin dashboard showing all deliveries."""
-    # Get all deliveries ordered by creation date (newest first)
-    deliveries = Delivery.query.order_by(Delivery.created_at.desc()).all()
-    
-    # Count deliveries by status
-    status_counts = {
-        'ongoing': Delivery.query.filter_by(status='ongoing').count(),
-        'in_route': Delivery.query.filter_by(status='in_route').count(),
-        'late': Delivery.query.filter_by(status='late').count(),
-        'delivered': Delivery.query.filter_by(status='delivered').count(),
-        'total': Delivery.query.count()
-    }
+    def render():
+        # Get one page of deliveries ordered by creation date (newest first)
+        deliveries, filters = delivery_page(request.args)
+        
+        # Count deliveries by status (read from the maintained summary table)
+        status_counts = get_counts()
+        
+        # Queries are done; the page itself is streamed while it renders
+        return stream_page('admin/dashboard.html', deliveries=deliveries, status_counts=status_counts,
+                           filters=filters, live_cursor=current_cursor())
     
-    return render_template('admin/dashboard.html', deliveries=deliveries, status_counts=status_counts)
+    # Unchanged since the client's last visit: 304 without querying deliveries
+    version, changed_at = current_version()
+    return conditional((version,), changed_at, render)
 
 
 @admin_bp.route('/delivery/create', methods=['GET', 'POST'])
@@ -50,11 +64,13 @@ def dashboard():
 @admin_required
 def create_delivery():
     """Create a new delivery."""
+    from archive import find_by_tracking_number
+    
     form = DeliveryForm()
     
     if form.validate_on_submit():
         # Check if tracking number already exists
-        if Delivery.query.filter_by(tracking_number=form.tracking_number.data).first():
+        if find_by_tracking_number(form.tracking_number.data):
             flash('Tracking number already exists.', 'danger')
             return render_template('admin/delivery_form.html', form=form, title='Create Delivery')
         
@@ -76,7 +92,14 @@ def create_delivery():
             delivery.actual_delivery_date = date.today()
         
         db.session.add(delivery)
+        db.session.flush()
+        record_change(None, delivery.status)
+        record_event(delivery.id, delivery.status, current_user.id)
+        deliveries_changed()
+        # Read before commit expires the instance (it would be reloaded for this)
+        delivery_id = delivery.id
         db.session.commit()
+        publish_changes([delivery_id])
         
         flash('Delivery created successfully.', 'success')
         return redirect(url_for('admin.dashboard'))
@@ -89,17 +112,24 @@ def create_delivery():
 @admin_required
 def edit_delivery(delivery_id):
     """Edit an existing delivery."""
+    from archive import find_by_tracking_number
+    
     delivery = Delivery.query.get_or_404(delivery_id)
     form = DeliveryForm(obj=delivery)
     
     if form.validate_on_submit():
+        # Someone else saved the delivery after this form was loaded
+        if form.version.data is not None and form.version.data != delivery.version:
+            return _edit_conflict(form, delivery)
+        
         # Check if tracking number is being changed and already exists
         if form.tracking_number.data != delivery.tracking_number:
-            if Delivery.query.filter_by(tracking_number=form.tracking_number.data).first():
+            if find_by_tracking_number(form.tracking_number.data):
                 flash('Tracking number already exists.', 'danger')
                 return render_template('admin/delivery_form.html', form=form, title='Edit Delivery', delivery=delivery)
         
         # Update delivery fields
+        previous_status = delivery.status
         delivery.tracking_number = form.tracking_number.data
         delivery.recipient_name = form.recipient_name.data
         delivery.recipient_address = form.recipient_address.data
@@ -115,7 +145,17 @@ def edit_delivery(delivery_id):
         if form.status.data == 'delivered' and not delivery.actual_delivery_date:
             delivery.actual_delivery_date = date.today()
         
-        db.session.commit()
+        try:
+            record_change(previous_status, delivery.status)
+            if previous_status != delivery.status:
+                record_event(delivery_id, delivery.status, current_user.id)
+            deliveries_changed([delivery_id])
+            db.session.commit()
+        except StaleDataError:
+            # ...or saved it while this request was running
+            db.session.rollback()
+            return _edit_conflict(form, delivery)
+        publish_changes([delivery_id])
         
         flash('Delivery updated successfully.', 'success')
         return redirect(url_for('admin.dashboard'))
@@ -123,6 +163,19 @@ def edit_delivery(delivery_id):
     return render_template('admin/delivery_form.html', form=form, title='Edit Delivery', delivery=delivery)
 
 
+def _edit_conflict(form, delivery):
+    """Show the edit form again (409) with the submitted values and what changed meanwhile."""
+    changed = [form[name].label.text for name in EDITABLE_FIELDS
+               if (getattr(delivery, name) or None) != (form[name].data or None)]
+    # Submitting again means "overwrite with what I now see"
+    set_version(form, delivery.version)
+    message = 'Someone else saved this delivery while you were editing it. '
+    if changed:
+        message += f"Their values differ from yours for: {', '.join(changed)}. "
+    flash(message + 'Review the form and submit again to overwrite their changes.', 'warning')
+    return render_template('admin/delivery_form.html', form=form, title='Edit Delivery', delivery=delivery), 409
+
+
 @admin_bp.route('/delivery/<int:delivery_id>/delete', methods=['POST'])
 @login_required
 @admin_required
@@ -131,8 +184,20 @@ def delete_delivery(delivery_id):
     delivery = Delivery.query.get_or_404(delivery_id)
     
     tracking_number = delivery.tracking_number
-    db.session.delete(delivery)
-    db.session.commit()
+    status = delivery.status
+    try:
+        db.session.delete(delivery)
+        record_change(status, None)
+        record_event(delivery_id, 'deleted', current_user.id)
+        deliveries_changed([delivery_id])
+        db.session.commit()
+    except StaleDataError:
+        # Changed by someone else in the meantime: let the admin look first
+        db.session.rollback()
+        flash(f'Delivery {tracking_number} was just changed by someone else. Review it before deleting.',
+              'warning')
+        return redirect(url_for('admin.view_delivery', delivery_id=delivery_id))
+    publish_changes([], deleted_ids=[delivery_id])
     
     flash(f'Delivery {tracking_number} has been deleted successfully.', 'success')
     return redirect(url_for('admin.dashboard'))
@@ -143,6 +208,198 @@ def delete_delivery(delivery_id):
 @admin_required
 def view_delivery(delivery_id):
     """View details of a specific delivery."""
-    delivery = Delivery.query.get_or_404(delivery_id)
-    return render_template('admin/delivery_view.html', delivery=delivery)
+    from archive import last_updated, load_delivery
+    
+    # Only updated_at and the compacted history's version are read up front;
+    # the page is rendered if either changed. Archived parcels are found in
+    # the archive table.
+    updated_at = last_updated(delivery_id)
+    if updated_at is None:
+        abort(404)
+    
+    def render():
+        # The page shows who created and last updated it: one query, not three
+        delivery = load_delivery(delivery_id, with_users=True)
+        if delivery is None:
+            abort(404)
+        history_summary, history = timeline(delivery_id)
+        return render_template('admin/delivery_view.html', delivery=delivery,
+                               history=history, history_summary=history_summary)
+    
+    return conditional((updated_at, timeline_version(delivery_id)), updated_at, render)
+
+
+@admin_bp.route('/delivery/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_deliveries():
+    """
+    Bulk-import deliveries from an uploaded CSV/NDJSON manifest.
+    The import runs as a background job; ?id=<import id> shows its progress
+    and, once finished, its report.
+    """
+    # The job queue is only loaded when this page is used
+    import delivery_import
+    import jobs
+    
+    form = DeliveryImportForm()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
+    if form.validate_on_submit():
+        upload = form.manifest.data
+        fmt = form.format.data
+        if fmt == 'auto':
+            fmt = delivery_import.detect_format(upload.filename)
+        
+        # The same file uploaded again while its import is pending shares that job
+        queued, job = delivery_import.queue_import(upload.stream, upload.filename, fmt, current_user.id)
+        db.session.commit()
+        jobs.wake()
+        
+        status_url = url_for('admin.import_deliveries', id=queued.id)
+        if wants_json:
+            return jsonify({'import_id': queued.id, 'job_id': job.id, 'status': job.status}), 202, \
+                {'Location': status_url}
+        flash(f'Import of {queued.filename} queued as job #{job.id}.', 'info')
+        return redirect(status_url)
+    
+    queued = job = result = None
+    import_id = request.args.get('id', type=int)
+    if import_id is not None:
+        queued = db.session.get(DeliveryImport, import_id)
+        if queued is None:
+            abort(404)
+        # Finished jobs may have been purged; the report outlives them
+        job = db.session.get(Job, queued.job_id) if queued.job_id else None
+        result = json.loads(queued.report) if queued.report else None
+        if wants_json:
+            return jsonify({'import_id': queued.id, 'job_id': queued.job_id,
+                            'status': job.status if job else 'succeeded' if result else 'unknown',
+                            'report': result})
+    
+    return render_template('admin/import.html', form=form, queued=queued, job=job, result=result)
+
+
+@admin_bp.route('/delivery/export')
+@login_required
+@admin_required
+def export_deliveries():
+    """Stream all deliveries matching the dashboard filters as CSV or NDJSON."""
+    import delivery_export
+    
+    fmt = request.args.get('format', 'csv')
+    if fmt not in delivery_export.CONTENT_TYPES:
+        fmt = 'csv'
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
+    filters = parse_filters(request.args)
+    
+    body = delivery_export.export_deliveries(filters, fmt, compress)
+    headers = {
+        'Content-Disposition': f'attachment; filename={delivery_export.export_filename(fmt, compress)}',
+        # Tell proxies not to buffer the whole response before sending it on
+        'X-Accel-Buffering': 'no',
+    }
+    mimetype = 'application/gzip' if compress else delivery_export.CONTENT_TYPES[fmt]
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
 
+
+@admin_bp.route('/delivery/mark-late', methods=['POST'])
+@login_required
+@admin_required
+def mark_late():
+    """Queue late-delivery detection (a background job) and return right away."""
+    import jobs
+    
+    # Clicking again while a run is pending doesn't queue a second one
+    job = jobs.enqueue('mark_late', dedup_key='mark_late')
+    db.session.commit()
+    jobs.wake()
+    flash(f'Late-delivery detection queued as job #{job.id}; the dashboard updates when it finishes.', 'info')
+    return redirect(url_for('admin.dashboard'))
+
+
+@admin_bp.route('/jobs', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def list_jobs():
+    """Background jobs: recent runs with status, attempts and timing; queue maintenance tasks."""
+    import jobs
+    
+    form = JobForm()
+    form.task.choices = list(jobs.MAINTENANCE_TASKS.items())
+    if form.validate_on_submit():
+        job = jobs.enqueue(form.task.data, dedup_key=form.task.data)
+        db.session.commit()
+        jobs.wake()
+        flash(f'{jobs.MAINTENANCE_TASKS[form.task.data]} queued as job #{job.id}.', 'success')
+        return redirect(url_for('admin.list_jobs'))
+    
+    status = request.args.get('status')
+    if status not in jobs.JOB_STATUSES:
+        status = None
+    return render_template('admin/jobs.html', form=form, jobs=jobs.recent_jobs(status),
+                           counts=jobs.queue_counts(), status=status, worker=jobs.worker_status())
+
+
+@admin_bp.route('/analytics')
+@login_required
+@admin_required
+def analytics():
+    """SLA analytics: on-time rate, delay percentiles, throughput and weight per status."""
+    # NumPy is only loaded when this page is used
+    from analytics import parse_analytics_filters, sla_report
+    
+    filters = parse_analytics_filters(request.args)
+    report = sla_report(filters)
+    
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(report)
+    
+    creators = User.query.order_by(User.username).all()
+    return render_template('admin/analytics.html', report=report, filters=filters, creators=creators)
+
+
+@admin_bp.route('/dispatch', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def dispatch():
+    """Pack ongoing deliveries into truck loads; preview the plan or dispatch it (to in_route)."""
+    # NumPy is only loaded when this page is used
+    from dispatch import plan_dispatch
+    
+    form = DispatchForm()
+    if request.method == 'GET':
+        form.trucks.data = current_app.config['DISPATCH_TRUCKS']
+        form.capacity_kg.data = current_app.config['DISPATCH_TRUCK_CAPACITY_KG']
+    
+    plan = None
+    if form.validate_on_submit():
+        send = request.form.get('action') == 'dispatch'
+        plan = plan_dispatch(form.trucks.data, form.capacity_kg.data, current_user.id, dispatch=send)
+        if send:
+            # One reload for every dashboard rather than one row per parcel
+            publish_changes()
+            flash(f"Dispatched {plan['dispatched']} deliveries in {plan['trucks']} trucks "
+                  f"({plan['loaded_kg']} kg); {plan['left_behind']} stay ongoing.", 'success')
+            if plan['changed_meanwhile']:
+                flash(f"{plan['changed_meanwhile']} planned deliveries were changed by someone else "
+                      f"while planning and were not dispatched.", 'warning')
+            return redirect(url_for('admin.dashboard', status='in_route'))
+    
+    return render_template('admin/dispatch.html', form=form, plan=plan)
+
+
+@admin_bp.route('/search')
+@login_required
+@admin_required
+def search():
+    """Search deliveries by tracking number prefix or full text."""
+    from search import search_deliveries
+    
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    results = search_deliveries(query, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
+    return render_template('search.html', query=query, results=results,
+                           search_endpoint='admin.search',
+                           view_endpoint='admin.view_delivery',
+                           dashboard_endpoint='admin.dashboard')
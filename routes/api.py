@@ -0,0 +1,126 @@
+"""
+JSON API routes.
+Batch endpoints for handheld scanners and other non-browser clients.
+"""
+
+from functools import wraps
+from flask import Blueprint, jsonify, request, current_app
+from flask_login import current_user
+from live_updates import publish_changes
+
+api_bp = Blueprint('api', __name__)
+
+
+def api_login_required(f):
+    """Like login_required, but answers 401 JSON instead of redirecting to the login page."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required.'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@api_bp.route('/deliveries/status', methods=['POST'])
+@api_login_required
+def batch_update_status():
+    """
+    Apply a batch of status transitions keyed by tracking number.
+    Body: {"updates": [{"tracking_number": "...", "status": "in_route"}, ...]}
+    An optional "version" per update (the delivery version the client saw)
+    turns a change made by someone else in between into a per-item conflict.
+    """
+    from status_updates import apply_status_updates
+    
+    payload = request.get_json(silent=True)
+    updates = payload.get('updates') if isinstance(payload, dict) else None
+    if not isinstance(updates, list):
+        return jsonify({'error': 'Expected a JSON object with an "updates" list.'}), 400
+    
+    max_batch = current_app.config['API_MAX_BATCH_SIZE']
+    if len(updates) > max_batch:
+        return jsonify({'error': f'At most {max_batch} updates per request.'}), 413
+    
+    results = apply_status_updates(updates, current_user.id)
+    updated = sum(1 for result in results if result['ok'])
+    if updated:
+        changed = [result['tracking_number'] for result in results
+                   if result['ok'] and result['status'] != result['previous_status']]
+        if len(changed) <= current_app.config['LIVE_UPDATES_MAX_CHANGES']:
+            publish_changes(tracking_numbers=changed)
+        else:
+            publish_changes()
+    return jsonify({
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': results,
+    })
+
+
+@api_bp.route('/analytics/sla')
+@api_login_required
+def sla_analytics():
+    """SLA report as JSON: ?date_from=&date_to=&status=&created_by= (admins only)."""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    from analytics import parse_analytics_filters, sla_report
+    
+    return jsonify(sla_report(parse_analytics_filters(request.args)))
+
+
+@api_bp.route('/dispatch/plan', methods=['POST'])
+@api_login_required
+def dispatch_plan():
+    """
+    Pack ongoing deliveries into truck loads (admins only), with the delivery
+    ids of each load. Body: {"trucks": 10, "capacity_kg": 1000, "dispatch": false}
+    Omitted values use the configured defaults; "dispatch": true also moves
+    the loaded deliveries to in_route.
+    """
+    if not current_user.is_admin():
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    
+    trucks = payload.get('trucks')
+    capacity = payload.get('capacity_kg')
+    if trucks is not None and (not isinstance(trucks, int) or isinstance(trucks, bool) or trucks < 1):
+        return jsonify({'error': '"trucks" must be a positive integer.'}), 400
+    if capacity is not None and (not isinstance(capacity, (int, float)) or isinstance(capacity, bool)
+                                 or capacity <= 0):
+        return jsonify({'error': '"capacity_kg" must be a positive number.'}), 400
+    from dispatch import plan_dispatch
+    
+    plan = plan_dispatch(trucks, capacity, current_user.id, dispatch=payload.get('dispatch') is True,
+                         include_ids=True)
+    if plan['dispatched']:
+        publish_changes()
+    return jsonify(plan)
+
+
+@api_bp.route('/deliveries/search')
+@api_login_required
+def search():
+    """Ranked, paginated delivery search: ?q=...&page=N"""
+    from search import search_deliveries
+    
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    results = search_deliveries(query, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
+    return jsonify({
+        'query': query,
+        'mode': results.mode,
+        'page': results.page,
+        'has_next': results.has_next,
+        'results': [{
+            'id': delivery.id,
+            'tracking_number': delivery.tracking_number,
+            'recipient_name': delivery.recipient_name,
+            'recipient_address': delivery.recipient_address,
+            'status': delivery.status,
+            'created_at': delivery.created_at.isoformat() if delivery.created_at else None,
+        } for delivery in results],
+    })
@@ -7,9 +7,14 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
 from forms import LoginForm, RegistrationForm
+from user_cache import cache as user_cache
+from passwords import HashingBusy
 
 auth_bp = Blueprint('auth', __name__)
 
+# Seconds a client is asked to wait when the password hashing pool is full
+BUSY_RETRY_AFTER = 5
+
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -21,7 +26,22 @@ def login():
         user = User.query.filter_by(username=form.username.data).first()
         
         # Check if user exists and password is correct
-        if user and user.check_password(form.password.data):
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+        except HashingBusy:
+            flash('The server is busy. Please try logging in again in a moment.', 'warning')
+            return render_template('auth/login.html', form=form), 503, {'Retry-After': str(BUSY_RETRY_AFTER)}
+        
+        if valid:
+            # Transparently upgrade hashes made with an older method or cost
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(form.password.data)
+                    db.session.commit()
+                except HashingBusy:
+                    # The password was valid; upgrade the hash on a later login
+                    db.session.rollback()
+            
             login_user(user)
             next_page = request.args.get('next')
             
@@ -73,10 +93,16 @@ def register():
             email=form.email.data,
             role=form.role.data
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except HashingBusy:
+            flash('The server is busy. Please try registering the user again in a moment.', 'warning')
+            return render_template('auth/register.html', form=form), 503, {'Retry-After': str(BUSY_RETRY_AFTER)}
         
         db.session.add(user)
         db.session.commit()
+        # A previously deleted user may have left a record under this id
+        user_cache.invalidate(user.id)
         
         flash(f'User {user.username} has been registered successfully.', 'success')
         return redirect(url_for('admin.dashboard'))
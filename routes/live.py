@@ -0,0 +1,84 @@
+"""
+Live update routes.
+Server-sent event stream that keeps the admin and user dashboards current
+without reloading them (see live_updates.py).
+"""
+
+import json
+import time
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from flask_login import login_required, current_user
+from models import db
+from page_cache import cached_row
+from live_updates import catch_up, current_cursor, parse_cursor, subscribe, to_row
+
+live_bp = Blueprint('live', __name__)
+
+
+def _format_event(message, template):
+    """Render a broker message as one SSE 'changes' event for this user's dashboard."""
+    rows = [{
+        'id': payload['id'],
+        'status': payload['status'],
+        'created_at': payload['created_at'],
+        # Rendered through the shared fragment cache, so each row version is
+        # rendered once per process however many displays are connected
+        'html': str(cached_row(template, to_row(payload))),
+    } for payload in message.get('deliveries', [])]
+    data = json.dumps({
+        'counts': message.get('counts'),
+        'rows': rows,
+        'deleted': message.get('deleted', []),
+        'reload': message.get('reload', False),
+    })
+    cursor = message.get('cursor')
+    prefix = f'id: {cursor}\n' if cursor is not None else ''
+    return f'{prefix}event: changes\ndata: {data}\n\n'
+
+
+@live_bp.route('/deliveries')
+@login_required
+def deliveries():
+    """
+    Stream changed deliveries and status counts as server-sent events.
+    Resumes after ?cursor= or the Last-Event-ID header sent on reconnect.
+    """
+    config = current_app.config
+    cursor = parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('cursor'))
+    template = 'partials/delivery_row_admin.html' if current_user.is_admin() else 'partials/delivery_row_user.html'
+
+    def events():
+        # Subscribe before reading the log so nothing falls in between
+        subscription = subscribe()
+        try:
+            yield f"retry: {config['LIVE_UPDATES_RETRY_MS']}\n\n"
+            if cursor is None:
+                # Give the client a resume point even if nothing changes
+                yield f'id: {current_cursor()}\n\n'
+            else:
+                message = catch_up(cursor, config['LIVE_UPDATES_MAX_CHANGES'])
+                if message:
+                    yield _format_event(message, template)
+            # Hand the connection back to the pool; streams stay open for minutes
+            db.session.remove()
+
+            max_seconds = config['LIVE_UPDATES_MAX_SECONDS']
+            deadline = time.monotonic() + max_seconds if max_seconds else None
+            while deadline is None or time.monotonic() < deadline:
+                message = subscription.get(timeout=config['LIVE_UPDATES_HEARTBEAT'])
+                if message is None:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                else:
+                    yield _format_event(message, template)
+            # The client reconnects on its own and resumes from its last cursor
+        finally:
+            subscription.close()
+            db.session.remove()
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        # Tell proxies not to buffer the stream
+        'X-Accel-Buffering': 'no',
+    }
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
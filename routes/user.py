@@ -3,11 +3,16 @@ User routes.
 Handles viewing deliveries and updating delivery status (regular users).
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort
 from flask_login import login_required, current_user
-from models import db, Delivery
-from forms import StatusUpdateForm
-from datetime import datetime, date
+from models import Delivery
+from pagination import delivery_page
+from page_cache import conditional, current_version
+from delivery_events import timeline, timeline_version
+from live_updates import current_cursor, publish_changes
+from templating import stream_page
+from status_counts import get_counts
+from forms import StatusUpdateForm, set_version
 
 user_bp = Blueprint('user', __name__)
 
@@ -16,50 +21,84 @@ user_bp = Blueprint('user', __name__)
 @login_required
 def dashboard():
     """User dashboard showing all deliveries."""
-    # Get all deliveries ordered by creation date (newest first)
-    deliveries = Delivery.query.order_by(Delivery.created_at.desc()).all()
-    
-    # Count deliveries by status
-    status_counts = {
-        'ongoing': Delivery.query.filter_by(status='ongoing').count(),
-        'in_route': Delivery.query.filter_by(status='in_route').count(),
-        'late': Delivery.query.filter_by(status='late').count(),
-        'delivered': Delivery.query.filter_by(status='delivered').count(),
-        'total': Delivery.query.count()
-    }
+    def render():
+        # Get one page of deliveries ordered by creation date (newest first)
+        deliveries, filters = delivery_page(request.args)
+        
+        # Count deliveries by status (read from the maintained summary table)
+        status_counts = get_counts()
+        
+        # Queries are done; the page itself is streamed while it renders
+        return stream_page('user/dashboard.html', deliveries=deliveries, status_counts=status_counts,
+                           filters=filters, live_cursor=current_cursor())
     
-    return render_template('user/dashboard.html', deliveries=deliveries, status_counts=status_counts)
+    # Unchanged since the client's last visit: 304 without querying deliveries
+    version, changed_at = current_version()
+    return conditional((version,), changed_at, render)
 
 
 @user_bp.route('/delivery/<int:delivery_id>/view')
 @login_required
 def view_delivery(delivery_id):
     """View details of a specific delivery."""
-    delivery = Delivery.query.get_or_404(delivery_id)
-    return render_template('user/delivery_view.html', delivery=delivery)
+    from archive import last_updated, load_delivery
+    
+    # Only updated_at and the compacted history's version are read up front;
+    # the page is rendered if either changed. Archived parcels are found in
+    # the archive table.
+    updated_at = last_updated(delivery_id)
+    if updated_at is None:
+        abort(404)
+    
+    def render():
+        delivery = load_delivery(delivery_id)
+        if delivery is None:
+            abort(404)
+        history_summary, history = timeline(delivery_id)
+        return render_template('user/delivery_view.html', delivery=delivery,
+                               history=history, history_summary=history_summary)
+    
+    return conditional((updated_at, timeline_version(delivery_id)), updated_at, render)
 
 
 @user_bp.route('/delivery/<int:delivery_id>/update-status', methods=['GET', 'POST'])
 @login_required
 def update_status(delivery_id):
     """Update the status of a delivery (users can only update status)."""
+    from status_updates import change_status, VersionConflict
+    
     delivery = Delivery.query.get_or_404(delivery_id)
     form = StatusUpdateForm(obj=delivery)
     
     if form.validate_on_submit():
-        # Update only the status
-        delivery.status = form.status.data
-        delivery.updated_by_id = current_user.id
-        delivery.updated_at = datetime.utcnow()
-        
-        # Set actual delivery date if status is delivered
-        if form.status.data == 'delivered' and not delivery.actual_delivery_date:
-            delivery.actual_delivery_date = date.today()
-        
-        db.session.commit()
+        # Update only the status; retried if another worker saves at the same moment
+        try:
+            change_status(delivery_id, form.status.data, current_user.id, expected_version=form.version.data)
+        except VersionConflict as conflict:
+            # Someone else set a different status since this form was loaded
+            delivery = conflict.delivery
+            set_version(form, delivery.version)
+            flash(f'Someone else changed this delivery while you had it open; its status is now '
+                  f'"{dict(form.status.choices)[delivery.status]}". Submit again to change it anyway.', 'warning')
+            return render_template('user/update_status.html', form=form, delivery=delivery), 409
+        publish_changes([delivery_id])
         
         flash('Delivery status updated successfully.', 'success')
         return redirect(url_for('user.dashboard'))
     
     return render_template('user/update_status.html', form=form, delivery=delivery)
 
+
+@user_bp.route('/search')
+@login_required
+def search():
+    """Search deliveries by tracking number prefix or full text."""
+    from search import search_deliveries
+    
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    results = search_deliveries(query, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
+    return render_template('search.html', query=query, results=results,
+                           search_endpoint='user.search',
+                           view_endpoint='user.view_delivery',
+                           dashboard_endpoint='user.dashboard')
@@ -0,0 +1,174 @@
+"""
+Full-text search over deliveries.
+Indexes tracking_number, recipient_name, recipient_address and description
+with FTS5 on SQLite (an external-content table kept in sync by triggers) and
+with a generated tsvector column plus GIN index on PostgreSQL. Tracking
+number prefixes are looked up through the unique B-tree index, in the
+delivery table and in the archive (archived parcels aren't full-text indexed).
+
+install() creates the index structures; it runs as a schema migration.
+"""
+
+import re
+from sqlalchemy import or_, text
+from models import db, Delivery, ArchivedDelivery
+from pagination import row_query, to_rows
+
+# Words in a search query; everything else (quotes, operators) is dropped
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS delivery_fts USING fts5(
+        tracking_number, recipient_name, recipient_address, description,
+        content='delivery', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS delivery_fts_ai AFTER INSERT ON delivery BEGIN
+        INSERT INTO delivery_fts(rowid, tracking_number, recipient_name, recipient_address, description)
+        VALUES (new.id, new.tracking_number, new.recipient_name, new.recipient_address, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS delivery_fts_ad AFTER DELETE ON delivery BEGIN
+        INSERT INTO delivery_fts(delivery_fts, rowid, tracking_number, recipient_name, recipient_address, description)
+        VALUES ('delete', old.id, old.tracking_number, old.recipient_name, old.recipient_address, old.description);
+    END
+    """,
+    # Status-only updates don't touch the searchable columns, so skip them
+    """
+    CREATE TRIGGER IF NOT EXISTS delivery_fts_au
+    AFTER UPDATE OF tracking_number, recipient_name, recipient_address, description ON delivery BEGIN
+        INSERT INTO delivery_fts(delivery_fts, rowid, tracking_number, recipient_name, recipient_address, description)
+        VALUES ('delete', old.id, old.tracking_number, old.recipient_name, old.recipient_address, old.description);
+        INSERT INTO delivery_fts(rowid, tracking_number, recipient_name, recipient_address, description)
+        VALUES (new.id, new.tracking_number, new.recipient_name, new.recipient_address, new.description);
+    END
+    """,
+    # Index rows that existed before the table was created
+    "INSERT INTO delivery_fts(delivery_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_INSTALL = [
+    # A generated column is recomputed by PostgreSQL on every insert/update
+    """
+    ALTER TABLE delivery ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(tracking_number, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(recipient_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(recipient_address, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_delivery_search_vector ON delivery USING GIN (search_vector)",
+]
+
+
+class SearchResults:
+    """One page of search hits plus how they were found."""
+
+    def __init__(self, items, page, per_page, has_next, mode):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.has_next = has_next
+        self.mode = mode  # 'tracking', 'fulltext' or 'like'
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def install():
+    """Create the full-text index structures for the current database."""
+    dialect = db.session.connection().dialect.name
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}.get(dialect, [])
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def tokenize(query):
+    """Split a user query into plain word tokens."""
+    return TOKEN_RE.findall(query or '')
+
+
+def _tracking_prefix_query(prefix):
+    """
+    Tracking numbers starting with prefix, live and archived, as range scans
+    on the unique indexes.
+    (LIKE 'x%' can't use the index on SQLite or with non-C collations.)
+    """
+    live, archived = (row_query(model).filter(model.tracking_number >= prefix,
+                                              model.tracking_number < prefix + '\U0010ffff')
+                      for model in (Delivery, ArchivedDelivery))
+    return live.union_all(archived).order_by(Delivery.tracking_number)
+
+
+def _fulltext_ids(tokens, limit, offset):
+    """Return ranked delivery ids matching every token as a prefix."""
+    dialect = db.session.connection().dialect.name
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        rows = db.session.execute(text(
+            "SELECT rowid FROM delivery_fts WHERE delivery_fts MATCH :match "
+            "ORDER BY bm25(delivery_fts) LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'limit': limit, 'offset': offset})
+    else:
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        rows = db.session.execute(text(
+            "SELECT id FROM delivery, to_tsquery('simple', :tsquery) AS query "
+            "WHERE search_vector @@ query "
+            "ORDER BY ts_rank(search_vector, query) DESC, id DESC LIMIT :limit OFFSET :offset"
+        ), {'tsquery': tsquery, 'limit': limit, 'offset': offset})
+    return [row[0] for row in rows]
+
+
+def _like_query(tokens):
+    """Unindexed fallback for databases without a full-text engine."""
+    query = row_query()
+    for token in tokens:
+        pattern = f'%{token}%'
+        query = query.filter(or_(
+            Delivery.tracking_number.ilike(pattern),
+            Delivery.recipient_name.ilike(pattern),
+            Delivery.recipient_address.ilike(pattern),
+            Delivery.description.ilike(pattern),
+        ))
+    return query.order_by(Delivery.created_at.desc(), Delivery.id.desc())
+
+
+def search_deliveries(query, page=1, per_page=20):
+    """
+    Search deliveries, returning one page of ranked results.
+    A single-word query is first tried as a tracking-number prefix; if that
+    finds nothing, the full-text index is used.
+    """
+    page = max(1, page)
+    offset = (page - 1) * per_page
+    tokens = tokenize(query)
+    if not tokens:
+        return SearchResults([], page, per_page, False, 'fulltext')
+
+    raw = (query or '').strip()
+    if raw and not any(char.isspace() for char in raw):
+        items = to_rows(_tracking_prefix_query(raw).offset(offset).limit(per_page + 1))
+        if items:
+            return SearchResults(items[:per_page], page, per_page, len(items) > per_page, 'tracking')
+
+    dialect = db.session.connection().dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        items = to_rows(_like_query(tokens).offset(offset).limit(per_page + 1))
+        return SearchResults(items[:per_page], page, per_page, len(items) > per_page, 'like')
+
+    ids = _fulltext_ids(tokens, per_page + 1, offset)
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    # Fetch the rows by primary key, then restore the ranking order
+    by_id = {row.id: row for row in to_rows(row_query().filter(Delivery.id.in_(ids)))} if ids else {}
+    items = [by_id[delivery_id] for delivery_id in ids if delivery_id in by_id]
+    return SearchResults(items, page, per_page, has_next, 'fulltext')
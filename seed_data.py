@@ -0,0 +1,193 @@
+"""
+Synthetic data generator.
+Fills the database with realistic deliveries (1k to 10M) so production
+performance problems can be reproduced locally. Statuses follow the dates:
+parcels due in the past are mostly delivered (some late), recent ones are
+ongoing or in route. Rows are generated and bulk-inserted batch by batch
+(COPY on PostgreSQL, executemany elsewhere), so memory stays flat.
+
+Usage:
+    python seed_data.py --deliveries 100000 [--users 20] [--days 365] [--seed 42]
+"""
+
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert
+
+FIRST_NAMES = ('Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Felipe', 'Gabriela', 'Hugo', 'Isabela',
+               'João', 'Karina', 'Lucas', 'Mariana', 'Nuno', 'Olívia', 'Pedro', 'Rafaela', 'Sofia',
+               'Tiago', 'Vitória')
+LAST_NAMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida')
+STREETS = ('Rua das Flores', 'Avenida Paulista', 'Rua Augusta', 'Avenida Brasil', 'Rua do Comércio',
+           'Travessa São José', 'Alameda Santos', 'Rua XV de Novembro', 'Avenida Atlântica')
+CITIES = ('São Paulo - SP', 'Rio de Janeiro - RJ', 'Belo Horizonte - MG', 'Curitiba - PR',
+          'Porto Alegre - RS', 'Salvador - BA', 'Recife - PE', 'Fortaleza - CE')
+ITEMS = ('Electronics', 'Books', 'Clothing', 'Household goods', 'Spare parts', 'Documents',
+         'Pharmacy order', 'Groceries', None)
+
+# Share of overdue parcels that are still late rather than delivered
+LATE_SHARE = 0.08
+
+COLUMNS = ('tracking_number', 'recipient_name', 'recipient_address', 'recipient_phone', 'status',
+           'description', 'weight', 'estimated_delivery_date', 'actual_delivery_date',
+           'created_at', 'updated_at', 'created_by_id', 'updated_by_id')
+
+
+def generate_rows(count, user_ids, days, rng, prefix, today=None):
+    """Yield count delivery dicts created over the last `days` days."""
+    today = today or date.today()
+    now = datetime.combine(today, datetime.min.time()) + timedelta(hours=12)
+    window = days * 86400
+
+    for sequence in range(count):
+        created_at = now - timedelta(seconds=rng.randrange(window))
+        # Most parcels are promised for 1-7 days after they are registered
+        estimated = created_at.date() + timedelta(days=rng.choice((1, 2, 2, 3, 3, 3, 4, 5, 7)))
+        actual = None
+
+        if estimated < today:
+            if rng.random() < LATE_SHARE:
+                status = 'late'
+            else:
+                status = 'delivered'
+                # Mostly on time, with a long tail of delays
+                delay = min(int(rng.expovariate(0.7)) - 1, 20)
+                actual = min(estimated + timedelta(days=delay), today)
+        else:
+            status = 'in_route' if rng.random() < 0.45 else 'ongoing'
+
+        updated_at = created_at if status == 'ongoing' else min(
+            created_at + timedelta(hours=rng.randint(1, 72)), now)
+        creator = rng.choice(user_ids)
+        yield {
+            'tracking_number': f'{prefix}{sequence:010d}',
+            'recipient_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'recipient_address': f'{rng.choice(STREETS)}, {rng.randint(1, 4999)} - {rng.choice(CITIES)}',
+            'recipient_phone': f'+55 11 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}',
+            'status': status,
+            'description': rng.choice(ITEMS),
+            'weight': round(rng.lognormvariate(0.5, 0.9), 2),
+            'estimated_delivery_date': estimated,
+            'actual_delivery_date': actual,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'created_by_id': creator,
+            'updated_by_id': None if status == 'ongoing' else rng.choice(user_ids),
+        }
+
+
+def _copy_batch(connection, rows):
+    """PostgreSQL: stream a batch through COPY, much faster than INSERTs."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if row[column] is None else row[column] for column in COLUMNS])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(f"COPY delivery ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def ensure_users(count):
+    """Make sure at least `count` users exist (demo users included); return their ids."""
+    from models import db, User
+
+    existing = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+    for number in range(len(existing), count):
+        user = User(username=f'seed{number:04d}', email=f'seed{number:04d}@logistik.test', role='user')
+        user.set_password(f'seed{number:04d}')
+        db.session.add(user)
+    db.session.commit()
+    return [row[0] for row in db.session.query(User.id).order_by(User.id)]
+
+
+def seed(deliveries, users=20, days=365, batch_size=10000, seed_value=None, progress=True):
+    """
+    Insert `deliveries` synthetic rows, then bring the derived tables (status
+    counters, event log, page-cache version) up to date. Needs an app context.
+    Returns {'inserted', 'first_id', 'elapsed_s', 'rows_per_s'}.
+    """
+    from models import db, Delivery
+    import delivery_events
+    import page_cache
+    import status_counts
+
+    rng = random.Random(seed_value)
+    user_ids = ensure_users(users)
+    # Unique per run, so seeding twice adds rows instead of colliding
+    prefix = f'SD{int(time.time()) % 100000:05d}'
+    dialect = db.session.connection().dialect.name
+    # New ids follow every id ever handed out, not always max(id) + 1
+    previous_max_id = db.session.query(func.max(Delivery.id)).scalar() or 0
+
+    started = time.perf_counter()
+    inserted = 0
+    batch = []
+    for row in generate_rows(deliveries, user_ids, days, rng, prefix):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            inserted += _insert(batch, dialect)
+            batch = []
+            if progress:
+                print(f"  {inserted}/{deliveries} rows ({inserted / (time.perf_counter() - started):.0f}/s)",
+                      end='\r', flush=True)
+    if batch:
+        inserted += _insert(batch, dialect)
+    if progress:
+        print()
+
+    # Derived data, each in one set-based statement
+    delivery_events.backfill()
+    page_cache.bump()
+    db.session.commit()
+    status_counts.rebuild()
+    first_new_id = db.session.query(func.min(Delivery.id)).filter(Delivery.id > previous_max_id).scalar()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'inserted': inserted,
+        'first_id': first_new_id,
+        'elapsed_s': round(elapsed, 2),
+        'rows_per_s': round(inserted / elapsed) if elapsed else inserted,
+    }
+
+
+def _insert(rows, dialect):
+    from models import db, Delivery
+
+    if dialect == 'postgresql':
+        _copy_batch(db.session.connection(), rows)
+    else:
+        db.session.execute(insert(Delivery.__table__), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic deliveries.')
+    parser.add_argument('--deliveries', type=int, default=10000, help='rows to insert (1k to 10M)')
+    parser.add_argument('--users', type=int, default=20, help='users to spread deliveries across')
+    parser.add_argument('--days', type=int, default=365, help='creation dates span this many days back')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, help='random seed for reproducible data')
+    args = parser.parse_args()
+
+    from app import app
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade()
+        print(f"Generating {args.deliveries} deliveries...")
+        result = seed(args.deliveries, args.users, args.days, args.batch_size, args.seed)
+    print(f"✓ Inserted {result['inserted']} deliveries in {result['elapsed_s']} s "
+          f"({result['rows_per_s']} rows/s).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Incrementally maintained delivery status counters.
+Routes call record_change()/adjust() inside the same transaction as their
+delivery writes; dashboards read the summary with get_counts(). Archived
+parcels (see archive.py) keep counting as delivered, so archiving doesn't
+touch the counters.
+
+Run this file directly to rebuild or verify the counters:
+    python status_counts.py rebuild
+    python status_counts.py check
+"""
+
+from sqlalchemy import func
+from models import db, Delivery, ArchivedDelivery, DeliveryStatusCount, DELIVERY_STATUSES
+
+
+def adjust(deltas):
+    """
+    Apply {status: delta} changes to the counters.
+    Uses atomic "count = count + delta" updates so concurrent writers never
+    overwrite each other. Does not commit; the caller's commit covers it.
+    """
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        (db.session.query(DeliveryStatusCount)
+            .filter(DeliveryStatusCount.status == status)
+            .update({DeliveryStatusCount.count: DeliveryStatusCount.count + delta},
+                    synchronize_session=False))
+
+
+def record_change(old_status, new_status):
+    """
+    Record a single delivery moving between statuses.
+    Pass old_status=None for a new delivery and new_status=None for a deleted one.
+    """
+    if old_status == new_status:
+        return
+    deltas = {}
+    if old_status:
+        deltas[old_status] = deltas.get(old_status, 0) - 1
+    if new_status:
+        deltas[new_status] = deltas.get(new_status, 0) + 1
+    adjust(deltas)
+
+
+def _grouped_counts():
+    """Count deliveries per status with a single GROUP BY scan, plus the archive."""
+    rows = (db.session.query(Delivery.status, func.count(Delivery.id))
+            .group_by(Delivery.status)
+            .all())
+    counts = dict(rows)
+    archived = db.session.query(func.count(ArchivedDelivery.id)).scalar()
+    if archived:
+        counts['delivered'] = counts.get('delivered', 0) + archived
+    return counts
+
+
+def rebuild():
+    """Recompute every counter from the delivery table and commit."""
+    actual = _grouped_counts()
+    db.session.query(DeliveryStatusCount).delete(synchronize_session=False)
+    for status in set(DELIVERY_STATUSES) | set(actual):
+        db.session.add(DeliveryStatusCount(status=status, count=actual.get(status, 0)))
+    db.session.commit()
+    return actual
+
+
+def check():
+    """
+    Compare the counters with a fresh GROUP BY.
+    Returns {status: (stored, actual)} for every status that disagrees.
+    """
+    stored = {row.status: row.count for row in DeliveryStatusCount.query.all()}
+    actual = _grouped_counts()
+    mismatches = {}
+    for status in set(stored) | set(actual):
+        if stored.get(status, 0) != actual.get(status, 0):
+            mismatches[status] = (stored.get(status, 0), actual.get(status, 0))
+    return mismatches
+
+
+def get_counts():
+    """
+    Return the dashboard status counts, including the total.
+    Reads the small summary table; the first call on a database that has
+    never been counted builds it once with rebuild().
+    """
+    rows = DeliveryStatusCount.query.all()
+    if not rows:
+        rebuild()
+        rows = DeliveryStatusCount.query.all()
+
+    counts = {status: 0 for status in DELIVERY_STATUSES}
+    for row in rows:
+        counts[row.status] = row.count
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    with app.app_context():
+        # Make sure the summary table exists on databases created before it
+        db.create_all(bind_key=None)
+        if command == 'rebuild':
+            counts = rebuild()
+            print("✓ Status counters rebuilt:")
+            for status in DELIVERY_STATUSES:
+                print(f"  {status}: {counts.get(status, 0)}")
+        elif command == 'check':
+            mismatches = check()
+            if mismatches:
+                print("✗ Status counters are out of sync:")
+                for status, (stored, actual) in sorted(mismatches.items()):
+                    print(f"  {status}: stored={stored} actual={actual}")
+                print("Run 'python status_counts.py rebuild' to fix them.")
+                sys.exit(1)
+            print("✓ Status counters are consistent.")
+        else:
+            print("Usage: python status_counts.py [rebuild|check]")
+            sys.exit(2)
@@ -0,0 +1,256 @@
+"""
+Delivery status transitions.
+Applies many status changes with one UPDATE per status transition instead of
+loading and committing each Delivery, while keeping the same rules as the
+update_status route (updated_by_id/updated_at, actual_delivery_date when
+delivered) and the status counters in sync.
+
+Single-delivery changes (change_status) and batches (apply_status_updates)
+are optimistic: no row lock is taken, and a change that loses a race with
+another writer is retried on the fresh row instead of overwriting it.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime
+from sqlalchemy import func, tuple_, update
+from sqlalchemy.orm.exc import StaleDataError
+from models import db, Delivery, DELIVERY_STATUSES
+from status_counts import adjust, record_change
+from page_cache import deliveries_changed
+from delivery_events import record_event, record_events
+
+# Max parameters per IN (...) list, under SQLite's default bind limit (32766)
+IN_CHUNK_SIZE = 5000
+
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _status_values(status, user_id):
+    """Column values of a status change, as the update_status route sets them."""
+    values = {
+        Delivery.status: status,
+        Delivery.updated_by_id: user_id,
+        Delivery.updated_at: datetime.utcnow(),
+        # Concurrent edits of these rows must see them as changed
+        Delivery.version: Delivery.version + 1,
+    }
+    # Set actual delivery date if status is delivered (and not set before)
+    if status == 'delivered':
+        values[Delivery.actual_delivery_date] = func.coalesce(Delivery.actual_delivery_date, date.today())
+    return {column.key: value for column, value in values.items()}
+
+
+def move_status(versions, from_status, status, user_id):
+    """
+    Move deliveries from from_status to status with one UPDATE per id chunk,
+    but only those still at the version the caller read ({delivery_id:
+    version}); rows another writer changed or deleted in the meantime are
+    left alone. Needs no row locks. Does not touch the status counters or
+    page cache and does not commit; returns the ids actually updated.
+    """
+    table = Delivery.__table__
+    values = _status_values(status, user_id)
+    moved = []
+    # Three bind parameters per delivery; the plain id IN (...) lets SQLite
+    # use the primary key, which it doesn't for the (id, version) row values
+    for chunk in _chunks(list(versions.items()), IN_CHUNK_SIZE // 3):
+        result = db.session.execute(
+            update(table)
+            .where(table.c.id.in_([delivery_id for delivery_id, _ in chunk]),
+                   tuple_(table.c.id, table.c.version).in_(chunk),
+                   table.c.status == from_status)
+            .values(values)
+            .returning(table.c.id)
+        )
+        moved.extend(result.scalars())
+    return moved
+
+
+# Tries for a status change that keeps losing races with other writers
+STATUS_CHANGE_ATTEMPTS = 3
+
+StatusChange = namedtuple('StatusChange', 'delivery previous_status changed attempts')
+
+
+class VersionConflict(Exception):
+    """The delivery was changed by someone else since the client loaded it."""
+
+    def __init__(self, delivery):
+        super().__init__(f'Delivery {delivery.id} changed (now version {delivery.version}).')
+        self.delivery = delivery
+
+
+def apply_status(delivery, status, user_id):
+    """
+    Set a loaded delivery's status like the routes do, keeping the counters,
+    event log and page cache in step. Does not commit; returns the old status.
+    """
+    previous = delivery.status
+    delivery.status = status
+    delivery.updated_by_id = user_id
+    delivery.updated_at = datetime.utcnow()
+    
+    # Set actual delivery date if status is delivered
+    if status == 'delivered' and not delivery.actual_delivery_date:
+        delivery.actual_delivery_date = date.today()
+    
+    record_change(previous, status)
+    if previous != status:
+        record_event(delivery.id, status, user_id)
+    deliveries_changed([delivery.id])
+    return previous
+
+
+def change_status(delivery_id, status, user_id, expected_version=None, attempts=STATUS_CHANGE_ATTEMPTS):
+    """
+    Change one delivery's status and commit, without locking the row.
+    expected_version is the version the client saw. If the delivery changed
+    since, the request is a no-op when it already has that status (setting a
+    status is idempotent) and a VersionConflict otherwise. A change that
+    loses a race at commit is retried on the re-read row, up to `attempts`
+    times. Returns a StatusChange, or None if the delivery doesn't exist.
+    """
+    for attempt in range(1, attempts + 1):
+        delivery = db.session.get(Delivery, delivery_id, populate_existing=True)
+        if delivery is None:
+            return None
+        if expected_version is not None and delivery.version != expected_version:
+            if delivery.status == status:
+                return StatusChange(delivery, status, False, attempt)
+            raise VersionConflict(delivery)
+        try:
+            previous = apply_status(delivery, status, user_id)
+            db.session.commit()
+            return StatusChange(delivery, previous, previous != status, attempt)
+        except StaleDataError:
+            # Another writer updated the row after we read it
+            db.session.rollback()
+    raise VersionConflict(delivery)
+
+
+def _current_statuses(tracking_numbers):
+    """
+    Return {tracking_number: (id, status, version)}. No rows are locked:
+    the UPDATEs that follow only change rows still at the status and
+    version read here.
+    """
+    found = {}
+    for chunk in _chunks(list(tracking_numbers)):
+        rows = (db.session.query(Delivery.id, Delivery.tracking_number, Delivery.status, Delivery.version)
+                .filter(Delivery.tracking_number.in_(chunk))
+                .all())
+        for row in rows:
+            found[row.tracking_number] = (row.id, row.status, row.version)
+    return found
+
+
+def _conflict(tracking_number, status, version):
+    return {'tracking_number': tracking_number, 'ok': False, 'conflict': True,
+            'error': f'Changed by someone else; now {status!r} at version {version}.',
+            'current_status': status, 'current_version': version}
+
+
+def apply_status_updates(updates, user_id, source='api'):
+    """
+    Apply a batch of {'tracking_number', 'status'[, 'version']} updates in
+    one transaction. Returns one result dict per input item, in input order.
+    When the same tracking number appears twice, the last occurrence wins.
+
+    Like change_status, without row locks: each delivery is only updated at
+    the version just read. With a version (the one the client saw) an item
+    whose delivery changed since is a conflict, or a no-op if it already has
+    the requested status; without one, a delivery that changes between the
+    read and the UPDATE is re-read and tried again.
+    """
+    results = [None] * len(updates)
+    targets = {}  # tracking_number -> (index, status)
+    expected = {}  # tracking_number -> version the client saw
+
+    for index, item in enumerate(updates):
+        tracking_number = item.get('tracking_number') if isinstance(item, dict) else None
+        status = item.get('status') if isinstance(item, dict) else None
+        version = item.get('version') if isinstance(item, dict) else None
+        if not tracking_number or not isinstance(tracking_number, str):
+            results[index] = {'tracking_number': tracking_number, 'ok': False,
+                              'error': 'Missing tracking_number.'}
+            continue
+        if status not in DELIVERY_STATUSES:
+            results[index] = {'tracking_number': tracking_number, 'ok': False,
+                              'error': f'Invalid status: {status!r}.'}
+            continue
+        if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+            results[index] = {'tracking_number': tracking_number, 'ok': False,
+                              'error': f'Invalid version: {version!r}.'}
+            continue
+        if tracking_number in targets:
+            superseded, _ = targets[tracking_number]
+            results[superseded] = {'tracking_number': tracking_number, 'ok': False,
+                                   'error': 'Superseded by a later update in the same batch.'}
+        targets[tracking_number] = (index, status)
+        expected.pop(tracking_number, None)
+        if version is not None:
+            expected[tracking_number] = version
+
+    updated = []
+    changed_by_status = {}  # only real transitions go to the event log
+    deltas = {}
+    pending = targets
+    for _ in range(STATUS_CHANGE_ATTEMPTS):
+        current = _current_statuses(pending)
+        moves = {}  # (previous, status) -> {delivery_id: version}
+        tracking_numbers = {}  # delivery_id -> tracking_number
+        for tracking_number, (index, status) in pending.items():
+            if tracking_number not in current:
+                results[index] = {'tracking_number': tracking_number, 'ok': False,
+                                  'error': 'Delivery not found.'}
+                continue
+            delivery_id, previous, version = current[tracking_number]
+            seen = expected.get(tracking_number)
+            if seen is not None and seen != version:
+                # Setting a status is idempotent; anything else overwrites a change
+                if previous == status:
+                    results[index] = {'tracking_number': tracking_number, 'ok': True, 'status': status,
+                                      'previous_status': previous, 'version': version}
+                else:
+                    results[index] = _conflict(tracking_number, previous, version)
+                continue
+            moves.setdefault((previous, status), {})[delivery_id] = version
+            tracking_numbers[delivery_id] = tracking_number
+
+        lost = {}
+        for (previous, status), versions in moves.items():
+            moved = set(move_status(versions, previous, status, user_id))
+            for delivery_id, version in versions.items():
+                tracking_number = tracking_numbers[delivery_id]
+                if delivery_id not in moved:
+                    # Another writer got there between the read and the UPDATE
+                    lost[tracking_number] = pending[tracking_number]
+                    continue
+                updated.append(delivery_id)
+                if previous != status:
+                    changed_by_status.setdefault(status, []).append(delivery_id)
+                    deltas[previous] = deltas.get(previous, 0) - 1
+                    deltas[status] = deltas.get(status, 0) + 1
+                results[pending[tracking_number][0]] = {
+                    'tracking_number': tracking_number, 'ok': True, 'status': status,
+                    'previous_status': previous, 'version': version + 1}
+        pending = lost
+        if not pending:
+            break
+
+    # Still losing races after every attempt
+    if pending:
+        current = _current_statuses(pending)
+        for tracking_number, (index, _) in pending.items():
+            _, status, version = current.get(tracking_number, (None, None, None))
+            results[index] = _conflict(tracking_number, status, version)
+
+    for status, delivery_ids in changed_by_status.items():
+        record_events(delivery_ids, status, user_id, source)
+    adjust(deltas)
+    deliveries_changed(updated)
+    db.session.commit()
+    return results
@@ -0,0 +1,144 @@
+"""
+Template rendering helpers for large pages.
+
+stream_page() sends a template to the client while it renders: the view's
+queries run first, then the page goes out in STREAM_BUFFER_SIZE chunks, so
+the first bytes arrive as soon as the header markup is ready and the whole
+HTML body never sits in memory at once. The database connection goes back
+to the pool before the body is generated.
+
+Compiled templates are kept in a Jinja bytecode cache on disk
+(TEMPLATE_CACHE_DIR), so a cold process loads them instead of compiling
+them again. Entries are keyed by each template's source checksum, which
+makes a stale cache harmless. "python templating.py compile" fills the
+cache ahead of time, e.g. in a build step whose output ships with the
+deployment; a read-only cache directory is used as is.
+
+Status badges are rendered once per status (status_badge()) rather than by
+an if/elif chain in every row, and long addresses are shortened by one
+filter call (short_address) instead of a slice plus a length test.
+
+Usage:
+    python templating.py compile [--dir PATH]
+"""
+
+import os
+import time
+from flask import current_app, render_template, session, stream_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
+from models import db
+
+# Badge label and Bootstrap classes per delivery status
+STATUS_BADGE_STYLES = {
+    'ongoing': ('Ongoing', 'bg-secondary'),
+    'in_route': ('In Route', 'bg-primary'),
+    'late': ('Late', 'bg-warning text-dark'),
+    'delivered': ('Delivered', 'bg-success'),
+}
+
+STATUS_BADGES = {
+    status: Markup(f'<span class="badge {classes} status-badge">{escape(label)}</span>')
+    for status, (label, classes) in STATUS_BADGE_STYLES.items()
+}
+
+
+def status_badge(status):
+    """Precomputed badge markup for a status (unknown statuses show as Ongoing)."""
+    return STATUS_BADGES.get(status, STATUS_BADGES['ongoing'])
+
+
+def short_address(address, length=50):
+    """The first `length` characters of an address, with "..." when it was longer."""
+    if len(address) > length:
+        return address[:length] + '...'
+    return address
+
+
+class BytecodeCache(FileSystemBytecodeCache):
+    """Jinja's file cache, but a read-only or full cache directory only costs a recompile."""
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def _buffered(chunks, size):
+    """Join the many small strings Jinja yields into chunks of about `size` characters."""
+    pending = []
+    length = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(pending)
+            pending = []
+            length = 0
+    if pending:
+        yield ''.join(pending)
+
+
+def stream_page(template_name, **context):
+    """
+    Render a page as a streamed response. Call it after the view has run its
+    queries. Falls back to render_template() when streaming is disabled or a
+    flash message is pending: flashes are removed from the session while
+    rendering, and the session cookie has been sent by then.
+    """
+    config = current_app.config
+    if not config['STREAM_TEMPLATES'] or '_flashes' in session:
+        return render_template(template_name, **context)
+
+    chunks = stream_template(template_name, **context)
+    # Everything the page needs is loaded; don't hold a connection while
+    # a slow client downloads it
+    db.session.remove()
+    return current_app.response_class(_buffered(chunks, config['STREAM_BUFFER_SIZE']), mimetype='text/html')
+
+
+def compile_templates(app):
+    """Load every template once so its bytecode is written to the cache. Returns (count, ms)."""
+    env = app.jinja_env
+    started = time.perf_counter()
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        env.get_template(name)
+    return len(names), round((time.perf_counter() - started) * 1000, 2)
+
+
+def init_app(app):
+    """Install the bytecode cache, the status_badge() global and the short_address filter."""
+    directory = app.config['TEMPLATE_CACHE_DIR']
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            # Read-only filesystem: use whatever was shipped, if anything
+            pass
+        if os.path.isdir(directory):
+            app.jinja_env.bytecode_cache = BytecodeCache(directory)
+    app.add_template_global(status_badge)
+    app.add_template_filter(short_address)
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description='Template bytecode cache maintenance.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    compile_parser = commands.add_parser('compile', help='precompile every template into the bytecode cache')
+    compile_parser.add_argument('--dir', help='cache directory (default: TEMPLATE_CACHE_DIR)')
+    args = parser.parse_args()
+
+    if args.dir:
+        os.makedirs(args.dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = BytecodeCache(args.dir)
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        print("✗ No bytecode cache configured (set TEMPLATE_CACHE_DIR or pass --dir).")
+        raise SystemExit(1)
+    count, elapsed_ms = compile_templates(app)
+    print(f"✓ Compiled {count} templates into {cache.directory} in {elapsed_ms} ms.")
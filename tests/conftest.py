@@ -0,0 +1,101 @@
+"""
+Shared pytest fixtures.
+The app runs against a throwaway SQLite database, migrated once per test
+session by the first request; every test starts with no deliveries, events,
+archive rows or jobs, and with the status counters rebuilt.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Config reads the environment when app.py is imported
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'test.db')
+os.environ['IMPORT_UPLOAD_DIR'] = os.path.join(scratch, 'imports')
+os.environ['JOB_WORKER_THREADS'] = '0'
+os.environ['LATE_DETECTION_INTERVAL'] = '0'
+os.environ['FRAGMENT_CACHE_SIZE'] = '0'
+for name in ('READ_REPLICA_URLS', 'SKIP_DB_BOOTSTRAP'):
+    os.environ.pop(name, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app
+from models import (db, User, Delivery, ArchivedDelivery, DeliveryEvent, DeliveryEventSummary,
+                    DeliveryImport, Job)
+import status_counts
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    # The first request runs the migrations and creates the demo users
+    flask_app.test_client().get('/health')
+    return flask_app
+
+
+@pytest.fixture(autouse=True)
+def ctx(app):
+    """An app context over an emptied database."""
+    with app.app_context():
+        for model in (DeliveryEvent, DeliveryEventSummary, ArchivedDelivery, Delivery, DeliveryImport, Job):
+            db.session.query(model).delete(synchronize_session=False)
+        db.session.commit()
+        status_counts.rebuild()
+        yield
+        db.session.rollback()
+
+
+@pytest.fixture
+def admin(ctx):
+    return User.query.filter_by(username='admin').one()
+
+
+@pytest.fixture
+def make_deliveries(admin):
+    """
+    Insert deliveries and bring the counters up to date. Each keyword
+    argument may be a list (one value per delivery) or a single value.
+    created_at defaults to one minute apart, newest last.
+    """
+    def make(count, **fields):
+        start = datetime(2026, 1, 1)
+        deliveries = []
+        for index in range(count):
+            values = {
+                'tracking_number': f'T{index:05d}',
+                'recipient_name': 'Recipient',
+                'recipient_address': 'Somewhere 1',
+                'recipient_phone': '555',
+                'status': 'ongoing',
+                'created_at': start + timedelta(minutes=index),
+                'created_by_id': admin.id,
+            }
+            for name, value in fields.items():
+                values[name] = value[index] if isinstance(value, list) else value
+            deliveries.append(Delivery(**values))
+        db.session.add_all(deliveries)
+        db.session.commit()
+        status_counts.rebuild()
+        return deliveries
+    return make
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
+
+
+@pytest.fixture
+def user_client(client):
+    client.post('/auth/login', data={'username': 'user', 'password': 'user123'})
+    return client
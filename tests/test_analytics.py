@@ -0,0 +1,37 @@
+"""SLA analytics: the columnar fetch and the report cache."""
+
+from datetime import date
+
+import numpy as np
+from werkzeug.datastructures import MultiDict
+
+import analytics
+from analytics import fetch_columns, float_columns, parse_analytics_filters, sla_report
+
+
+def test_float_columns_fills_nan_for_null():
+    data = float_columns(iter([(1, 2.5, None), (4, None, 7)]), 3)
+    assert data.shape == (2, 3)
+    assert np.array_equal(data, [[1, 2.5, np.nan], [4, np.nan, 7]], equal_nan=True)
+    assert float_columns(iter([]), 5).shape == (0, 5)
+
+
+def test_fetch_columns_encodes_each_delivery(make_deliveries):
+    make_deliveries(2, status=['ongoing', 'delivered'], weight=[1.5, None],
+                    estimated_delivery_date=date(2026, 1, 3), actual_delivery_date=[None, date(2026, 1, 5)])
+    data = fetch_columns(parse_analytics_filters(MultiDict({'date_from': '2025-12-01'})))
+    epoch = date(1970, 1, 1)
+    assert np.array_equal(data[np.argsort(data[:, 0])], [
+        [1, 1.5, (date(2026, 1, 1) - epoch).days, (date(2026, 1, 3) - epoch).days, np.nan],
+        [4, np.nan, (date(2026, 1, 1) - epoch).days, (date(2026, 1, 3) - epoch).days,
+         (date(2026, 1, 5) - epoch).days],
+    ], equal_nan=True)
+
+
+def test_report_cache_ttl_comes_from_config(app, make_deliveries, monkeypatch):
+    monkeypatch.setattr(analytics, 'cache', analytics.ReportCache(ttl=None))
+    make_deliveries(1)
+    filters = parse_analytics_filters(MultiDict({'date_from': '2025-12-01'}))
+    assert not sla_report(filters)['cached']
+    assert analytics.cache.ttl == app.config['ANALYTICS_CACHE_TTL']
+    assert sla_report(filters)['cached']
@@ -0,0 +1,70 @@
+"""Archival of delivered parcels: counters, id allocation and the readers of both tables."""
+
+import io
+from datetime import datetime, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from models import db, ArchivedDelivery
+from analytics import STATUS, fetch_columns, parse_analytics_filters
+from archive import archive_delivered
+from delivery_export import iter_export_rows
+from delivery_import import import_deliveries
+from pagination import parse_filters
+from status_counts import check, get_counts
+
+
+def test_archived_deliveries_still_count_as_delivered(make_deliveries):
+    old = datetime.utcnow() - timedelta(days=30)
+    make_deliveries(3, status=['delivered', 'delivered', 'ongoing'], updated_at=old)
+    before = get_counts()
+
+    result = archive_delivered(older_than_days=1, pause=0)
+
+    assert result['archived'] == 2
+    assert db.session.query(ArchivedDelivery).count() == 2
+    assert check() == {}
+    assert get_counts() == before
+
+
+def test_newest_delivery_can_be_archived_without_id_reuse(admin, make_deliveries):
+    old = datetime.utcnow() - timedelta(days=30)
+    newest_id = make_deliveries(2, status='delivered', updated_at=old)[-1].id
+    archive_delivered(older_than_days=1, pause=0)
+
+    fresh, = make_deliveries(1, tracking_number='FRESH')
+    assert fresh.id > newest_id
+    assert check() == {}
+
+
+def archive_some(make_deliveries):
+    """Five deliveries, the delivered ones (T00001 and T00003) archived."""
+    old = datetime.utcnow() - timedelta(days=30)
+    deliveries = make_deliveries(5, status=['ongoing', 'delivered'] * 2 + ['late'], updated_at=old)
+    ids = [delivery.id for delivery in deliveries]
+    assert archive_delivered(older_than_days=1, pause=0)['archived'] == 2
+    return ids
+
+
+def test_export_merges_live_and_archived_rows_in_id_order(make_deliveries):
+    ids = archive_some(make_deliveries)
+
+    rows = list(iter_export_rows(parse_filters(MultiDict()), batch_size=2))
+    assert [row[0] for row in rows] == ids
+    # Filters apply to both tables
+    rows = list(iter_export_rows(parse_filters(MultiDict({'status': 'delivered'}))))
+    assert [row[1] for row in rows] == ['T00001', 'T00003']
+
+
+def test_analytics_reads_the_archive(make_deliveries):
+    archive_some(make_deliveries)
+    data = fetch_columns(parse_analytics_filters(MultiDict({'date_from': '2025-12-01'})))
+    assert sorted(data[:, STATUS].astype(int).tolist()) == [1, 1, 3, 4, 4]
+
+
+def test_import_rejects_archived_tracking_numbers(admin, make_deliveries):
+    archive_some(make_deliveries)
+    manifest = b'tracking_number,recipient_name,recipient_address,recipient_phone\nT00001,Ana,Rua 1,555\n'
+    result = import_deliveries(io.BytesIO(manifest), 'csv', admin.id)
+    assert result.inserted == 0
+    assert result.errors[0]['errors'] == ['Tracking number already exists.']
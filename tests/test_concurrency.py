@@ -0,0 +1,85 @@
+"""Optimistic concurrency: a change based on a stale version is refused, not applied."""
+
+import pytest
+
+from models import db, Delivery
+from status_counts import check
+from status_updates import VersionConflict, apply_status_updates, change_status
+
+
+def reload(delivery_id):
+    return db.session.get(Delivery, delivery_id, populate_existing=True)
+
+
+def test_stale_status_form_gets_409(admin, make_deliveries, user_client):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'in_route', admin.id)  # now version 2
+
+    response = user_client.post(f'/user/delivery/{delivery.id}/update-status',
+                                data={'status': 'delivered', 'version': 1})
+
+    assert response.status_code == 409
+    assert reload(delivery.id).status == 'in_route'
+    assert check() == {}
+
+
+def test_current_status_form_is_applied(make_deliveries, user_client):
+    delivery, = make_deliveries(1)
+    response = user_client.post(f'/user/delivery/{delivery.id}/update-status',
+                                data={'status': 'delivered', 'version': 1})
+    assert response.status_code == 302
+    assert reload(delivery.id).status == 'delivered'
+
+
+def test_stale_edit_form_gets_409(admin, make_deliveries, admin_client):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'late', admin.id)
+
+    response = admin_client.post(f'/admin/delivery/{delivery.id}/edit', data={
+        'tracking_number': delivery.tracking_number, 'recipient_name': 'Someone else',
+        'recipient_address': 'Elsewhere', 'recipient_phone': '555', 'status': 'ongoing', 'version': 1,
+    })
+
+    assert response.status_code == 409
+    delivery = reload(delivery.id)
+    assert (delivery.status, delivery.recipient_name) == ('late', 'Recipient')
+
+
+def test_change_status_conflict_and_idempotent_retry(admin, make_deliveries):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'in_route', admin.id)
+
+    with pytest.raises(VersionConflict) as conflict:
+        change_status(delivery.id, 'delivered', admin.id, expected_version=1)
+    assert conflict.value.delivery.version == 2
+
+    # Asking again for the status it already has is not a conflict
+    change = change_status(delivery.id, 'in_route', admin.id, expected_version=1)
+    assert not change.changed
+
+
+def test_batch_reports_per_item_conflicts(admin, make_deliveries):
+    first, second = make_deliveries(2)
+    change_status(second.id, 'late', admin.id)
+
+    results = apply_status_updates([
+        {'tracking_number': first.tracking_number, 'status': 'in_route', 'version': 1},
+        {'tracking_number': second.tracking_number, 'status': 'delivered', 'version': 1},
+    ], admin.id)
+
+    assert results[0]['ok'] and results[0]['version'] == 2
+    assert not results[1]['ok'] and results[1]['conflict']
+    assert (results[1]['current_status'], results[1]['current_version']) == ('late', 2)
+    assert reload(second.id).status == 'late'
+    assert check() == {}
+
+
+def test_api_batch_conflict(admin, make_deliveries, user_client):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'late', admin.id)
+
+    response = user_client.post('/api/deliveries/status', json={'updates': [
+        {'tracking_number': delivery.tracking_number, 'status': 'delivered', 'version': 1}]})
+
+    assert response.status_code == 200
+    assert response.json['failed'] == 1 and response.json['results'][0]['conflict']
@@ -0,0 +1,59 @@
+"""Delivery event log: timelines, compaction into summaries and the pages showing them."""
+
+from datetime import datetime, timedelta
+
+from models import db, DeliveryEvent
+from delivery_events import SOURCE_CODES, STATUS_CODES, compact, timeline
+from status_updates import change_status
+
+
+def add_events(delivery_id, *events):
+    """Log (days_ago, status) events for a delivery."""
+    now = datetime.utcnow()
+    db.session.add_all(DeliveryEvent(delivery_id=delivery_id, occurred_at=now - timedelta(days=days_ago),
+                                     status=STATUS_CODES[status], source=SOURCE_CODES['web'])
+                       for days_ago, status in events)
+    db.session.commit()
+
+
+def test_compaction_folds_old_events_into_summaries(make_deliveries):
+    first, second = make_deliveries(2)
+    add_events(first.id, (10, 'ongoing'), (9, 'in_route'), (1, 'delivered'))
+    add_events(second.id, (8, 'ongoing'))
+
+    # One delivery per batch
+    result = compact(older_than_days=5, batch_size=1)
+    assert (result['deliveries'], result['events']) == (2, 3)
+
+    summary, events = timeline(first.id)
+    assert (summary.event_count, summary.first_status, summary.last_status) == (2, 'ongoing', 'in_route')
+    assert summary.last_at - summary.first_at == timedelta(days=1)
+    assert [event.status for event in events] == ['delivered']
+    summary, events = timeline(second.id)
+    assert (summary.event_count, summary.last_status, events) == (1, 'ongoing', [])
+
+
+def test_later_compaction_extends_the_summary(make_deliveries):
+    delivery, = make_deliveries(1)
+    add_events(delivery.id, (10, 'ongoing'), (1, 'late'))
+    compact(older_than_days=5)
+    first_at = timeline(delivery.id)[0].first_at
+
+    compact(older_than_days=0)
+    summary, events = timeline(delivery.id)
+    assert (summary.event_count, summary.first_at, summary.last_status, events) == (2, first_at, 'late', [])
+    assert compact(older_than_days=0)['events'] == 0
+
+
+def test_compaction_invalidates_the_delivery_page(admin, make_deliveries, user_client):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'in_route', admin.id)
+    url = f'/user/delivery/{delivery.id}/view'
+    etag = user_client.get(url).headers['ETag']
+    assert user_client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # Fold every event, leaving the delivery row untouched
+    assert compact(older_than_days=-1)['events'] == 1
+
+    response = user_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
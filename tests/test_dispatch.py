@@ -0,0 +1,79 @@
+"""Dispatch planner: pack() never overloads a truck and only loads parcels that fit."""
+
+import numpy as np
+import pytest
+
+from dispatch import DUE, ID, VERSION, WEIGHT, pack, summarise
+
+
+def parcels(count, seed, unweighed=0.05, undated=0.1):
+    """(count, 4) array like fetch_ongoing() returns, with some NaN weights and due days."""
+    rng = np.random.default_rng(seed)
+    data = np.ones((count, 4))
+    data[:, ID] = np.arange(1, count + 1)
+    data[:, WEIGHT] = np.round(rng.lognormal(1.5, 1.0, count), 2)
+    data[:, DUE] = 20000 + rng.integers(0, 30, count)
+    data[rng.random(count) < unweighed, WEIGHT] = np.nan
+    data[rng.random(count) < undated, DUE] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('count, trucks, capacity, seed', [
+    (2000, 5, 100.0, 1),
+    (2000, 50, 100.0, 2),
+    (500, 1000, 30.0, 3),
+    (1000, 3, 5.0, 4),
+])
+def test_capacity_invariants(count, trucks, capacity, seed):
+    data = parcels(count, seed)
+    plan = pack(data, trucks, capacity)
+    loaded = plan.truck >= 0
+
+    # Every truck index is valid and no truck is over capacity
+    assert plan.truck.min() >= -1 and plan.truck.max() < trucks
+    load = np.bincount(plan.truck[loaded], weights=plan.weights[loaded], minlength=trucks)
+    assert (load <= capacity + 1e-9).all()
+
+    # Unweighed and oversize parcels are never loaded
+    assert not (loaded & np.isnan(plan.weights)).any()
+    assert not (loaded & (plan.weights > capacity)).any()
+
+    # A parcel left behind that fits somewhere would be a packing bug
+    room = capacity - load
+    left = ~loaded & (plan.weights <= capacity)
+    if left.any():
+        assert np.nanmin(plan.weights[left]) > room.max() - 1e-9
+
+
+def test_everything_fits_in_a_big_enough_fleet():
+    data = parcels(300, seed=5, unweighed=0)
+    plan = pack(data, trucks=300, capacity=float(np.nanmax(data[:, WEIGHT])))
+    assert (plan.truck >= 0).all()
+
+
+def test_earliest_due_loaded_first():
+    # One truck that takes only two of the three 1 kg parcels
+    data = np.array([[1, 1.0, 20010, 1], [2, 1.0, 20005, 1], [3, 1.0, np.nan, 1]])
+    plan = pack(data, trucks=1, capacity=2.0)
+    assert plan.truck.tolist() == [0, 0, -1]
+
+
+def test_versions_follow_their_parcels():
+    data = parcels(50, seed=6)
+    data[:, VERSION] = np.arange(50) + 7
+    plan = pack(data, trucks=5, capacity=50.0)
+    assert (plan.versions == plan.ids + 6).all()
+
+
+def test_summary_totals_match_the_plan():
+    data = parcels(1000, seed=7)
+    plan = pack(data, trucks=20, capacity=80.0)
+    report = summarise(plan, include_ids=True)
+    loaded = plan.truck >= 0
+
+    assert report['loaded'] == int(loaded.sum())
+    assert sum(load['parcels'] for load in report['loads']) == report['loaded']
+    assert all(load['weight_kg'] <= 80.0 for load in report['loads'])
+    ids = sorted(i for load in report['loads'] for i in load['delivery_ids'])
+    assert ids == sorted(plan.ids[loaded].astype(int).tolist())
+    assert report['unweighed'] == int(np.isnan(plan.weights).sum())
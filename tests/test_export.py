@@ -0,0 +1,58 @@
+"""Streaming export: filters, formats and compression."""
+
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime
+
+from werkzeug.datastructures import MultiDict
+
+from delivery_export import EXPORT_FIELDS, export_deliveries
+from pagination import parse_filters
+
+
+def export(args=None, fmt='csv', compress=False):
+    return b''.join(export_deliveries(parse_filters(MultiDict(args or {})), fmt, compress))
+
+
+def csv_rows(data):
+    return list(csv.DictReader(io.StringIO(data.decode())))
+
+
+def test_csv_export_has_every_field_oldest_first(make_deliveries):
+    make_deliveries(3, weight=[1.5, None, 3.0])
+    rows = csv_rows(export())
+    assert list(rows[0]) == list(EXPORT_FIELDS)
+    assert [row['tracking_number'] for row in rows] == ['T00000', 'T00001', 'T00002']
+    assert [row['weight'] for row in rows] == ['1.5', '', '3.0']
+    assert rows[0]['created_at'] == '2026-01-01T00:00:00'
+
+
+def test_status_and_date_filters(make_deliveries):
+    make_deliveries(4, status=['late', 'ongoing', 'late', 'late'],
+                    created_at=[datetime(2026, 1, day, 12) for day in (1, 2, 3, 4)])
+
+    assert [row['tracking_number'] for row in csv_rows(export({'status': 'late'}))] == \
+        ['T00000', 'T00002', 'T00003']
+    # date_to is inclusive
+    rows = csv_rows(export({'status': 'late', 'date_from': '2026-01-02', 'date_to': '2026-01-03'}))
+    assert [row['tracking_number'] for row in rows] == ['T00002']
+    assert csv_rows(export({'date_from': '2027-01-01'})) == []
+
+
+def test_ndjson_export_gzipped(make_deliveries):
+    make_deliveries(2, estimated_delivery_date=date(2026, 2, 1))
+    lines = gzip.decompress(export(fmt='ndjson', compress=True)).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['tracking_number'] for record in records] == ['T00000', 'T00001']
+    assert records[0]['estimated_delivery_date'] == '2026-02-01'
+
+
+def test_export_route_streams_the_filtered_download(make_deliveries, admin_client):
+    make_deliveries(2, status=['late', 'ongoing'])
+    response = admin_client.get('/admin/delivery/export?status=late&format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert 'deliveries.ndjson' in response.headers['Content-Disposition']
+    assert [json.loads(line)['status'] for line in response.get_data(as_text=True).splitlines()] == ['late']
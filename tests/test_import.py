@@ -0,0 +1,111 @@
+"""Bulk import: row validation, duplicate tracking numbers, and queued manifests spooled to disk."""
+
+import hashlib
+import io
+import json
+import os
+
+from delivery_import import import_deliveries, queue_import, run_queued_import, upload_path
+from models import db, Delivery, DeliveryImport
+from status_counts import check
+
+MANIFEST = (b'tracking_number,recipient_name,recipient_address,recipient_phone\n'
+            b'IMP001,Ana,Rua 1,555\n'
+            b'IMP002,Bia,Rua 2,555\n')
+
+
+def run_import(admin, text, fmt='csv', **kwargs):
+    return import_deliveries(io.BytesIO(text.encode()), fmt, admin.id, **kwargs)
+
+
+def errors_by_line(result):
+    return {error['line']: error['errors'] for error in result.errors}
+
+
+def test_invalid_rows_are_reported_and_the_rest_imported(admin):
+    result = run_import(admin, 'tracking_number,recipient_name,recipient_address,recipient_phone,weight,status\n'
+                               'OK1,Ana,Rua 1,555,2.5,\n'
+                               ',Bia,Rua 2,555,,\n'
+                               'BAD2,Caio,Rua 3,555,-1,\n'
+                               'BAD3,Duda,Rua 4,555,,lost\n'
+                               'OK2,Eva,Rua 5,555,,delivered\n')
+
+    assert (result.rows, result.inserted, result.error_count) == (5, 2, 3)
+    errors = errors_by_line(result)
+    assert set(errors) == {3, 4, 5}
+    assert errors[3][0].startswith('tracking_number:')
+    assert errors[4][0].startswith('weight:')
+    assert errors[5][0].startswith('status:')
+
+    # Status defaults to ongoing; delivered rows get their delivery date
+    ok1 = Delivery.query.filter_by(tracking_number='OK1').one()
+    ok2 = Delivery.query.filter_by(tracking_number='OK2').one()
+    assert (ok1.status, ok1.weight, ok1.actual_delivery_date) == ('ongoing', 2.5, None)
+    assert ok2.status == 'delivered' and ok2.actual_delivery_date is not None
+    assert check() == {}
+
+
+def test_ndjson_rows_that_are_not_objects_are_rejected(admin):
+    result = run_import(admin, json.dumps({'tracking_number': 'N1', 'recipient_name': 'Ana',
+                                           'recipient_address': 'Rua 1', 'recipient_phone': '555'}) + '\n'
+                               '\n'
+                               '{not json\n'
+                               '[1, 2]\n', fmt='ndjson')
+    assert (result.rows, result.inserted) == (3, 1)
+    errors = errors_by_line(result)
+    assert errors[3][0].startswith('Invalid JSON')
+    assert errors[4] == ['Each line must be a JSON object.']
+
+
+def test_duplicates_in_file_and_database_are_rejected(admin, make_deliveries):
+    make_deliveries(1)  # T00000
+    rows = ['tracking_number,recipient_name,recipient_address,recipient_phone']
+    rows += [f'{number},Ana,Rua 1,555' for number in ('D1', 'D1', 'D2', 'T00000', 'D3', 'D2')]
+    # Batches of two: the second D1 shares its batch, the second D2 was
+    # committed with an earlier batch
+    result = run_import(admin, '\n'.join(rows) + '\n', batch_size=2)
+
+    assert (result.rows, result.inserted, result.error_count) == (6, 3, 3)
+    assert errors_by_line(result) == {
+        3: ['Duplicate tracking number in file.'],
+        5: ['Tracking number already exists.'],
+        7: ['Tracking number already exists.'],
+    }
+    assert Delivery.query.count() == 4
+
+
+def test_reported_errors_are_capped(admin):
+    rows = ['tracking_number,recipient_name,recipient_address,recipient_phone'] + [',Ana,Rua 1,555'] * 5
+    result = run_import(admin, '\n'.join(rows) + '\n', max_errors=2)
+    assert result.error_count == 5 and len(result.errors) == 2
+    assert result.to_dict()['errors_truncated']
+
+
+def test_queued_manifest_is_spooled_and_imported(app, admin):
+    upload, job = queue_import(io.BytesIO(MANIFEST), 'm.csv', 'csv', admin.id)
+    db.session.commit()
+    path = upload_path(upload)
+    assert os.path.dirname(path) == app.config['IMPORT_UPLOAD_DIR']
+    with open(path, 'rb') as spooled:
+        assert spooled.read() == MANIFEST
+    assert upload.checksum == hashlib.sha256(MANIFEST).hexdigest()
+    assert upload.job_id == job.id
+
+    assert run_queued_import(upload.id) == {'rows': 2, 'inserted': 2, 'error_count': 0}
+    assert not os.path.exists(path)
+    assert db.session.get(DeliveryImport, upload.id).path is None
+    assert Delivery.query.count() == 2
+
+    # A second run returns the saved report
+    assert run_queued_import(upload.id)['inserted'] == 2
+
+
+def test_same_manifest_while_pending_shares_the_import(admin):
+    first, job = queue_import(io.BytesIO(MANIFEST), 'm.csv', 'csv', admin.id)
+    db.session.commit()
+    again, same_job = queue_import(io.BytesIO(MANIFEST), 'copy.csv', 'csv', admin.id)
+    db.session.commit()
+
+    assert (again.id, same_job.id) == (first.id, job.id)
+    assert DeliveryImport.query.count() == 1
+    assert os.listdir(os.path.dirname(upload_path(first))) == [first.path]
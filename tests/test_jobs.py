@@ -0,0 +1,104 @@
+"""Job queue: deduplication, claiming, lease expiry and retries."""
+
+from datetime import datetime, timedelta
+
+import jobs
+from models import db, Job
+
+calls = []
+
+
+@jobs.task('test_record')
+def _record(value=None):
+    calls.append(value)
+    return {'value': value}
+
+
+@jobs.task('test_fail')
+def _fail():
+    raise RuntimeError('boom')
+
+
+def queue(name, **kwargs):
+    job = jobs.enqueue(name, **kwargs)
+    db.session.commit()
+    return job.id
+
+
+def test_dedup_key_shares_the_pending_job():
+    first = queue('test_record', dedup_key='same')
+    assert queue('test_record', dedup_key='same') == first
+    assert queue('test_record', dedup_key='other') != first
+
+
+def test_claim_takes_each_job_once():
+    job_id = queue('test_record')
+
+    job = jobs._claim('worker-a', lease_seconds=60)
+    assert job.id == job_id
+    assert (job.status, job.attempts, job.locked_by) == ('running', 1, 'worker-a')
+    assert job.locked_until > datetime.utcnow()
+    assert jobs._claim('worker-b', lease_seconds=60) is None
+
+
+def test_job_not_due_is_not_claimed():
+    jobs.enqueue('test_record', delay=3600)
+    db.session.commit()
+    assert jobs._claim('worker-a', lease_seconds=60) is None
+
+
+def test_expired_lease_is_claimed_again_and_late_result_ignored():
+    job_id = queue('test_record', payload={'value': 1})
+    jobs._claim('worker-a', lease_seconds=60)
+    # worker-a died: its lease ran out
+    db.session.query(Job).filter_by(id=job_id).update({'locked_until': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    job = jobs._claim('worker-b', lease_seconds=60)
+    assert (job.id, job.attempts, job.locked_by) == (job_id, 2, 'worker-b')
+
+    # worker-a coming back late can't overwrite worker-b's claim
+    jobs._settle(job_id, 1, 'worker-a', status='failed')
+    assert db.session.get(Job, job_id, populate_existing=True).status == 'running'
+
+    assert jobs.run_job(job, 'worker-b') == 'succeeded'
+    job = db.session.get(Job, job_id, populate_existing=True)
+    assert (job.status, job.locked_by, job.dedup_key) == ('succeeded', None, None)
+
+
+def test_failed_job_is_retried_then_fails(app):
+    job_id = queue('test_fail', max_attempts=2)
+
+    job = jobs._claim('worker-a', lease_seconds=60)
+    assert jobs.run_job(job, 'worker-a') == 'retrying'
+    job = db.session.get(Job, job_id, populate_existing=True)
+    assert job.status == 'queued' and job.run_at > datetime.utcnow()
+    assert 'RuntimeError: boom' in job.last_error
+
+    db.session.query(Job).filter_by(id=job_id).update({'run_at': datetime.utcnow()})
+    db.session.commit()
+    job = jobs._claim('worker-a', lease_seconds=60)
+    assert jobs.run_job(job, 'worker-a') == 'failed'
+    assert db.session.get(Job, job_id, populate_existing=True).status == 'failed'
+
+
+def test_retry_delay_grows_and_is_capped(app):
+    config = {'JOB_RETRY_BASE_SECONDS': 10, 'JOB_RETRY_MAX_SECONDS': 60}
+    for attempt, ceiling in ((1, 10), (2, 20), (3, 40), (6, 60)):
+        delay = jobs.retry_delay(attempt, config)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_expired_lease_on_last_attempt_fails_the_job():
+    job_id = queue('test_record', dedup_key='once', max_attempts=1)
+    jobs._claim('worker-a', lease_seconds=60)
+    db.session.query(Job).filter_by(id=job_id).update({'locked_until': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    assert jobs._claim('worker-b', lease_seconds=60) is None
+    job = db.session.get(Job, job_id, populate_existing=True)
+    assert (job.status, job.locked_by, job.dedup_key) == ('failed', None, None)
+    assert 'Lease expired' in job.last_error
+
+    # Its dedup_key is free again
+    assert queue('test_record', dedup_key='once') != job_id
@@ -0,0 +1,16 @@
+"""Set-based late detection: overdue parcels become late and the counters follow."""
+
+from datetime import date, timedelta
+
+from late_detection import mark_late_deliveries
+from status_counts import check, get_counts
+
+
+def test_mark_late_keeps_counters(make_deliveries):
+    yesterday = date.today() - timedelta(days=1)
+    make_deliveries(4, status=['ongoing', 'in_route', 'delivered', 'ongoing'],
+                    estimated_delivery_date=[yesterday, yesterday, yesterday, date.today()])
+    result = mark_late_deliveries()
+    assert result['marked'] == 2
+    assert check() == {}
+    assert get_counts()['late'] == 2
@@ -0,0 +1,73 @@
+"""Live dashboard updates: catching up from the event log after a reconnect."""
+
+import json
+from datetime import datetime
+
+from models import db, DeliveryEvent
+from delivery_events import SOURCE_CODES, STATUS_CODES, compact
+from live_updates import catch_up, current_cursor
+from status_updates import change_status
+
+
+def test_nothing_new_after_the_cursor(make_deliveries):
+    make_deliveries(1)
+    assert catch_up(current_cursor(), max_changes=10) is None
+
+
+def test_changes_since_the_cursor(admin, make_deliveries, admin_client):
+    first, second, third = make_deliveries(3)
+    cursor = current_cursor()
+    change_status(first.id, 'in_route', admin.id)
+    change_status(first.id, 'delivered', admin.id)
+    change_status(second.id, 'late', admin.id)
+    admin_client.post(f'/admin/delivery/{third.id}/delete')
+
+    message = catch_up(cursor, max_changes=10)
+    assert message['cursor'] == current_cursor() and not message['reload']
+    # Only each delivery's latest state, deleted ones listed apart
+    assert {row['id']: row['status'] for row in message['deliveries']} == \
+        {first.id: 'delivered', second.id: 'late'}
+    assert message['deleted'] == [third.id]
+    assert message['counts']['total'] == 2
+
+
+def test_too_many_changes_means_reload(admin, make_deliveries):
+    deliveries = make_deliveries(3)
+    cursor = current_cursor()
+    for delivery in deliveries:
+        change_status(delivery.id, 'late', admin.id)
+    assert catch_up(cursor, max_changes=2)['reload']
+
+
+def test_cursor_older_than_the_log_means_reload(admin, make_deliveries):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'late', admin.id)
+    cursor = current_cursor()
+    change_status(delivery.id, 'in_route', admin.id)
+    change_status(delivery.id, 'delivered', admin.id)
+    # Fold the whole log away, then log one newer event
+    newest = current_cursor()
+    compact(older_than_days=-1)
+    db.session.add(DeliveryEvent(id=newest + 1, delivery_id=delivery.id, occurred_at=datetime.utcnow(),
+                                 status=STATUS_CODES['delivered'], source=SOURCE_CODES['web']))
+    db.session.commit()
+    assert catch_up(cursor, max_changes=10)['reload']
+
+
+def test_stream_resumes_from_last_event_id(app, admin, make_deliveries, user_client, monkeypatch):
+    monkeypatch.setitem(app.config, 'LIVE_UPDATES_MAX_SECONDS', 0.05)
+    monkeypatch.setitem(app.config, 'LIVE_UPDATES_HEARTBEAT', 0.01)
+    delivery, = make_deliveries(1)
+    delivery_id, tracking_number = delivery.id, delivery.tracking_number
+    cursor = current_cursor()
+    change_status(delivery_id, 'in_route', admin.id)
+
+    # The stream ends its session, so nothing is read from delivery after this
+    response = user_client.get('/live/deliveries', headers={'Last-Event-ID': str(cursor)})
+    assert response.mimetype == 'text/event-stream'
+    event = response.get_data(as_text=True).split('\n\n')[1]
+    lines = event.split('\n')
+    assert lines[:2] == [f'id: {current_cursor()}', 'event: changes']
+    data = json.loads(lines[2][len('data: '):])
+    assert [row['id'] for row in data['rows']] == [delivery_id]
+    assert data['rows'][0]['status'] == 'in_route' and tracking_number in data['rows'][0]['html']
@@ -0,0 +1,77 @@
+"""Keyset pagination: cursor encoding and walking the pages of a dashboard."""
+
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+from pagination import decode_cursor, delivery_page, encode_cursor
+
+
+def walk(args):
+    """Every page of a dashboard request, following next_cursor."""
+    args = MultiDict(args)
+    pages = []
+    while True:
+        page, _ = delivery_page(args)
+        pages.append(page)
+        if not page.has_next:
+            return pages
+        args['cursor'] = page.next_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 891011)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_cursor_is_url_safe_without_padding():
+    token = encode_cursor(datetime(2026, 1, 1), 7)
+    assert '=' not in token and '+' not in token and '/' not in token
+
+
+def test_invalid_cursor_is_ignored():
+    assert decode_cursor(None) is None
+    assert decode_cursor('') is None
+    assert decode_cursor('not a cursor') is None
+    assert decode_cursor(encode_cursor(datetime(2026, 1, 1), 1)[:-3] + '!!!') is None
+
+
+def test_pages_visit_every_row_once_newest_first(make_deliveries):
+    # Ties on created_at are broken by id
+    same_time = datetime(2026, 2, 1)
+    deliveries = make_deliveries(7, created_at=[same_time] * 4 + [datetime(2026, 1, d) for d in (1, 2, 3)])
+    expected = [d.id for d in sorted(deliveries, key=lambda d: (d.created_at, d.id), reverse=True)]
+
+    pages = walk({'per_page': '3'})
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [row.id for page in pages for row in page] == expected
+
+
+def test_exact_multiple_has_no_empty_last_page(make_deliveries):
+    make_deliveries(6)
+    pages = walk({'per_page': '3'})
+    assert [len(page) for page in pages] == [3, 3]
+    assert not pages[-1].has_next
+
+
+def test_single_page(make_deliveries):
+    make_deliveries(2)
+    pages = walk({'per_page': '3'})
+    assert len(pages) == 1 and len(pages[0]) == 2 and pages[0].next_cursor is None
+
+
+def test_filters_apply_on_every_page(make_deliveries):
+    make_deliveries(9, status=['late', 'ongoing', 'delivered'] * 3)
+    pages = walk({'per_page': '2', 'status': 'late'})
+    rows = [row for page in pages for row in page]
+    assert [len(page) for page in pages] == [2, 1]
+    assert {row.status for row in rows} == {'late'}
+
+
+def test_page_size_is_clamped(app, make_deliveries):
+    make_deliveries(3)
+    page, _ = delivery_page(MultiDict({'per_page': '0'}))
+    assert len(page) == 1
+    page, _ = delivery_page(MultiDict({'per_page': str(app.config['DELIVERIES_MAX_PER_PAGE'] + 1)}))
+    assert len(page) == 3
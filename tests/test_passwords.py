@@ -0,0 +1,89 @@
+"""Password hashing pool: refusing work when saturated, timeouts and the login route's 503."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import passwords
+from passwords import HashingBusy
+
+
+@pytest.fixture
+def small_pool(app):
+    """Reconfigure the pool to one worker and no queue; release unblocks the tasks held by block()."""
+    def configure(timeout=5):
+        config = dict(app.config, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_LIMIT=0,
+                      PASSWORD_HASH_TIMEOUT=timeout)
+        passwords.init_app(SimpleNamespace(config=config))
+    release = threading.Event()
+    yield configure, release
+    release.set()
+    passwords.init_app(app)
+
+
+def block(release):
+    """Occupy the pool's worker until release is set; returns an event set once it has started."""
+    started = threading.Event()
+    threading.Thread(target=passwords._run, args=(lambda: started.set() or release.wait(5),),
+                     daemon=True).start()
+    return started
+
+
+def run_when_free(func):
+    """Run func on the pool once the blocked hashes have given their slots back."""
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            return passwords._run(func)
+        except HashingBusy:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+
+def test_saturated_pool_refuses_right_away(small_pool):
+    configure, release = small_pool
+    configure()
+    started = block(release)
+    assert started.wait(5)
+
+    with pytest.raises(HashingBusy):
+        passwords._run(lambda: None)
+
+    release.set()
+    assert run_when_free(lambda: 'done') == 'done'
+
+
+def test_slow_hash_times_out_but_keeps_its_slot(small_pool):
+    configure, release = small_pool
+    configure(timeout=0.05)
+    with pytest.raises(HashingBusy):
+        passwords._run(release.wait, 5)
+
+    # The timed-out hash still runs and holds the only slot: refused, never queued
+    ran = []
+    with pytest.raises(HashingBusy):
+        passwords._run(ran.append, 1)
+    release.set()
+    run_when_free(lambda: None)
+    assert ran == []
+
+
+def test_login_gets_503_while_the_pool_is_saturated(small_pool, client):
+    configure, release = small_pool
+    configure()
+    started = block(release)
+    assert started.wait(5)
+
+    response = client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+
+
+def test_hash_round_trip_on_the_pool(small_pool):
+    configure, _ = small_pool
+    configure()
+    stored = passwords.hash_password('secret')
+    assert passwords.verify_password(stored, 'secret')
+    assert not passwords.verify_password(stored, 'wrong')
@@ -0,0 +1,106 @@
+"""Read-replica routing: healthy replicas serve reads, lagging or broken ones fall back to the primary."""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, request
+from sqlalchemy import select, update
+
+import read_replicas
+from models import db, DataVersion
+from page_cache import DELIVERIES
+
+
+@pytest.fixture
+def replicated(app):
+    """
+    A second app on the same models with a primary and one replica SQLite
+    file. GET /version reads the deliveries write marker, so the answer
+    shows which database served it; POST /version bumps it on the primary.
+    """
+    directory = tempfile.mkdtemp()
+    replica_path = os.path.join(directory, 'replica.db')
+    routed = Flask(__name__)
+    routed.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(directory, 'primary.db'),
+        SQLALCHEMY_BINDS={'replica_0': {'url': 'sqlite:///' + replica_path}},
+        READ_REPLICA_MAX_LAG=5.0,
+        READ_REPLICA_CHECK_INTERVAL=0,
+        READ_REPLICA_ENDPOINTS=['version'],
+        READ_REPLICA_STICKY_SECONDS=60,
+    )
+    db.init_app(routed)
+
+    @routed.route('/version', methods=['GET', 'POST'], endpoint='version')
+    def version():
+        if request.method == 'POST':
+            db.session.execute(update(DataVersion).where(DataVersion.name == DELIVERIES)
+                               .values(version=DataVersion.version + 1))
+            db.session.commit()
+        return str(db.session.execute(select(DataVersion.version).where(DataVersion.name == DELIVERIES)).scalar())
+
+    read_replicas.init_app(routed, db)
+
+    def set_marker(bind, version, updated_at=None):
+        with routed.app_context():
+            engine = db.engines[bind]
+            DataVersion.__table__.create(engine, checkfirst=True)
+            with engine.begin() as connection:
+                connection.execute(DataVersion.__table__.delete())
+                connection.execute(DataVersion.__table__.insert().values(
+                    name=DELIVERIES, version=version, updated_at=updated_at or datetime.utcnow()))
+
+    yield routed, set_marker, replica_path
+    with routed.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    read_replicas.router.configure([], 5.0, 5.0)
+
+
+def test_reads_go_to_a_replica_that_is_up_to_date(replicated):
+    routed, set_marker, _ = replicated
+    set_marker(None, 5)
+    set_marker('replica_0', 7)  # distinguishable, and not behind
+    assert routed.test_client().get('/version').text == '7'
+    assert read_replicas.router.status()['replica_0']['healthy']
+
+
+def test_lagging_replica_is_skipped(replicated):
+    routed, set_marker, _ = replicated
+    set_marker(None, 5, updated_at=datetime.utcnow() - timedelta(minutes=1))
+    set_marker('replica_0', 4)
+    assert routed.test_client().get('/version').text == '5'
+    assert read_replicas.router.status()['replica_0']['lag_seconds'] >= 60
+
+
+def test_replica_lost_mid_request_falls_back_to_the_primary(replicated):
+    routed, set_marker, replica_path = replicated
+    set_marker(None, 5)
+    set_marker('replica_0', 5)
+    client = routed.test_client()
+    client.get('/version')
+    # The replica goes away after its last health check
+    read_replicas.router.check_interval = 3600
+    with routed.app_context():
+        db.engines['replica_0'].dispose()
+    os.remove(replica_path)
+    os.mkdir(replica_path)
+
+    response = client.get('/version')
+    assert (response.status_code, response.text) == (200, '5')
+    assert not read_replicas.router.is_healthy('replica_0')
+
+
+def test_writer_reads_its_writes_from_the_primary(replicated):
+    routed, set_marker, _ = replicated
+    set_marker(None, 5)
+    set_marker('replica_0', 5)
+    client = routed.test_client()
+    assert client.post('/version').text == '6'
+    # Ahead of the primary, so the replica is healthy; the writer still reads from the primary
+    set_marker('replica_0', 100)
+    assert client.get('/version').text == '6'
+    assert routed.test_client().get('/version').text == '100'
@@ -0,0 +1,55 @@
+"""Delivery search: tracking-number prefixes and the full-text index kept in sync by triggers."""
+
+from datetime import datetime, timedelta
+
+from models import db, Delivery
+from archive import archive_delivered
+from search import search_deliveries
+
+
+def found(query, **kwargs):
+    return [row.tracking_number for row in search_deliveries(query, **kwargs)]
+
+
+def test_tracking_number_prefix_pages(make_deliveries):
+    make_deliveries(5)
+    results = search_deliveries('T0000', per_page=3)
+    assert results.mode == 'tracking' and results.has_next
+    assert [row.tracking_number for row in results] == ['T00000', 'T00001', 'T00002']
+    assert found('T0000', page=2, per_page=3) == ['T00003', 'T00004']
+    assert found('T00004') == ['T00004']
+
+
+def test_tracking_prefix_finds_archived_parcels(make_deliveries):
+    make_deliveries(2, status=['delivered', 'ongoing'], updated_at=datetime.utcnow() - timedelta(days=30))
+    archive_delivered(older_than_days=1, pause=0)
+    assert found('T0000') == ['T00000', 'T00001']
+
+
+def test_full_text_matches_every_word_as_a_prefix(make_deliveries):
+    make_deliveries(3, recipient_name=['José Silva', 'Maria Souza', 'José Souza'],
+                    recipient_address=['Rua das Flores 1', 'Avenida Brasil 2', 'Rua Augusta 3'])
+    results = search_deliveries('jose')
+    assert results.mode == 'fulltext'
+    assert sorted(row.tracking_number for row in results) == ['T00000', 'T00002']
+    assert found('souz rua') == ['T00002']
+    assert found('nobody here') == []
+
+
+def test_triggers_keep_the_index_in_sync(make_deliveries):
+    delivery, = make_deliveries(1, recipient_name='Ana Lima')
+    delivery.recipient_name = 'Beatriz Costa'
+    db.session.commit()
+    assert found('ana lima') == []
+    assert found('beatriz') == ['T00000']
+
+    db.session.delete(delivery)
+    db.session.commit()
+    assert found('beatriz') == []
+
+
+def test_new_rows_are_indexed_on_insert(admin):
+    db.session.add(Delivery(tracking_number='NEW1', recipient_name='Carla Dias', recipient_address='Rua 1',
+                            recipient_phone='555', status='ongoing', created_by_id=admin.id))
+    db.session.commit()
+    assert found('carla dias') == ['NEW1']
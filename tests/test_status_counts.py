@@ -0,0 +1,25 @@
+"""The maintained status counters agree with a fresh count after status changes."""
+
+from status_counts import check, get_counts
+from status_updates import apply_status_updates, change_status
+
+
+def test_change_status_keeps_counters(admin, make_deliveries):
+    delivery, = make_deliveries(1)
+    change_status(delivery.id, 'in_route', admin.id)
+    assert check() == {}
+    assert get_counts()['in_route'] == 1
+
+
+def test_batch_status_updates_keep_counters(admin, make_deliveries):
+    make_deliveries(4)
+    results = apply_status_updates([
+        {'tracking_number': 'T00000', 'status': 'delivered'},
+        {'tracking_number': 'T00001', 'status': 'late'},
+        {'tracking_number': 'T00002', 'status': 'ongoing'},  # unchanged
+        {'tracking_number': 'missing', 'status': 'late'},
+    ], admin.id)
+    assert [result['ok'] for result in results] == [True, True, True, False]
+    assert check() == {}
+    counts = get_counts()
+    assert (counts['ongoing'], counts['late'], counts['delivered']) == (2, 1, 1)
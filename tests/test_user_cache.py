@@ -0,0 +1,61 @@
+"""User cache behind the Flask-Login user_loader: hits, expiry and invalidation on change."""
+
+import pytest
+
+import user_cache
+from models import db, User
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = user_cache.UserCache(maxsize=2, ttl=60)
+    monkeypatch.setattr(user_cache, 'cache', cache)
+    return cache
+
+
+@pytest.fixture
+def member(ctx):
+    user = User(username='member', email='member@example.com', role='user')
+    user.set_password('member123')
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.rollback()
+    User.query.filter_by(username='member').delete()
+    db.session.commit()
+
+
+def test_second_load_is_a_hit(cache, member):
+    assert user_cache.load_user(member.id).username == 'member'
+    assert user_cache.load_user(member.id).username == 'member'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert user_cache.load_user(-1) is None
+
+
+def test_update_and_delete_invalidate(cache, member):
+    member_id = member.id
+    assert not user_cache.load_user(member_id).is_admin()
+
+    member.role = 'admin'
+    db.session.commit()
+    assert user_cache.load_user(member_id).is_admin()
+
+    db.session.delete(member)
+    db.session.commit()
+    assert user_cache.load_user(member_id) is None
+    assert cache.invalidations == 2
+
+
+def test_entries_expire_and_least_recent_is_evicted(cache, member, admin, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(user_cache.time, 'monotonic', lambda: clock[0])
+    user = User.query.filter_by(username='user').one()
+
+    for user_id in (member.id, admin.id, member.id, user.id):
+        user_cache.load_user(user_id)
+    # admin was the least recently used of the three
+    assert cache.stats()['evictions'] == 1
+    assert cache.get(admin.id) is None and cache.get(member.id) is not None
+
+    clock[0] += 61
+    assert cache.get(member.id) is None
@@ -0,0 +1,123 @@
+"""
+Per-process cache of lightweight user records for Flask-Login.
+load_user runs on every authenticated request; caching a small read-only
+copy of the user (id, username, email, role) saves one database round-trip
+per page. Entries expire after USER_CACHE_TTL seconds and are invalidated
+whenever a User row is updated or deleted through the ORM.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+from models import db, User
+
+
+class CachedUser(UserMixin):
+    """Read-only stand-in for User with just what requests and templates need."""
+
+    def __init__(self, id, username, email, role):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+
+    def is_admin(self):
+        """Check if the user has admin role."""
+        return self.role == 'admin'
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class UserCache:
+    """Thread-safe LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires_at, CachedUser)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user):
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user when user_id is None."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# One cache per process, configured by init_app()
+cache = UserCache()
+
+
+def init_app(app):
+    """Apply USER_CACHE_SIZE / USER_CACHE_TTL from the app config."""
+    cache.maxsize = app.config['USER_CACHE_SIZE']
+    cache.ttl = app.config['USER_CACHE_TTL']
+
+
+def load_user(user_id):
+    """Return a CachedUser for user_id, querying the database only on a miss."""
+    if cache.ttl <= 0:
+        return _fetch(user_id)
+    user = cache.get(user_id)
+    if user is None:
+        user = _fetch(user_id)
+        if user is not None:
+            cache.put(user)
+    return user
+
+
+def _fetch(user_id):
+    row = (db.session.query(User.id, User.username, User.email, User.role)
+           .filter(User.id == user_id)
+           .first())
+    return CachedUser(*row) if row else None
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    """Any ORM update or delete of a user drops its cached record."""
+    cache.invalidate(target.id)